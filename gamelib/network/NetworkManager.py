@@ -1,21 +1,29 @@
 import ctypes
 import time
 import threading
+from collections import deque
 from .SteamNetworking import SteamNetworking
 from ..game.utility.Global import Global
 from .utility.Communication import Communication
 from .utility.MissingObject import MissingObjectManager
 from .utility.NetIDGenerator import NetIDGenerator
 from .utility.PingMeter import PingMeter
-from ..game.utility.Coroutine import CoroutineManager, WaitForSeconds
+from .utility.SendQueue import SendQueue
+from .utility.NetworkStats import NetworkStats
+from .utility.SnapshotReplicator import SnapshotReplicator
+from .utility.ClassTable import ClassTable
+from ..game.utility.Coroutine import CoroutineManager
 from .SetupServer import SetupServer
 from .SetupClient import SetupClient
 class NetworkManager(Global):
-    
+    # 通信層の生成関数 (get_instance() より前に use_transport() で差し替え可能)
+    transport_factory = SteamNetworking
+
     def __init__(self):
         if NetworkManager._instance is not None:
             raise Exception("NetworkManager is a singleton!")
-        self.steam = SteamNetworking()
+        # Steam 以外の Transport でも互換のため属性名は steam のまま
+        self.steam = NetworkManager.transport_factory()
         super().__init__()
         # 何かしらのサーバーに接続されている
         self.connected = False
@@ -35,21 +43,74 @@ class NetworkManager(Global):
 
         self.lobby_members = {}
 
+        # ネットワークtick (送信キューの flush などをこの間隔で行う)
+        self.tick_rate = 60
+        # クライアント: NetworkTransform をサーバー時刻で何秒遅れて表示するか (受信した状態の間を補間する)
+        self.interpolation_delay = 0.1
+        # 受信した最新の状態より先は、この秒数まで外挿する
+        self.max_extrapolation = 0.05
+        self.tick = 0
+        self._tick_timer = 0.0
+
+        # 受信処理の1フレームあたりの予算 (超えた分は次のフレームへ持ち越す)
+        self.receive_budget_time = 0.004
+        self.receive_budget_count = 2000
+        self.pending_messages = deque()  # デコード済み・未処理のメッセージ
+
+        # 受信スレッドモード: 受信・デコード・断片の復元を別スレッドで行い、
+        # メインループは pending_messages に溜まったメッセージを処理するだけにする
+        self.use_receive_thread = False
+        self.receive_queue_limit = 10000  # pending_messages の上限 (超えたら受信スレッドが待つ)
+        self.receive_thread_wait = 0.001
+        self.stats = NetworkStats()
+
         # singleton(循環防止)
         self.lock = threading.Lock()
         # 各機能クラスの初期化
         self.communication = Communication(self)
+        self.send_queue = SendQueue(self)
         self.coroutine_manager = CoroutineManager()
         # 各拡張機能(component)を初期化
         self.ping_meter = PingMeter(self)
         self.net_id_generator = NetIDGenerator(self)
         self.missing_object_manager = MissingObjectManager(self)
+        self.snapshot_replicator = SnapshotReplicator(self)
+        self.class_table = ClassTable(self)
 
-        self.components = [self.ping_meter, self.net_id_generator]
+        self.components = [self.ping_meter, self.net_id_generator, self.snapshot_replicator, self.class_table]
 
         # セットアップ用のクラス
         self.server_setup = SetupServer(self)
         self.client_setup = SetupClient(self)
+
+    @classmethod
+    def use_transport(cls, factory):
+        """使用する Transport を差し替える (例: lambda: LoopbackTransport(hub))"""
+        if cls._instance is not None:
+            raise Exception("NetworkManager は既に初期化されています")
+        cls.transport_factory = factory
+
+    @classmethod
+    def create_peer(cls, transport):
+        """
+        シングルトンとは別の NetworkManager を作る (サーバー + 複数のクライアントを1プロセスで動かす負荷試験・テスト用)。
+        作ったピアを動かす間は activate() で get_instance() の戻り値を切り替える
+        (オブジェクトは生成時に get_instance() で NetworkManager を取得するため)。
+        """
+        previous = cls._instance
+        factory = cls.transport_factory
+        cls._instance = None
+        cls.transport_factory = lambda: transport
+        try:
+            return cls()
+        finally:
+            cls.transport_factory = factory
+            cls._instance = previous
+
+    def activate(self):
+        """get_instance() がこのインスタンスを返すようにする"""
+        NetworkManager._instance = self
+
     def set_singleton(self, scene_manager, global_event_manager):
         self.global_event_manager = global_event_manager
         self.scene_manager = scene_manager
@@ -58,61 +119,137 @@ class NetworkManager(Global):
         # 生成ミスがあった場合Falseを返す
         return self.server_setup.run(dis, max_p)
     def setup_client(self, lobby_id):
-        from gamelib.network.syncs.NetworkSceneManager import NetworkSceneManager
-        self.scene_manager = NetworkSceneManager.get_instance()
+        if getattr(self, "scene_manager", None) is None:
+            from gamelib.network.syncs.NetworkSceneManager import NetworkSceneManager
+            self.scene_manager = NetworkSceneManager.get_instance()
         self.client_setup.run(lobby_id)
 
     # ------------------------
     # メッセージ送受信
     # ------------------------
-    def send_to_client(self, client_id, message):
+    def send_to_client(self, client_id, message, immediate=False):
+        """
+        クライアントへ送信する。通常は送信キューに積み、次のネットワークtickでまとめて送る。
+        :param immediate: True ならキューを通さずすぐに送信 (ping など)
+        """
         if self.is_server:
             self.steam.accept_p2p_session(client_id)
-            self.communication.send_message(client_id, message)
+            if immediate:
+                self.communication.send_message(client_id, message)
+            else:
+                self.send_queue.push(client_id, message)
 
-    def send_to_server(self, message, send_server=False):
+    def send_to_server(self, message, send_server=False, immediate=False):
         if self.is_client:
             self.steam.accept_p2p_session(self.server_steam_id)
-            self.communication.send_message(self.server_steam_id, message)
+            if immediate:
+                self.communication.send_message(self.server_steam_id, message)
+            else:
+                self.send_queue.push(self.server_steam_id, message)
         if self.is_server and send_server:
             self.scene_manager.receive_message(self, message)
 
-    def broadcast(self, message, send_server=False):
+    def broadcast(self, message, send_server=False, immediate=False):
         for client_id in self.lobby_members.keys():
             if (client_id != self.server_steam_id):
-                self.send_to_client(client_id, message)
+                self.send_to_client(client_id, message, immediate)
         if send_server:
             self.scene_manager.receive_message(self, message)
+
+    def network_tick(self):
+        """ネットワークtickごとの処理 (送信キューをまとめて送る)"""
+        self.tick += 1
+        scene = self.scene_manager.current_scene
+        if hasattr(scene, "network_tick"):
+            scene.network_tick(self.tick)
+        if self.is_server:
+            self.snapshot_replicator.tick(self.tick)
+        self.send_queue.flush()
+        # 揃わないまま放置された断片を破棄する (受信スレッドモードではスレッド側で行う)
+        if not self.use_receive_thread:
+            self.communication.fragment_assembler.expire()
     def process_received_message(self, message):
         for component in self.components:
             if hasattr(component, "receive_message"):
-                component.receive_message(message)
+                # True を返したコンポーネントが処理したメッセージはシーンに渡さない
+                if component.receive_message(message):
+                    return
 
         self.scene_manager.receive_message(self, message)
         
 
+    def start_receiving(self):
+        """受信処理を開始する (受信スレッドモードならスレッドも起動する)"""
+        if self.use_receive_thread:
+            self.thread_running.set()
+            self.start_thread(self._receive_thread)
+        self.coroutine_manager.start_coroutine(self._receive_messages)
+
+    def _receive_thread(self):
+        """
+        受信スレッド: Transport からの受信・デコード・断片の復元を行い、pending_messages に積む。
+        deque の append / popleft はスレッドセーフなので、メインループとの受け渡しにロックは使わない。
+        """
+        queue = self.pending_messages
+        assembler = self.communication.fragment_assembler
+        while self.thread_running.is_set():
+            if len(queue) >= self.receive_queue_limit:
+                # メインループが追いつくまで待つ (受信データは Transport 側に残る)
+                self.stats.queue_full_waits += 1
+                time.sleep(self.receive_thread_wait)
+                continue
+
+            raw_data, sender_id = self.steam.receive_p2p_message()
+            if not raw_data:
+                assembler.expire()
+                self.steam.wait_for_message(self.receive_thread_wait)
+                continue
+
+            messages = self.communication.receive_message(raw_data, sender_id)
+            self.stats.received_datagrams += 1
+            self.stats.received_messages += len(messages)
+            queue.extend(messages)
+
     def _receive_messages(self):
+        """受信コルーチン: 毎フレーム、予算の範囲で届いているメッセージをすべて処理する"""
         while self.running:
-            raw_data, sender_id = self.steam.receive_p2p_message()
+            self.pump_messages()
+            yield None  # 次のフレームへ
 
-            if raw_data:
-                # もし raw_data が bytes なら処理、dict ならそのまま使う
-                if isinstance(raw_data, bytes):
-                    message = self.communication.receive_message(raw_data)
-                elif isinstance(raw_data, dict):
-                    message = raw_data
-                else:
-                    # もし他の型なら、試しに変換（必要に応じて処理を追加）
-                    try:
-                        message = self.communication.receive_message(str(raw_data).encode('utf-8'))
-                    except Exception as e:
-                        print("⚠️ Error processing raw_data:", e)
-                        message = None
-
-                if message:
-                    self.process_received_message(message)
-
-            yield WaitForSeconds(0.005)
+    def pump_messages(self):
+        """
+        受信済みのメッセージを予算 (receive_budget_time 秒 / receive_budget_count 件) まで処理する。
+        :return: 処理したメッセージ数
+        """
+        start = time.perf_counter()
+        deadline = start + self.receive_budget_time
+        processed = 0
+        exhausted = False
+        while True:
+            if not self.pending_messages:
+                if self.use_receive_thread:
+                    break  # 受信はスレッドが行う
+                raw_data, sender_id = self.steam.receive_p2p_message()
+                if not raw_data:
+                    break
+                messages = self.communication.receive_message(raw_data, sender_id)
+                self.stats.received_datagrams += 1
+                self.stats.received_messages += len(messages)
+                self.pending_messages.extend(messages)
+                continue
+
+            if processed >= self.receive_budget_count or time.perf_counter() >= deadline:
+                exhausted = True
+                break
+            self.process_received_message(self.pending_messages.popleft())
+            processed += 1
+
+        backlog = len(self.pending_messages)
+        transport_backlog = self.steam.pending_count()
+        if transport_backlog:
+            backlog += transport_backlog
+        self.stats.record_pump(processed, time.perf_counter() - start, backlog, exhausted)
+        return processed
 
     def start_thread(self, target):
         thread = threading.Thread(target=target, daemon=True)
@@ -142,6 +279,12 @@ class NetworkManager(Global):
         self.is_client = False
         self.is_server = False
         self.stop_all_threads()
+        self.send_queue.clear()
+        self.pending_messages.clear()
+        self.communication.fragment_assembler.clear()
+        self.snapshot_replicator.clear()
+        self.ping_meter.clear()
+        self.class_table.clear()
         self.steam.leave_lobby(self.lobby_id)
         self.steam.close_all_p2p_sessions()
         self.coroutine_manager.clear()
@@ -176,6 +319,7 @@ class NetworkManager(Global):
             # 🔹 参加者リストから削除
             if steam_id in self.lobby_members:
                 del self.lobby_members[steam_id]
+            self.class_table.forget_peer(steam_id)
 
             self.global_event_manager.trigger_event("LobbyLeave", steam_id=steam_id, player_name=player_name, lobby_id=lobby_id)
 
@@ -184,6 +328,13 @@ class NetworkManager(Global):
         self.client_setup.update(dt)
         if self.is_client:
             self.ping_meter.send_ping_request()
+
+        # 送信キューを一定間隔で flush する
+        if self.running:
+            self._tick_timer += dt
+            if self._tick_timer >= 1.0 / self.tick_rate:
+                self._tick_timer %= 1.0 / self.tick_rate
+                self.network_tick()
     # 🔹 現在の参加者一覧を取得
     def get_lobby_members(self):
         return self.lobby_members
@@ -6,16 +6,37 @@ class NetworkObjectFactory:
         """オブジェクトクラスを登録する"""
         NetworkObjectFactory._registry[target_class.__name__] = target_class
 
+    @classmethod
+    def get_registered_names(cls):
+        """登録済みのクラス名 (名前順。サーバーがクラスIDの表を作るときに使う)"""
+        return sorted(cls._registry)
 
     @classmethod
-    def create_object(cls, class_name, object_name, network_id=None, steam_id=None, **kwargs):
-        """クラス名からオブジェクトを生成"""
+    def get_class(cls, class_ref):
+        """クラスID またはクラス名から登録されたクラスを取得 (クラスIDは実行中のピアの class_table で引く)"""
+        class_name = class_ref
+        if isinstance(class_ref, int):
+            from .NetworkManager import NetworkManager
+            class_name = NetworkManager.get_instance().class_table.get_class_name(class_ref)
+            if class_name is None:
+                return None
         if class_name not in cls._registry:
             print(f"⚠️ クラス '{class_name}' が登録されていません。")
             return None
+        return cls._registry[class_name]
+
+    @classmethod
+    def create_object(cls, class_name, object_name, network_id=None, steam_id=None, spawn_args=(), **kwargs):
+        """
+        クラス名 (またはクラスID) からオブジェクトを生成
+        :param spawn_args: コンストラクタの追加の引数の値 (クラスの spawn_args の順。NetworkGameObject.get_spawn_args)
+        """
+        obj_class = cls.get_class(class_name)
+        if obj_class is None:
+            return None
 
         # 登録されたクラスからインスタンスを生成
-        obj_class = cls._registry[class_name]
+        kwargs.update(zip(getattr(obj_class, "spawn_args", ()), spawn_args))
         obj = obj_class(name=object_name, network_id=network_id, steam_id=steam_id, **kwargs)
 
         return obj
@@ -33,7 +33,7 @@ class SetupClient:
         """
         start_time = time.time()
         initial_ping_rate = self.network_manager.ping_meter.ping_rate
-        self.network_manager.coroutine_manager.start_coroutine(self.network_manager._receive_messages)
+        self.network_manager.start_receiving()
         print("📡 サーバーへの Ping を開始します...")
 
         while time.time() - start_time < timeout:
@@ -59,8 +59,14 @@ class SetupClient:
         start_time = time.time()
         self.network_manager.complete_scene_sync = False
         self.network_manager.scene_manager.request_scene_sync(self.network_manager)
+        progress = None
         while time.time() - start_time < timeout:
             yield WaitForSeconds(1)
+            # 分割されたシーン同期を受信・生成している間はタイムアウトを延ばす
+            current = self.network_manager.scene_manager.get_scene_sync_progress()
+            if current is not None and current != progress:
+                progress = current
+                start_time = time.time()
             if self.network_manager.complete_scene_sync:
                 self.network_manager.connected = True
                 print("🎉 シーン同期完了！接続確立。")
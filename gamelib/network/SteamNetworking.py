@@ -2,12 +2,57 @@ import ctypes
 import os
 import time
 import threading
-import json
-import zlib
-import base64
-import re
-class SteamNetworking:
+from .transport.Transport import Transport
+
+# DLL の Send/ReceiveP2PMessage は NUL 終端の文字列として扱うため、
+# NUL を含むバイナリは COBS で NUL を取り除き、先頭に ESCAPE を付けて送る
+# (JSON は NUL を含まず 0xFF で始まることもないので区別できる)
+ESCAPE = 0xFF
+
+RECEIVE_BUFFER_SIZE = 1500
+RECEIVE_POOL_SIZE = 8  # 受信バッファの数 (返した memoryview はこの回数の受信まで有効)
+
+
+def cobs_encode(data):
+    """Consistent Overhead Byte Stuffing: NUL を含まないバイト列に変換する"""
+    out = bytearray()
+    for part in bytes(data).split(b'\x00'):
+        while len(part) >= 0xFE:
+            out.append(0xFF)
+            out += part[:0xFE]
+            part = part[0xFE:]
+        out.append(len(part) + 1)
+        out += part
+    return bytes(out)
+
+
+def cobs_decode(data):
+    out = bytearray(len(data))
+    return bytes(out[:cobs_decode_into(data, out)])
+
+
+def cobs_decode_into(data, out):
+    """COBS を out (len(data) 以上の bytearray) に展開し、展開後の長さを返す"""
+    index = 0
+    position = 0
+    length = len(data)
+    while index < length:
+        code = data[index]
+        index += 1
+        end = min(index + code - 1, length)
+        size = end - index
+        out[position:position + size] = data[index:end]
+        position += size
+        index = end
+        if code != 0xFF and index < length:
+            out[position] = 0
+            position += 1
+    return position
+
+
+class SteamNetworking(Transport):
     def __init__(self, dll_path="SteamNetworkingWrapper.dll"):
+        super().__init__()
         self.dll_path = os.path.abspath(dll_path)
         try:
             self.steam_dll = ctypes.CDLL(self.dll_path)
@@ -90,7 +135,8 @@ class SteamNetworking:
             self._send_p2p_message.restype = ctypes.c_bool
 
             self._receive_p2p_message = self.steam_dll.ReceiveP2PMessage
-            self._receive_p2p_message.argtypes = [ctypes.c_char_p, ctypes.c_int, ctypes.POINTER(ctypes.c_uint64)]
+            # 受信バッファは再利用する bytearray を from_buffer で渡すので POINTER(c_char)
+            self._receive_p2p_message.argtypes = [ctypes.POINTER(ctypes.c_char), ctypes.c_int, ctypes.POINTER(ctypes.c_uint64)]
             self._receive_p2p_message.restype = ctypes.c_bool
 
             self._close_all_p2p_sessions = self.steam_dll.CloseAllP2PSessions
@@ -122,8 +168,6 @@ class SteamNetworking:
             self._shutdown_server = self.steam_dll.ShutdownServer
             self._shutdown_server.restype = None
 
-            self.fragment_buffer = {}  # 断片のバッファ管理
-
         except Exception as e:
             print("❌ DLL の読み込みに失敗しました:", e)
             exit()
@@ -137,6 +181,16 @@ class SteamNetworking:
         self.steam_id = self._get_steam_id()
         print(f"🎮 自分の Steam ID: {self.steam_id}")
 
+        # 受信用のバッファプール (毎回の受信でバッファを確保しない)
+        self._receive_buffers = [bytearray(RECEIVE_BUFFER_SIZE) for _ in range(RECEIVE_POOL_SIZE)]
+        self._receive_c_buffers = [(ctypes.c_char * RECEIVE_BUFFER_SIZE).from_buffer(buffer)
+                                   for buffer in self._receive_buffers]
+        self._decode_buffers = [bytearray(RECEIVE_BUFFER_SIZE) for _ in range(RECEIVE_POOL_SIZE)]
+        self._receive_lengths = [0] * RECEIVE_POOL_SIZE  # 前回の受信で書き込まれた長さ (次の受信の前にクリアする)
+        self._receive_index = 0
+        self._sender_id = ctypes.c_uint64(0)
+        self._sender_id_ref = ctypes.byref(self._sender_id)
+
     # -------------------------------
     # コールバック処理
     # -------------------------------
@@ -220,69 +274,53 @@ class SteamNetworking:
     def send_p2p_message(self, steam_id, message):
         if isinstance(message, str):
             message = message.encode('utf-8')  # 文字列の場合はエンコード
-        return self._send_p2p_message(steam_id, message)
-
-    def receive_p2p_message(self, buffer_size=1500):
-        """P2Pメッセージを受信し、分割データを復元"""
-        buffer = ctypes.create_string_buffer(buffer_size)  # 受信用バッファ
-        sender_id = ctypes.c_uint64(0)  # 送信者ID格納用
-
-        success = self._receive_p2p_message(buffer, buffer_size, ctypes.byref(sender_id))
-        if success:
-            # 受信データが空でないかチェック
-            if buffer.value and buffer.value != b'\x00' * buffer_size:
-                try:
-                    # UTF-8 でデコード
-                    decoded_str = buffer.value.decode('utf-8', errors='replace').strip('\x00')
-
-                    # JSONを解析
-                    message = json.loads(decoded_str)
-
-                    # 受信データのデバッグログ
-                    # print(f"📩 Received from {sender_id.value}: {message}")
-
-                    if message.get("type") == "fragment":
-                        return self._handle_incoming_fragment(message), sender_id.value
-                    elif message.get("type") == "full_message":
-                        return json.loads(message["data"]), sender_id.value
-                    else:
-                        return None, sender_id.value
-
-                except Exception as e:
-                    print(f"⚠️ JSON Decode error: {e}")
-                    print(f"⚠️ Raw Buffer Value: {buffer.value}")
-                    return None, sender_id.value
-            else:
-                print(f"⚠️ Received empty message from {sender_id.value}")
-        return None, None
-
-    def _handle_incoming_fragment(self, fragment):
-        """受信したフラグメントを結合し、完全なメッセージを復元"""
-        fragment_id = fragment["fragment_id"]
-        index = fragment["fragment_index"]
-        total_fragments = fragment["total_fragments"]
-
-        if fragment_id not in self.fragment_buffer:
-            self.fragment_buffer[fragment_id] = [None] * total_fragments
-
-        self.fragment_buffer[fragment_id][index] = fragment["data"]
-
-        # すべての断片が揃ったかチェック
-        if all(part is not None for part in self.fragment_buffer[fragment_id]):
-            complete_json_str = "".join(self.fragment_buffer[fragment_id])  # JSON文字列の結合
-            del self.fragment_buffer[fragment_id]
-
-            try:
-                return json.loads(complete_json_str)
-            except Exception as e:
-                print(f"⚠️ Error in fragment decoding: {e}")
-                return None
-
-        return None
-
-
-
+        elif b'\x00' in message:
+            message = bytes([ESCAPE]) + cobs_encode(message)  # バイナリ形式
+        return self._send_p2p_message(steam_id, bytes(message))
 
+    def receive_p2p_message(self):
+        """
+        P2Pメッセージを受信し、(生データ, 送信者ID) を返す (デコードは Communication が行う)。
+        生データは受信バッファプールの memoryview で、RECEIVE_POOL_SIZE 回後の受信で上書きされる。
+        保持する場合は bytes() でコピーすること。
+        """
+        index = self._receive_index
+        self._receive_index = (index + 1) % RECEIVE_POOL_SIZE
+        buffer = self._receive_buffers[index]
+
+        # 前回このバッファに受信した部分をクリアしてから書き込ませる
+        # (受信後にクリアすると、返した memoryview の中身まで消えてしまう)
+        if self._receive_lengths[index]:
+            ctypes.memset(self._receive_c_buffers[index], 0, self._receive_lengths[index])
+            self._receive_lengths[index] = 0
+
+        if not self._receive_p2p_message(self._receive_c_buffers[index], RECEIVE_BUFFER_SIZE, self._sender_id_ref):
+            return None, None
+
+        # DLL は NUL 終端で書き込むので、最初の NUL までが受信データ
+        length = buffer.find(0)
+        if length < 0:
+            length = RECEIVE_BUFFER_SIZE
+        if length == 0:
+            print(f"⚠️ Received empty message from {self._sender_id.value}")
+            return None, None
+
+        self._receive_lengths[index] = length
+        data = memoryview(buffer)[:length]
+        if buffer[0] == ESCAPE:
+            out = self._decode_buffers[index]
+            data = memoryview(out)[:cobs_decode_into(data[1:], out)]
+        return data, self._sender_id.value
+
+    def receive_p2p_messages(self, max_messages=None):
+        # まとめて返す場合は RECEIVE_POOL_SIZE 件を超えるとバッファが再利用されるので、1件ずつすぐにコピーする
+        messages = []
+        while max_messages is None or len(messages) < max_messages:
+            raw_data, sender_id = self.receive_p2p_message()
+            if not raw_data:
+                break
+            messages.append((bytes(raw_data), sender_id))
+        return messages
 
     def close_all_p2p_sessions(self):
         self._close_all_p2p_sessions()
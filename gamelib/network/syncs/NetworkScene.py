@@ -1,13 +1,119 @@
+from collections import deque
 from ...game.core.Scene import Scene
 from ...network.NetworkManager import NetworkManager
 from ..NetworkObjectFactory import NetworkObjectFactory
 from .game_objects.NetworkGameObject import NetworkGameObject
+from ..utility.MessageSchema import MessageSchemaRegistry, STR
+from ..utility.MessageRouter import MessageRouter
+from ..utility.ReplicationScheduler import ReplicationScheduler
 
 class NetworkScene(Scene):
     def __init__(self, name, screen):
         super().__init__(name, screen)
         self.network_manager = NetworkManager.get_instance()
-    
+        # (type, network_id) → ハンドラ のルーティングテーブル
+        self.message_router = MessageRouter()
+        # network_id → オブジェクト の索引 (子オブジェクトも含む)
+        self.network_object_index = {}
+        # True なら get_network_object のたびに索引とツリーの走査結果を比較する (デバッグ用)
+        self.debug_check_index = False
+        # SyncVar が変更されたオブジェクト (ネットワークtickで送信してクリアする)
+        self.dirty_objects = set()
+        # ネットワークコンポーネントの差分送信をネットワークtickでまとめて呼ぶ
+        self.replication_scheduler = ReplicationScheduler()
+        # サーバー: 構造 (オブジェクトの追加・削除・親子関係) が変わるたびに増える番号と、その変更の記録
+        # (キャッシュしたシーン同期に、その後の変更だけを追加で送るため)
+        self.scene_version = 0
+        self.structure_log = deque(maxlen=256)  # (scene_version, ("add", エントリ) / ("remove", network_id))
+
+    def end(self):
+        for obj in self.get_network_objects():
+            obj.detach_network_scene()
+        # scene_version は戻さない (以前の版のキャッシュと取り違えないように)
+        self.scene_version += 1
+        self.structure_log.clear()
+        self.message_router.clear()
+        self.network_object_index.clear()
+        self.dirty_objects.clear()
+        self.replication_scheduler.clear()
+        super().end()
+
+    def network_tick(self, tick):
+        """ネットワークtickごとの送信処理 (NetworkManager.network_tick から呼ばれる)"""
+        manager = self.network_manager
+        if manager.is_server and not manager.snapshot_replicator.enabled:
+            self.replication_scheduler.tick(tick)
+        self.flush_sync_vars()
+
+    def flush_sync_vars(self):
+        """変更された SyncVar をオブジェクトごとに1メッセージで送る (サーバーのみ。ネットワークtickごとに呼ばれる)"""
+        if not self.dirty_objects:
+            return
+        # スナップショット同期中は SyncVar もスナップショットで送られる
+        send = self.network_manager.is_server and not self.network_manager.snapshot_replicator.enabled
+        for obj in self.dirty_objects:
+            if send:
+                self.network_manager.broadcast(obj.build_sync_vars_message())
+            obj._sync_dirty = 0
+        self.dirty_objects.clear()
+
+    def register_network_object(self, network_object):
+        """索引に登録 (NetworkGameObject.attach_network_scene から呼ばれる)"""
+        previous = self.network_object_index.get(network_object.network_id)
+        if previous is not None and previous is not network_object:
+            print(f"⚠️ network_id {network_object.network_id} が重複しています: {previous.name} / {network_object.name}")
+        self.network_object_index[network_object.network_id] = network_object
+        if self.network_manager.is_server:
+            self._record_structure_change(("add", self.make_sync_entry(network_object)))
+
+    def unregister_network_object(self, network_object):
+        if self.network_object_index.get(network_object.network_id) is network_object:
+            del self.network_object_index[network_object.network_id]
+            if self.network_manager.is_server:
+                self._record_structure_change(("remove", network_object.network_id))
+
+    # ------------------------
+    # シーンの構造の版
+    # ------------------------
+    @staticmethod
+    def make_sync_entry(network_object):
+        """シーン同期のエントリ [クラス, object_name, network_id, steam_id, parent_id, コンストラクタの引数]"""
+        parent = network_object.parent
+        parent_id = parent.network_id if isinstance(parent, NetworkGameObject) else None
+        class_table = network_object.network_manager.class_table
+        return [class_table.get_class_ref(network_object.__class__), network_object.name,
+                network_object.network_id, network_object.steam_id, parent_id, list(network_object.get_spawn_args())]
+
+    def _record_structure_change(self, change):
+        self.scene_version += 1
+        self.structure_log.append((self.scene_version, change))
+
+    def get_structure_changes(self, since_version):
+        """since_version より後の構造の変更のリスト。記録が残っていなければ None"""
+        if since_version == self.scene_version:
+            return []
+        log = self.structure_log
+        if not log or log[0][0] > since_version + 1:
+            return None
+        return [change for version, change in log if version > since_version]
+
+    def add_object(self, obj):
+        """
+        オブジェクトを追加する。NetworkGameObject なら子オブジェクトも含めて索引・ルーティングに登録する
+        (クライアントには通知しない。シーンの開始時に各ピアで生成するオブジェクト用)
+        """
+        super().add_object(obj)
+        if isinstance(obj, NetworkGameObject):
+            if obj.network_id is None:
+                obj.network_id = self.network_manager.net_id_generator.generate_id()
+            obj.attach_network_scene(self)
+        return obj
+
+    def remove_object(self, obj):
+        super().remove_object(obj)
+        if isinstance(obj, NetworkGameObject):
+            obj.detach_network_scene()
+
     def add_network_object(self, network_object):
         """オブジェクトを追加し、サーバーならクライアントに通知"""
         self.objects.append(network_object)
@@ -15,6 +121,8 @@ class NetworkScene(Scene):
 
         if network_object.network_id is None:
             network_object.network_id = self.network_manager.net_id_generator.generate_id()
+        if isinstance(network_object, NetworkGameObject):
+            network_object.attach_network_scene(self)
 
         if self.network_manager.is_server:
             self.broadcast_add_network_object(network_object)
@@ -30,6 +138,7 @@ class NetworkScene(Scene):
             
             # **親の削除**
             self.objects.remove(network_object)
+            network_object.detach_network_scene()
             
             if self.network_manager.is_server:
                 self.broadcast_remove_network_object(network_object)
@@ -45,7 +154,18 @@ class NetworkScene(Scene):
             self.remove_network_object(obj)
 
     def get_network_object(self, network_id):
-        """`network_id` からオブジェクトを取得 (子オブジェクトも含めて再帰検索)"""
+        """`network_id` からオブジェクトを取得 (子オブジェクトも含む)"""
+        if not network_id:
+            return None
+        obj = self.network_object_index.get(network_id)
+        if self.debug_check_index:
+            found = self.find_network_object(network_id)
+            if found is not obj:
+                print(f"⚠️ network_id {network_id} の索引が不整合です: 索引={obj} 走査={found}")
+        return obj
+
+    def find_network_object(self, network_id):
+        """`network_id` からオブジェクトを取得 (ツリーを再帰検索する。索引の検証用)"""
         if not network_id:
             return None
 
@@ -80,8 +200,13 @@ class NetworkScene(Scene):
         t = message.get("type")
         if t == "add_object":
             self.receive_add_object(message)
+        elif t == "spawn_prefab":
+            self.receive_spawn_prefab(message)
         elif t == "remove_object":
             self.remove_network_object(self.get_network_object(message["network_id"]))
+        elif self.message_router.dispatch(message):
+            # **宛先の network_id を持つハンドラにだけ届ける**
+            pass
         else:
             # **無駄なループを避ける**
             for obj in self.get_network_objects():
@@ -90,10 +215,11 @@ class NetworkScene(Scene):
     def receive_add_object(self, message):
         """クライアント側: サーバーから受け取ったオブジェクトを追加"""
         obj = NetworkObjectFactory.create_object(
-            message["class_name"],
+            message.get("class_id") or message["class_name"],
             message["object_name"],
             message["network_id"],
             message["steam_id"],
+            message.get("args", ()),
         )
 
         if obj:
@@ -104,6 +230,44 @@ class NetworkScene(Scene):
 
             self.add_network_object(obj)
 
+    def receive_spawn_prefab(self, message):
+        """
+        クライアント側: spawn_prefab のサブツリーを生成する (NetworkGameObject.spawn_network_child)。
+        先にサブツリーを組み立ててから根を親 (またはシーン) に追加し、最後にサーバーの状態を適用する
+        """
+        created = []  # [(オブジェクト, 状態), ...]
+        objects = {}  # network_id → オブジェクト
+        root = None
+        for class_ref, object_name, network_id, steam_id, parent_id, args, states in message["objects"]:
+            obj = NetworkObjectFactory.create_object(class_ref, object_name, network_id, steam_id, args)
+            if not obj:
+                if root is None:
+                    return
+                continue
+            if root is None:
+                root = obj
+            else:
+                parent = objects.get(parent_id)
+                if parent is None:
+                    continue  # 親の生成に失敗した
+                parent.add_child(obj)
+                obj.set_parent(parent)
+            objects[network_id] = obj
+            created.append((obj, states))
+        if root is None:
+            return
+
+        parent_obj = self.get_network_object(message.get("parent_id"))
+        if parent_obj:
+            parent_obj.add_child(root, message.get("layer") or 0)  # **サブツリーごと登録される**
+            root.set_parent(parent_obj)
+        else:
+            self.add_network_object(root)
+
+        for obj, states in created:
+            for key, state in states.items():
+                obj.apply_state(key, state)
+
     def broadcast_add_network_object(self, network_object):
         """サーバーが全クライアントにオブジェクト追加を通知"""
         parent_id = network_object.parent.network_id if network_object.parent else None
@@ -113,9 +277,13 @@ class NetworkScene(Scene):
             "object_name": network_object.name,
             "network_id": network_object.network_id,
             "steam_id": network_object.steam_id,
-            "class_name": network_object.__class__.__name__,
             "parent_id": parent_id,  # **親オブジェクトがある場合、その `network_id` を送信**
         }
+        class_ref = self.network_manager.class_table.get_class_ref(network_object.__class__)
+        data["class_id" if isinstance(class_ref, int) else "class_name"] = class_ref
+        spawn_args = network_object.get_spawn_args()
+        if spawn_args:
+            data["args"] = list(spawn_args)  # スキーマにないので JSON で送られる
         self.network_manager.broadcast(data)
 
     def broadcast_remove_network_object(self, network_object):
@@ -125,3 +293,10 @@ class NetworkScene(Scene):
             "network_id": network_object.network_id,
         }
         self.network_manager.broadcast(data)
+
+
+MessageSchemaRegistry.register("add_object", 3, [
+    ("object_name", STR), ("network_id", "I"), ("steam_id", "Q"), ("class_name", STR), ("parent_id", "I"),
+    ("class_id", "H"),
+])
+MessageSchemaRegistry.register("remove_object", 4, [("network_id", "I")])
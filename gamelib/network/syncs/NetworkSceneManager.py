@@ -1,11 +1,24 @@
 from ...game.SceneManager import SceneManager
 from ...network.syncs.NetworkScene import NetworkScene, NetworkGameObject
 from ..NetworkObjectFactory import NetworkObjectFactory
+from ..utility.MessageSchema import MessageSchemaRegistry, STR
+from .SceneSyncStream import SceneSyncStream
 import json
 
 class NetworkSceneManager(SceneManager):
     def __init__(self):
         super().__init__()
+        # シーン同期を何オブジェクトずつのメッセージに分けて送るか
+        self.scene_sync_chunk_size = 32
+        # クライアント: 1フレームでシーン同期のオブジェクト生成に使う時間 (秒)
+        self.scene_sync_budget = 0.004
+        # サーバー: キャッシュしたシーン同期より後の構造の変更がこの数を超えたら作り直す
+        self.scene_sync_max_delta = 64
+        # サーバー: キャッシュしたシーン同期 {"scene", "version", "total", "chunks"}
+        self.scene_snapshot = None
+        self.scene_sync_stream = None  # クライアント: 受信中のシーン同期 (SceneSyncStream)
+        self.scene_sync_version = 0  # クライアント: 最後に受信したシーン同期の版
+        self._scene_sync_coroutine = None
 
     def set_active_network_scene(self, scene_name):
         """シーン変更と自動同期"""
@@ -30,7 +43,8 @@ class NetworkSceneManager(SceneManager):
                 obj_data["class_name"],
                 obj_data["object_name"],
                 obj_data["network_id"],
-                obj_data["steam_id"]
+                obj_data["steam_id"],
+                obj_data.get("args", ())
             )
             if new_obj:
                 object_dict[obj_data["network_id"]] = new_obj
@@ -47,7 +61,63 @@ class NetworkSceneManager(SceneManager):
         # シーン開始
         self.start_objects()
         nm.complete_scene_sync = True
-        nm.send_to_server({"type": "force_sync_network_game_objects_components"})
+        self.scene_sync_version = 0  # 版が分からないので、全体の状態を要求する
+        self.request_full_state(nm)
+
+    # ------------------------
+    # 分割されたシーン同期の受信 (クライアント)
+    # ------------------------
+    def receive_scene_sync_begin(self, nm, message):
+        self.set_active_scene(message["scene_name"])
+        self.current_scene.clear_network_objects()
+        nm.complete_scene_sync = False
+        # 受信中のシーン同期があれば捨てて、最初からやり直す
+        if self._scene_sync_coroutine is not None:
+            nm.coroutine_manager.stop_coroutine(self._scene_sync_coroutine)
+        self.scene_sync_stream = SceneSyncStream(message["version"], message["scene_name"], message["total"])
+        self._scene_sync_coroutine = nm.coroutine_manager.start_coroutine(self._build_scene_sync, nm)
+
+    def receive_scene_sync_chunk(self, message):
+        stream = self.scene_sync_stream
+        if stream is not None and stream.version == message["version"]:
+            stream.add_entries(message["objects"])
+
+    def receive_scene_sync_delta(self, message):
+        stream = self.scene_sync_stream
+        if stream is not None and stream.version == message["version"]:
+            stream.add_entries(message["changes"])
+
+    def receive_scene_sync_end(self, message):
+        stream = self.scene_sync_stream
+        if stream is not None and stream.version == message["version"]:
+            stream.received_all = True
+
+    def get_scene_sync_progress(self):
+        """受信中のシーン同期の (生成済みの数, 全体の数)。受信中でなければ None"""
+        stream = self.scene_sync_stream
+        if stream is None:
+            return None
+        return stream.processed, stream.total
+
+    def _build_scene_sync(self, nm):
+        """受信したエントリから、1フレーム scene_sync_budget 秒ずつオブジェクトを生成するコルーチン"""
+        while self.scene_sync_stream is not None:
+            stream = self.scene_sync_stream
+            if stream.build(self.scene_sync_budget):
+                nm.global_event_manager.trigger_event(
+                    "SceneSyncProgress", scene_name=stream.scene_name, built=stream.processed, total=stream.total)
+            if stream.complete:
+                self.scene_sync_stream = None
+                self._scene_sync_coroutine = None
+                stream.finish(self.current_scene)
+                # シーン開始
+                self.start_objects()
+                nm.complete_scene_sync = True
+                nm.global_event_manager.trigger_event("SceneSyncComplete", scene_name=stream.scene_name)
+                self.scene_sync_version = stream.version
+                self.request_full_state(nm)
+                return
+            yield None
 
     def _apply_parent_relationships(self, object_dict, parent_map):
         """親子関係を適用 (NetworkGameObject のみ)"""
@@ -62,26 +132,96 @@ class NetworkSceneManager(SceneManager):
 
 
     def send_network_scene_sync(self, network_manager, target_client_id):
-        """現在のシーンのデータを送信する (サーバー専用)"""
+        """
+        現在のシーンのデータを送信する (サーバー専用)。
+        オブジェクトの一覧は scene_sync_chunk_size 個ずつの scene_sync_chunk に分けて送り、
+        クライアントは届いた分から数フレームに分けて生成する。
+        一覧はシーンの版 (scene_version) ごとにキャッシュして、同時に参加したクライアントで使い回す。
+        キャッシュより後の構造の変更は scene_sync_delta で追加で送る。
+        """
         if not isinstance(self.current_scene, NetworkScene):
             print("エラー: ネットワーク対応のシーンのみ送信可能")
             return False
 
+        # クラスIDの表を先に送る (セッションで1回)
+        class_table = network_manager.class_table
+        class_table.send_to(target_client_id)
+        snapshot, changes = self.get_scene_snapshot(network_manager)
+        version = snapshot["version"]
+        chunks = snapshot["chunks"]
+        changes = [value for kind, value in changes]
+        if not class_table.is_acked(target_client_id):
+            # 表の ack がまだのクライアントにはクラス名で送る (キャッシュのチャンクはそのまま)
+            chunks = [{**message, "objects": class_table.to_names(message["objects"])} for message in chunks]
+            changes = class_table.to_names(changes)
+        network_manager.send_to_client(target_client_id, {
+            "type": "scene_sync_begin",
+            "version": version,
+            "scene_name": snapshot["scene"].name,
+            "total": snapshot["total"] + len(changes),
+        })
+        for message in chunks:
+            network_manager.send_to_client(target_client_id, message)
+        if changes:
+            network_manager.send_to_client(target_client_id, {
+                "type": "scene_sync_delta",
+                "version": version,
+                # 追加はエントリ、削除は network_id
+                "changes": changes,
+            })
+        network_manager.send_to_client(target_client_id, {"type": "scene_sync_end", "version": version})
+        return True
+
+    def get_scene_snapshot(self, network_manager):
+        """
+        キャッシュしたシーン同期と、その後の構造の変更のリストを返す。
+        キャッシュがない・別のシーン・変更が多すぎる (記録が残っていない) 場合は作り直す。
+        """
+        scene = self.current_scene
+        snapshot = self.scene_snapshot
+        if snapshot is not None and snapshot["scene"] is scene:
+            changes = scene.get_structure_changes(snapshot["version"])
+            if changes is not None and len(changes) <= self.scene_sync_max_delta:
+                return snapshot, changes
+
         # **シリアライズ用のオブジェクトリスト**
-        network_objects = self.current_scene.get_network_objects()
-        serialized_objects = []
+        entries = self._serialize_entries(scene)
+
+        size = self.scene_sync_chunk_size
+        chunks = [{
+            "type": "scene_sync_chunk",
+            "version": scene.scene_version,
+            "objects": entries[start:start + size],
+        } for start in range(0, len(entries), size)]
+
+        # チャンクは同じ dict のまま送るので、エンコードも1回で済ませる
+        send_queue = network_manager.send_queue
+        if snapshot is not None:
+            for message in snapshot["chunks"]:
+                send_queue.unpin(message)
+        for message in chunks:
+            send_queue.pin(message)
+
+        self.scene_snapshot = {"scene": scene, "version": scene.scene_version, "total": len(entries), "chunks": chunks}
+        return self.scene_snapshot, []
+
+    def _serialize_entries(self, scene):
+        """シーン同期のエントリ [クラス, object_name, network_id, steam_id, parent_id, コンストラクタの引数] (親が先)"""
+        entries = []
+        for obj in scene.get_network_objects():
+            for data in self._serialize_object_tree(obj):
+                entries.append([data["class_name"], data["object_name"], data["network_id"],
+                                data["steam_id"], data["parent_id"], data["args"]])
+        return entries
+
+    def _walk_network_objects(self, scene):
+        """シーンのツリーの NetworkGameObject (親が先。_serialize_entries と同じ順番・同じオブジェクト)"""
+        stack = list(reversed(scene.get_network_objects()))
+        while stack:
+            obj = stack.pop()
+            yield obj
+            stack.extend(child for child in reversed(obj.children) if isinstance(child, NetworkGameObject))
 
-        for obj in network_objects:
-            serialized_objects.extend(self._serialize_object_tree(obj))
-
-        scene_data = {
-            "type": "scene_sync",
-            "scene_name": self.current_scene.name,
-            "scene_data": {
-                "objects": serialized_objects
-            }
-        }
-        network_manager.send_to_client(target_client_id, scene_data)
     def _serialize_object_tree(self, obj):
         """オブジェクトとすべての子オブジェクトを再帰的にシリアライズ"""
         serialized_objects = []
@@ -93,11 +233,12 @@ class NetworkSceneManager(SceneManager):
             return
 
         serialized_list.append({
-            "class_name": obj.__class__.__name__,
+            "class_name": obj.network_manager.class_table.get_class_ref(obj.__class__),  # クラスIDを使えれば ID
             "object_name": obj.name,
             "network_id": obj.network_id,
             "steam_id": obj.steam_id,
-            "parent_id": parent_id
+            "parent_id": parent_id,
+            "args": list(obj.get_spawn_args()),
         })
 
         # **子供が `NetworkGameObject` の場合のみ再帰処理**
@@ -116,19 +257,141 @@ class NetworkSceneManager(SceneManager):
     def receive_message(self, network_manager, message):
         """受信メッセージの処理"""
         t = message.get("type")
-        if t == "scene_sync":
+        if t == "scene_sync_begin":
+            self.receive_scene_sync_begin(network_manager, message)
+        elif t == "scene_sync_chunk":
+            self.receive_scene_sync_chunk(message)
+        elif t == "scene_sync_delta":
+            self.receive_scene_sync_delta(message)
+        elif t == "scene_sync_end":
+            self.receive_scene_sync_end(message)
+        elif t == "scene_sync":
+            # 一括のシーン同期 (旧形式)
             self.receive_network_scene_sync(network_manager, message)
         elif t == "request_scene_sync":
             self.send_network_scene_sync(network_manager, message["sender_id"])
         elif t == "force_sync_network_game_objects_components":
-            self.force_sync_objects(network_manager)
+            if message.get("sender_id"):
+                self.send_full_state(network_manager, message["sender_id"], message.get("version", 0))
+            else:
+                self.force_sync_objects(network_manager)
+        elif t == "full_state":
+            self.receive_full_state(message)
 
         else:
             if hasattr(self.current_scene, "receive_message"):
                 self.current_scene.receive_message(message)
 
+    # ------------------------
+    # 全体の状態の再同期 (シーン同期の完了後)
+    # ------------------------
+    def request_full_state(self, network_manager):
+        """クライアント: 全オブジェクトの状態を (自分宛てにだけ) 送ってもらう"""
+        network_manager.send_to_server({
+            "type": "force_sync_network_game_objects_components",
+            "sender_id": network_manager.local_steam_id,
+            "version": self.scene_sync_version,
+        })
+
+    def send_full_state(self, network_manager, target_client_id, version):
+        """
+        サーバー: 全オブジェクトの状態を1つのメッセージ (full_state) にまとめて target_client_id にだけ送る。
+        クライアントが受信したシーン同期の版 (version) 以降の構造の変更も一緒に送る。
+        版が 0 (不明) か変更の記録が残っていなければ全オブジェクトのエントリを送り、クライアントはそれ以外を削除する。
+        """
+        scene = self.current_scene
+        if not isinstance(scene, NetworkScene):
+            return False
+
+        changes = scene.get_structure_changes(version) if version else None
+        complete = changes is None
+        if complete:
+            changes = self._serialize_entries(scene)
+        else:
+            changes = [value for kind, value in changes]
+        if not network_manager.class_table.is_acked(target_client_id):
+            changes = network_manager.class_table.to_names(changes)
+
+        # 状態はツリーから集める (エントリと同じオブジェクトの一覧になる)
+        states = [[obj.network_id, obj.active, obj.steam_id, obj.layer, obj.capture_state()]
+                  for obj in self._walk_network_objects(scene)]
+        network_manager.send_to_client(target_client_id, {
+            "type": "full_state",
+            "version": scene.scene_version,
+            "complete": complete,
+            "changes": changes,  # 追加はエントリ、削除は network_id (scene_sync_delta と同じ)
+            "states": states,
+        })
+        return True
+
+    def receive_full_state(self, message):
+        """クライアント: full_state の構造の変更と状態を適用する"""
+        scene = self.current_scene
+        if not isinstance(scene, NetworkScene):
+            return
+        changes = message["changes"]
+        if message["complete"]:
+            # **サーバーにないオブジェクトを削除**
+            listed = {change[2] for change in changes if not isinstance(change, int)}
+            if self._is_complete_listing(scene, listed, message["states"]):
+                for obj in list(scene.network_object_index.values()):
+                    if obj.network_id not in listed:
+                        self._remove_synced_object(scene, obj)
+
+        for change in changes:
+            if isinstance(change, int):
+                obj = scene.get_network_object(change)
+                if obj is not None:
+                    self._remove_synced_object(scene, obj)
+            elif scene.get_network_object(change[2]) is None:
+                self._add_synced_object(scene, *change)
+
+        for network_id, active, steam_id, layer, states in message["states"]:
+            obj = scene.get_network_object(network_id)
+            if obj is None:
+                continue
+            obj.active = active
+            obj.steam_id = steam_id
+            obj.layer = layer
+            for key, state in states.items():
+                obj.apply_state(key, state)
+        self.scene_sync_version = message["version"]
+
+    def _is_complete_listing(self, scene, listed, states):
+        """
+        full_state のエントリの一覧が、手元のオブジェクトを削除してよいほど揃っているか。
+        空の一覧や、状態だけ送られてきたオブジェクトがある一覧は、サーバー側の索引の不備とみなして削除しない
+        """
+        if not listed and scene.network_object_index:
+            print(f"⚠️ full_state のオブジェクト一覧が空です。{len(scene.network_object_index)} 個のオブジェクトを残します")
+            return False
+        unlisted = [state[0] for state in states if state[0] not in listed]
+        if unlisted:
+            print(f"⚠️ full_state のオブジェクト一覧が不完全です (一覧にない状態: {unlisted[:8]})。オブジェクトを削除しません")
+            return False
+        return True
+
+    def _add_synced_object(self, scene, class_name, object_name, network_id, steam_id, parent_id, args=()):
+        obj = NetworkObjectFactory.create_object(class_name, object_name, network_id, steam_id, args)
+        if not obj:
+            return
+        parent = scene.get_network_object(parent_id)
+        if isinstance(parent, NetworkGameObject) and isinstance(obj, NetworkGameObject):
+            parent.add_child(obj)  # **親子関係を適用**
+            obj.set_parent(parent)
+        else:
+            scene.add_network_object(obj)
+
+    def _remove_synced_object(self, scene, obj):
+        if obj.network_scene is not scene:
+            return  # 親と一緒に削除済み
+        if isinstance(obj.parent, NetworkGameObject):
+            obj.parent.remove_child(obj)
+        else:
+            scene.remove_network_object(obj)
+
     def force_sync_objects(self, network_manager):
-        """サーバーの NetworkGameObject と同期"""
+        """サーバーの NetworkGameObject と同期 (sender_id のない旧形式の要求。全クライアントに送られる)"""
         existing_ids = {obj.network_id for obj in self.current_scene.get_network_objects()}
         new_ids = set()
 
@@ -141,3 +404,9 @@ class NetworkSceneManager(SceneManager):
             obj = self.current_scene.get_network_object(extra_id)
             if obj:
                 self.current_scene.remove_network_object(obj)
+
+
+MessageSchemaRegistry.register("request_scene_sync", 10, [("sender_id", "Q")])
+MessageSchemaRegistry.register("force_sync_network_game_objects_components", 11, [("sender_id", "Q"), ("version", "I")])
+MessageSchemaRegistry.register("scene_sync_begin", 17, [("version", "I"), ("scene_name", STR), ("total", "I")])
+MessageSchemaRegistry.register("scene_sync_end", 18, [("version", "I")])
@@ -0,0 +1,76 @@
+import time
+from collections import deque
+from ..NetworkObjectFactory import NetworkObjectFactory
+from .game_objects.NetworkGameObject import NetworkGameObject
+
+
+class SceneSyncStream:
+    """
+    クライアント側: 分割して届くシーン同期 (scene_sync_chunk) から、数フレームに分けてオブジェクトを生成する。
+    エントリは [クラス, object_name, network_id, steam_id, parent_id, コンストラクタの引数] で、親が子より先に並んでいる。
+    エントリの代わりに network_id (int) があれば、そこまでに生成したそのオブジェクトを取り除く
+    (キャッシュされたシーン同期の後の変更 scene_sync_delta)。
+    生成したオブジェクトはすぐに親に追加し、親を持たないものは最後にまとめてシーンに追加する
+    (途中のオブジェクトが update されないように)。
+    """
+    def __init__(self, version, scene_name, total):
+        self.version = version  # サーバーのシーンの版 (scene_version)
+        self.scene_name = scene_name
+        self.total = total
+        self.entries = deque()  # 受信済み・未生成のエントリ
+        self.objects = {}  # network_id → 生成したオブジェクト
+        self.roots = []
+        self.processed = 0
+        self.received_all = False  # scene_sync_end を受信した
+
+    @property
+    def complete(self):
+        return self.received_all and not self.entries
+
+    def add_entries(self, entries):
+        self.entries.extend(entries)
+
+    def build(self, budget_time):
+        """budget_time 秒まで (最低1個) オブジェクトを生成する。生成した数を返す"""
+        deadline = time.perf_counter() + budget_time
+        count = 0
+        entries = self.entries
+        while entries:
+            entry = entries.popleft()
+            if isinstance(entry, int):
+                self._remove_object(entry)
+            else:
+                self._build_object(*entry)
+            count += 1
+            if time.perf_counter() >= deadline:
+                break
+        self.processed += count
+        return count
+
+    def _build_object(self, class_name, object_name, network_id, steam_id, parent_id, args=()):
+        obj = NetworkObjectFactory.create_object(class_name, object_name, network_id, steam_id, args)
+        if not obj:
+            return
+        self.objects[network_id] = obj
+        if parent_id is None:
+            self.roots.append(obj)
+            return
+        # **親子関係を適用** (親の生成に失敗していたら捨てる)
+        parent = self.objects.get(parent_id)
+        if isinstance(parent, NetworkGameObject) and isinstance(obj, NetworkGameObject):
+            parent.add_child(obj)
+            obj.set_parent(parent)
+
+    def _remove_object(self, network_id):
+        obj = self.objects.pop(network_id, None)
+        if obj is None:
+            return
+        if obj in self.roots:
+            self.roots.remove(obj)
+        elif obj.parent is not None:
+            obj.parent.remove_child(obj)
+
+    def finish(self, scene):
+        """親を持たないオブジェクトをシーンに追加する"""
+        for obj in self.roots:
+            scene.add_network_object(obj)
@@ -3,7 +3,22 @@ from ....game.component.Component import Component
 class NetworkComponent(Component):
     def __init__(self, game_object):
         super().__init__(game_object)
+    def get_message_routes(self):
+        """ルーティングテーブルに登録するハンドラ {type: ハンドラ} (game_object の network_id 宛てのみ届く)"""
+        return {}
+    def capture_state(self):
+        """スナップショット用の状態 {フィールド: 値} (同期する状態がなければ None)"""
+        return None
+    def apply_state(self, state):
+        """スナップショットの状態 (変化したフィールドのみ) を適用する"""
+        pass
+    def replicate(self):
+        """前回から変化した状態を送る (サーバー。ReplicationScheduler から game_object の送信間隔で呼ばれる)"""
+        pass
     def receive_message(self, message):
         pass
     def force_sync(self):
+        pass
+    def mark_synced(self):
+        """現在の状態を送信済みとして扱う (次の replicate で差分として送らない)"""
         pass
\ No newline at end of file
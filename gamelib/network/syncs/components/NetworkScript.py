@@ -61,6 +61,9 @@ class NetworkScript(NetworkComponent):
     # -------------------------------
     # ネットワークデータ受信処理
     # -------------------------------
+    def get_message_routes(self):
+        return {"NETWORK_SCRIPT": self.receive_network_data}
+
     def receive_network_data(self, message):
         if message.get("type") == "NETWORK_SCRIPT" and message.get("network_id") == self.game_object.network_id:
             command = message.get("command")
@@ -1,9 +1,9 @@
-import time
 from .NetworkComponent import NetworkComponent
 from ....game.component.Sprite import Sprite
+from ...utility.MessageSchema import MessageSchemaRegistry, STR
 
 class NetworkSprite(NetworkComponent):
-    def __init__(self, game_object, sync_interval=0.1):
+    def __init__(self, game_object):
         super().__init__(game_object)
         self.sprite = game_object.get_component(Sprite)
 
@@ -12,16 +12,8 @@ class NetworkSprite(NetworkComponent):
         self.last_synced_base_size = self.sprite.base_size
         self.last_synced_alpha = 255  # デフォルトは不透明
 
-        self.sync_interval = sync_interval  # 同期間隔 (秒)
-        self.last_sync_time = time.time()
-
-    def update(self, delta_time):
-        current_time = time.time()
-
-        if self.game_object.network_manager.is_server:
-            if current_time - self.last_sync_time >= self.sync_interval:
-                self.sync_if_needed()
-                self.last_sync_time = current_time
+    def replicate(self):
+        self.sync_if_needed()
 
     def sync_if_needed(self):
         sync_data = {
@@ -48,6 +40,11 @@ class NetworkSprite(NetworkComponent):
         # 差分がある場合のみ送信
         if len(sync_data) > 2:
             self.game_object.network_manager.broadcast(sync_data)
+    def mark_synced(self):
+        self.last_synced_image_path = self.sprite.image_path
+        self.last_synced_base_size = self.sprite.base_size
+        self.last_synced_alpha = self.sprite.transformed_image.get_alpha() if self.sprite.transformed_image else 255
+
     def force_sync(self):
         """
         強制的にすべての同期データを送信
@@ -62,20 +59,41 @@ class NetworkSprite(NetworkComponent):
 
         self.game_object.network_manager.broadcast(force_sync_data)
 
+    def capture_state(self):
+        return {
+            "image_path": self.sprite.image_path,
+            "base_size": [self.sprite.base_size.x, self.sprite.base_size.y],
+            "alpha": self.sprite.transformed_image.get_alpha() if self.sprite.transformed_image else 255,
+        }
+
+    def apply_state(self, state):
+        self.receive_sync_sprite(state)
+
+    def get_message_routes(self):
+        return {"sync_sprite": self.receive_sync_sprite}
+
     def receive_message(self, message):
+        if message.get("type") == "sync_sprite" and message.get("network_id") == self.game_object.network_id:
+            self.receive_sync_sprite(message)
+
+    def receive_sync_sprite(self, message):
         """
         クライアント側で同期データを受信したときに呼び出される
         """
-        if message.get("type") == "sync_sprite" and message.get("network_id") == self.game_object.network_id:
-            # 画像パスの更新
-            if "image_path" in message:
-                self.sprite.load_image(message["image_path"])
-
-            # 基準サイズの更新
-            if "base_size" in message:
-                self.sprite.apply_base_size(message["base_size"])
-
-            # 透明度の更新
-            if "alpha" in message:
-                if self.sprite.transformed_image:
-                    self.sprite.transformed_image.set_alpha(message["alpha"])
+        # 画像パスの更新
+        if "image_path" in message:
+            self.sprite.load_image(message["image_path"])
+
+        # 基準サイズの更新
+        if "base_size" in message:
+            self.sprite.apply_base_size(message["base_size"])
+
+        # 透明度の更新
+        if "alpha" in message:
+            if self.sprite.transformed_image:
+                self.sprite.transformed_image.set_alpha(message["alpha"])
+
+
+MessageSchemaRegistry.register("sync_sprite", 6, [
+    ("network_id", "I"), ("image_path", STR), ("base_size", "2f"), ("alpha", "B"),
+], sparse=True, coalesce=True)
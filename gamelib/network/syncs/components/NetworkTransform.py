@@ -1,10 +1,18 @@
-import time
 from .NetworkComponent import NetworkComponent
 from ....game.component.Transform import Transform
+from ...utility.MessageSchema import MessageSchemaRegistry
+from ...utility.TransformQuantization import TransformQuantization  # sync_transform_q のスキーマ登録も兼ねる
+from ...utility.SnapshotBuffer import SnapshotBuffer
 from pygame import Vector2, Vector3
 
+TRANSFORM_FIELDS = (
+    "position_x", "position_y", "position_z",
+    "scale_x", "scale_y",
+    "rotation_x", "rotation_y", "rotation_z",
+)
+
 class NetworkTransform(NetworkComponent):
-    def __init__(self, game_object, sync_interval=0.05):
+    def __init__(self, game_object):
         super().__init__(game_object)
         self.transform = game_object.get_component(Transform)
 
@@ -13,16 +21,22 @@ class NetworkTransform(NetworkComponent):
         self._last_synced_scale = Vector2(self.transform.local_scale)
         self._last_synced_rotation = Vector3(self.transform.local_rotation)
 
-        self.sync_interval = sync_interval  # 同期間隔 (秒)
-        self.last_sync_time = time.time()
+        # クライアント: 受信した状態をサーバー時刻つきで溜めて、interpolation_delay 遅れで補間して表示する
+        self.buffer = SnapshotBuffer()
 
-    def update(self, delta_time):
-        current_time = time.time()
+    def replicate(self):
+        self.sync_if_needed()
 
-        if self.game_object.network_manager.is_server:
-            if current_time - self.last_sync_time >= self.sync_interval:
-                self.sync_if_needed()
-                self.last_sync_time = current_time
+    def update(self, delta_time):
+        if not self.buffer.active:
+            return
+        network_manager = self.game_object.network_manager
+        server_time = network_manager.ping_meter.server_time()
+        if server_time is None:
+            return
+        state = self.buffer.sample(server_time - network_manager.interpolation_delay,
+                                   network_manager.max_extrapolation)
+        self.apply_transform(state)
 
     def sync_if_needed(self):
         # 現在の Transform 状態を取得
@@ -70,7 +84,25 @@ class NetworkTransform(NetworkComponent):
 
         # 変更があればクライアントに送信
         if len(sync_data) > 2:  # "type" と "network_id" 以外のデータが含まれている場合
-            self.game_object.network_manager.broadcast(sync_data)
+            self.broadcast_sync(sync_data)
+
+    def mark_synced(self):
+        self._last_synced_position = Vector3(self.transform.get_local_position())
+        self._last_synced_scale = Vector2(self.transform.local_scale)
+        self._last_synced_rotation = Vector3(self.transform.local_rotation)
+
+    def get_quantization(self):
+        """game_object の transform_quantization (TransformQuantization / None)"""
+        return getattr(self.game_object, "transform_quantization", None)
+
+    def broadcast_sync(self, sync_data):
+        """量子化の設定があれば sync_transform_q で、量子化できなければそのまま送る"""
+        quantization = self.get_quantization()
+        if quantization is not None:
+            quantized = quantization.encode(sync_data)
+            if quantized is not None:
+                sync_data = quantized
+        self.game_object.network_manager.broadcast(sync_data)
 
     def force_sync(self):
         position = self.transform.get_local_position()
@@ -90,36 +122,85 @@ class NetworkTransform(NetworkComponent):
             "rotation_z": rotation.z
         }
 
-        self.game_object.network_manager.broadcast(force_sync_data)
-
-    def receive_message(self, message):
-        """
-        クライアント側で同期データを受信したときに呼び出される
-        """
-        if message.get("type") == "sync_transform" and message.get("network_id") == self.game_object.network_id:
-            # 位置の更新
-            if "position_x" in message:
-                self.transform.set_local_position(Vector3(message["position_x"], self.transform.local_position.y, self.transform.local_position.z))
-
-            if "position_y" in message:
-                self.transform.set_local_position(Vector3(self.transform.local_position.x, message["position_y"], self.transform.local_position.z))
+        self.broadcast_sync(force_sync_data)
 
-            if "position_z" in message:
-                self.transform.set_local_position(Vector3(self.transform.local_position.x, self.transform.local_position.y, message["position_z"]))
+    def capture_state(self):
+        position = self.transform.get_local_position()
+        scale = self.transform.local_scale
+        rotation = self.transform.local_rotation
+        return {
+            "position_x": position.x, "position_y": position.y, "position_z": position.z,
+            "scale_x": scale.x, "scale_y": scale.y,
+            "rotation_x": rotation.x, "rotation_y": rotation.y, "rotation_z": rotation.z,
+        }
 
-            # スケールの更新
-            if "scale_x" in message:
-                self.transform.set_local_scale(Vector2(message["scale_x"], self.transform.local_scale.y))
+    def apply_state(self, state):
+        self.receive_sync_transform(state)
 
-            if "scale_y" in message:
-                self.transform.set_local_scale(Vector2(self.transform.local_scale.x, message["scale_y"]))
+    def get_message_routes(self):
+        return {
+            "sync_transform": self.receive_sync_transform,
+            "sync_transform_q": self.receive_sync_transform_q,
+        }
 
-            # 回転の更新
-            if "rotation_x" in message:
-                self.transform.set_local_rotation(Vector3(message["rotation_x"], self.transform.local_rotation.y, self.transform.local_rotation.z))
+    def receive_sync_transform_q(self, message):
+        quantization = self.get_quantization()
+        if quantization is None:
+            print(f"⚠️ {self.game_object.name}: transform_quantization が未設定のため sync_transform_q を無視します")
+            return
+        self.receive_sync_transform(quantization.decode(message))
 
-            if "rotation_y" in message:
-                self.transform.set_local_rotation(Vector3(self.transform.local_rotation.x, message["rotation_y"], self.transform.local_rotation.z))
+    def receive_message(self, message):
+        if message.get("type") == "sync_transform" and message.get("network_id") == self.game_object.network_id:
+            self.receive_sync_transform(message)
 
-            if "rotation_z" in message:
-                self.transform.set_local_rotation(Vector3(self.transform.local_rotation.x, self.transform.local_rotation.y, message["rotation_z"]))
+    def receive_sync_transform(self, message):
+        """
+        クライアント側で同期データを受信したときに呼び出される
+        (サーバー時刻が分かっていれば補間バッファに積み、update で遅れて適用する)
+        """
+        ping_meter = self.game_object.network_manager.ping_meter
+        message_time = ping_meter.message_server_time
+        if (not self.game_object.interpolate_transform or message_time is None
+                or ping_meter.server_time_offset is None):
+            self.apply_transform(message)
+            return
+        self.buffer.push(message_time, {field: message[field] for field in TRANSFORM_FIELDS if field in message})
+
+    def apply_transform(self, message):
+        """同期データを Transform に適用する"""
+        # 位置の更新
+        if "position_x" in message:
+            self.transform.set_local_position(Vector3(message["position_x"], self.transform.local_position.y, self.transform.local_position.z))
+
+        if "position_y" in message:
+            self.transform.set_local_position(Vector3(self.transform.local_position.x, message["position_y"], self.transform.local_position.z))
+
+        if "position_z" in message:
+            self.transform.set_local_position(Vector3(self.transform.local_position.x, self.transform.local_position.y, message["position_z"]))
+
+        # スケールの更新
+        if "scale_x" in message:
+            self.transform.set_local_scale(Vector2(message["scale_x"], self.transform.local_scale.y))
+
+        if "scale_y" in message:
+            self.transform.set_local_scale(Vector2(self.transform.local_scale.x, message["scale_y"]))
+
+        # 回転の更新
+        if "rotation_x" in message:
+            self.transform.set_local_rotation(Vector3(message["rotation_x"], self.transform.local_rotation.y, self.transform.local_rotation.z))
+
+        if "rotation_y" in message:
+            self.transform.set_local_rotation(Vector3(self.transform.local_rotation.x, message["rotation_y"], self.transform.local_rotation.z))
+
+        if "rotation_z" in message:
+            self.transform.set_local_rotation(Vector3(self.transform.local_rotation.x, self.transform.local_rotation.y, message["rotation_z"]))
+
+
+# 位置は float32 (ピクセル単位なら ±16777216 までの整数は正確、小数部は座標が大きいほど丸められる)
+MessageSchemaRegistry.register("sync_transform", 5, [
+    ("network_id", "I"),
+    ("position_x", "f"), ("position_y", "f"), ("position_z", "f"),
+    ("scale_x", "f"), ("scale_y", "f"),
+    ("rotation_x", "f"), ("rotation_y", "f"), ("rotation_z", "f"),
+], sparse=True, coalesce=True)
@@ -3,11 +3,34 @@ from ...NetworkManager import NetworkManager
 from ..components.NetworkTransform import NetworkTransform
 from ..components.NetworkComponent import NetworkComponent
 from ...NetworkObjectFactory import NetworkObjectFactory
+from ...utility.MessageSchema import MessageSchemaRegistry, STR
+from ...utility.MessageRouter import MessageRouter
+from ...utility.SyncVar import SyncVar
 
 class NetworkGameObject(GameObject):
+    # NetworkTransform の量子化設定 (TransformQuantization)。None なら float のまま送る
+    transform_quantization = None
+    # クライアントで NetworkTransform の同期を補間して表示するか (False なら受信した値をすぐ適用する)
+    interpolate_transform = True
+    # ネットワークコンポーネントの送信間隔 (ReplicationScheduler.TIERS のキー。None なら差分送信しない)
+    replication_tier = "normal"
+    # 同じtickに送信するオブジェクトの中での優先度 (大きいほど先に送る)
+    replication_priority = 0
+    # クライアントで生成するときにコンストラクタに渡す引数の名前 (値は get_spawn_args で送る)
+    spawn_args = ()
+
+    # **サーバーから同期する属性** (代入されるとネットワークtickで sync_vars として送られる)
+    active = SyncVar()
+    steam_id = SyncVar()
+    layer = SyncVar()
+
     def __init__(self, name="network_object", active=True, parent=None, network_id=None, steam_id=None):
         self.network_manager = NetworkManager.get_instance()
-        
+        # 登録先の NetworkScene (シーンに追加されると設定される)
+        self.network_scene = None
+        self._message_routes = []  # 登録中の (type, ハンドラ)
+        self._sync_dirty = 0  # 変更された SyncVar のビットマスク
+
         if network_id is None:
             self.network_id = self.network_manager.net_id_generator.generate_id()
         else:
@@ -19,11 +42,6 @@ class NetworkGameObject(GameObject):
 
         self.add_component(NetworkTransform)
 
-        # **状態の変更をトラッキング**
-        self._previous_active = self.active
-        self._previous_steam_id = self.steam_id
-        self._previous_layer = self.layer  # **layer の変更を監視**
-
     def end(self):
         super().end()
         self.initialized = False
@@ -39,8 +57,186 @@ class NetworkGameObject(GameObject):
         return network_components
 
 
+    # ------------------------
+    # 差分送信 (ReplicationScheduler)
+    # ------------------------
+    def replicate(self):
+        """ネットワークコンポーネントの差分を送る (サーバー。replication_tier の間隔でスケジューラから呼ばれる)"""
+        for component in self.get_network_components():
+            component.replicate()
+
+    def set_replication_tier(self, tier, priority=None):
+        """送信間隔のティア (と優先度) を変更する"""
+        self.replication_tier = tier
+        if priority is not None:
+            self.replication_priority = priority
+        if self.network_scene is not None:
+            self.network_scene.replication_scheduler.add(self)
+
+    # ------------------------
+    # SyncVar
+    # ------------------------
+    @classmethod
+    def get_sync_vars(cls):
+        """このクラスの SyncVar の一覧 [(名前, SyncVar), ...] (基底クラスの分が先。ビットの順番)"""
+        sync_vars = cls.__dict__.get("_sync_vars")
+        if sync_vars is None:
+            sync_vars = []
+            names = set()
+            for klass in reversed(cls.__mro__):
+                for name, value in vars(klass).items():
+                    if isinstance(value, SyncVar) and name not in names:
+                        names.add(name)
+                        sync_vars.append((name, value))
+            cls._sync_vars = sync_vars
+            cls._sync_var_bits = {name: 1 << bit for bit, (name, _) in enumerate(sync_vars)}
+        return sync_vars
+
+    @classmethod
+    def get_sync_var_bits(cls):
+        """{名前: ビット}"""
+        if "_sync_var_bits" not in cls.__dict__:
+            cls.get_sync_vars()
+        return cls._sync_var_bits
+
+    def build_sync_vars_message(self, mask=None):
+        """mask (省略時は dirty なもの) の SyncVar を1つのメッセージにまとめる"""
+        if mask is None:
+            mask = self._sync_dirty
+        values = []
+        for bit, (name, sync_var) in enumerate(self.get_sync_vars()):
+            if mask & (1 << bit):
+                values.append(sync_var.encode(self.__dict__.get(name)))
+        return {"type": "sync_vars", "network_id": self.network_id, "mask": mask, "values": values}
+
+    def receive_sync_vars(self, message):
+        mask = message["mask"]
+        values = iter(message["values"])
+        for bit, (name, sync_var) in enumerate(self.get_sync_vars()):
+            if mask & (1 << bit):
+                self._apply_sync_var(name, sync_var, next(values))
+        self.on_sync_vars_received(mask)
+
+    def on_sync_vars_received(self, mask):
+        """クライアント: サーバーから SyncVar (mask のビットのもの) をまとめて受信した後に呼ばれる"""
+        pass
+
+    def _apply_sync_var(self, name, sync_var, value):
+        # 受信した値は dirty にしない (__dict__ に直接書く)
+        self.__dict__[name] = sync_var.decode(value)
+        if sync_var.on_change:
+            getattr(self, sync_var.on_change)()
+
+    # ------------------------
+    # メッセージのルーティング
+    # ------------------------
+    def get_message_routes(self):
+        """
+        ルーティングテーブルに登録するハンドラ {type: ハンドラ}。
+        登録した type のメッセージは、この network_id 宛てのものだけがハンドラに直接届く
+        (receive_message には届かない)。サブクラスで追加する場合は super() の結果に足すこと。
+        """
+        return {
+            "sync_vars": self.receive_sync_vars,
+            "sync_network_object": self.receive_sync_state,
+            "add_network_child": self.handle_add_network_child,
+            "remove_network_child": self.receive_remove_network_child,
+        }
+
+    def attach_network_scene(self, scene):
+        """
+        自身と子オブジェクトをシーンに登録する
+        (network_id の索引と、自身・ネットワークコンポーネントのハンドラのルーティングテーブル)
+        """
+        if self.network_scene is scene:
+            return
+        if self.network_scene is not None:
+            self.detach_network_scene()
+        self.network_scene = scene
+        scene.register_network_object(self)
+        if self._sync_dirty:
+            scene.dirty_objects.add(self)
+        scene.replication_scheduler.add(self)
+        self._add_routes(self.get_message_routes())
+        for component in self.get_network_components():
+            self._add_routes(component.get_message_routes())
+        for child in self.children:
+            if isinstance(child, NetworkGameObject):
+                child.attach_network_scene(scene)
+
+    def detach_network_scene(self):
+        """attach_network_scene での登録を (子オブジェクトの分も) 解除する"""
+        if self.network_scene is None:
+            return
+        router = self.network_scene.message_router
+        for message_type, handler in self._message_routes:
+            router.remove_route(message_type, self.network_id, handler)
+        self._message_routes = []
+        self.network_scene.unregister_network_object(self)
+        self.network_scene.dirty_objects.discard(self)
+        self.network_scene.replication_scheduler.remove(self)
+        self.network_scene = None
+        for child in self.children:
+            if isinstance(child, NetworkGameObject):
+                child.detach_network_scene()
+
+    def _add_routes(self, routes):
+        router = self.network_scene.message_router
+        for message_type, handler in routes.items():
+            router.add_route(message_type, self.network_id, handler)
+            self._message_routes.append((message_type, handler))
+
+    def add_component(self, component_class, *args, **kwargs):
+        component = super().add_component(component_class, *args, **kwargs)
+        if self.network_scene is not None and isinstance(component, NetworkComponent):
+            self._add_routes(component.get_message_routes())
+        return component
+
+    def add_child(self, child_object, layer=0):
+        child_object = super().add_child(child_object, layer)
+        if self.network_scene is not None and isinstance(child_object, NetworkGameObject):
+            child_object.attach_network_scene(self.network_scene)
+        return child_object
+
+    def remove_child(self, child_object):
+        if child_object in self.children and isinstance(child_object, NetworkGameObject):
+            child_object.detach_network_scene()
+        super().remove_child(child_object)
+
+    # ------------------------
+    # スナップショット (SnapshotReplicator)
+    # ------------------------
+    def capture_state(self):
+        """{状態の種類: {フィールド: 値}} 自身の状態 (親と SyncVar) は "object"、コンポーネントはクラス名"""
+        state = {"parent_id": self.parent.network_id if isinstance(self.parent, NetworkGameObject) else None}
+        for name, sync_var in self.get_sync_vars():
+            state[name] = sync_var.encode(self.__dict__.get(name))
+        states = {"object": state}
+        for name, component in self.components.items():
+            if isinstance(component, NetworkComponent):
+                state = component.capture_state()
+                if state is not None:
+                    states[name] = state
+        return states
+
+    def apply_state(self, key, state):
+        if key == "object":
+            mask = 0
+            for bit, (name, sync_var) in enumerate(self.get_sync_vars()):
+                if name in state:
+                    self._apply_sync_var(name, sync_var, state[name])
+                    mask |= 1 << bit
+            if mask:
+                self.on_sync_vars_received(mask)
+            if "parent_id" in state:
+                self.parent = self.network_manager.scene_manager.current_scene.get_network_object(state["parent_id"])
+            return
+        component = self.components.get(key)
+        if isinstance(component, NetworkComponent):
+            component.apply_state(state)
+
     def receive_message(self, message):
-        """ネットワークメッセージを受信"""
+        """ネットワークメッセージを受信 (ルーティングテーブルに登録されていない type のみ届く)"""
         t = message.get("type")
 
         # **コンポーネントの同期処理**
@@ -50,27 +246,25 @@ class NetworkGameObject(GameObject):
             if hasattr(child, "receive_message"):
                 child.receive_message(message)
 
-        # **オブジェクトの状態を同期**
-        if t == "sync_network_object" and message.get("network_id") == self.network_id:
-            self.active = message.get("active", self.active)
-            self.steam_id = message.get("steam_id", self.steam_id)
-            self.layer = message.get("layer", self.layer)  # **layer を同期**
-            self.parent = self.network_manager.scene_manager.current_scene.get_network_object(message.get("parent_id"))
-
         # **強制同期メッセージを受信**
         if t == "force_sync_network_game_objects_components":
             self.force_sync()
 
-        # **子オブジェクトの追加を受信**
-        if t == "add_network_child" and message.get("parent_id") == self.network_id:
-            self.handle_add_network_child(message)
-        if t == "remove_network_child" and message.get("parent_id") == self.network_id:
-            self.remove_network_child(message["network_id"])
-        
+    def receive_sync_state(self, message):
+        """オブジェクトの状態を同期 (sync_network_object)"""
+        self.active = message.get("active", self.active)
+        self.steam_id = message.get("steam_id", self.steam_id)
+        self.layer = message.get("layer", self.layer)  # **layer を同期**
+        self.parent = self.network_manager.scene_manager.current_scene.get_network_object(message.get("parent_id"))
+
+    def receive_remove_network_child(self, message):
+        self.remove_network_child(message["network_id"])
 
     def force_sync(self):
         """強制的に全ネットワークコンポーネントを同期"""
         self.sync_state()  # **自身の同期情報も送信**
+        if self.network_manager.is_server:
+            self.network_manager.broadcast(self.build_sync_vars_message((1 << len(self.get_sync_vars())) - 1))
         for component in self.get_network_components():
             component.force_sync()
     
@@ -98,21 +292,75 @@ class NetworkGameObject(GameObject):
             "type": "add_network_child",
             "parent_id": self.network_id,
             "child_id": child.network_id,
-            "child_class": child.__class__.__name__,
             "child_name": child.name,
             "steam_id": child.steam_id,
             "layer":  layer # **子オブジェクトの layer も同期**
         }
+        class_ref = self.network_manager.class_table.get_class_ref(child.__class__)
+        data["child_class_id" if isinstance(class_ref, int) else "child_class"] = class_ref
+        spawn_args = child.get_spawn_args()
+        if spawn_args:
+            data["args"] = list(spawn_args)
         
         if self.network_manager.is_server:
             self.network_manager.broadcast(data)
         return child
 
+    # ------------------------
+    # プレハブ生成 (サブツリーを1メッセージで生成する)
+    # ------------------------
+    def get_spawn_args(self):
+        """spawn_args の順の、コンストラクタに渡す引数の値のタプル (JSON にできる値のみ)"""
+        return tuple(getattr(self, name) for name in self.spawn_args)
+
+    def spawn_network_child(self, child, layer=None):
+        """
+        子オブジェクトを追加し、その子孫も含めたサブツリーを1つの spawn_prefab メッセージで通知する。
+        メッセージにはコンストラクタの引数と現在の状態 (SyncVar・ネットワークコンポーネント) が入るので、
+        クライアントは生成した時点でサーバーと同じ状態になる
+        (add_network_child のように sync_state や SyncVar を後から個別に送らない)。
+        """
+        if not layer:
+            layer = child.layer
+        self.add_child(child, layer)
+        if self.network_manager.is_server:
+            self.network_manager.broadcast(child.build_spawn_message(layer))
+            child.mark_spawned()
+        return child
+
+    def build_spawn_message(self, layer=None):
+        """このオブジェクトのサブツリーを生成する spawn_prefab メッセージ"""
+        parent_id = self.parent.network_id if isinstance(self.parent, NetworkGameObject) else None
+        entries = []
+        self._capture_spawn_entries(entries, parent_id)
+        return {"type": "spawn_prefab", "parent_id": parent_id, "layer": layer, "objects": entries}
+
+    def _capture_spawn_entries(self, entries, parent_id):
+        """[クラス, object_name, network_id, steam_id, parent_id, コンストラクタの引数, 状態] を親から順に追加"""
+        states = self.capture_state()
+        del states["object"]["parent_id"]  # 親子関係はエントリの parent_id で決まる
+        entries.append([self.network_manager.class_table.get_class_ref(self.__class__), self.name, self.network_id,
+                        self.steam_id, parent_id, list(self.get_spawn_args()), states])
+        for child in self.children:
+            if isinstance(child, NetworkGameObject):
+                child._capture_spawn_entries(entries, self.network_id)
+
+    def mark_spawned(self):
+        """spawn_prefab で送った状態を送信済みにする (サブツリー全体。同じ状態を差分として送り直さない)"""
+        self._sync_dirty = 0
+        if self.network_scene is not None:
+            self.network_scene.dirty_objects.discard(self)
+        for component in self.get_network_components():
+            component.mark_synced()
+        for child in self.children:
+            if isinstance(child, NetworkGameObject):
+                child.mark_spawned()
+
     def remove_network_child(self, child):
         if isinstance(child, int):
             child = self.get_network_child(child)
         if child in self.children:
-            self.children.remove(child)
+            self.remove_child(child)
 
             self.sync_state()  # **親子関係が変わるため同期**
             data = {
@@ -132,13 +380,14 @@ class NetworkGameObject(GameObject):
         """ネットワーク経由で子オブジェクトを追加"""
         parent_id = message.get("parent_id")
         child_id = message.get("child_id")
-        child_class_name = message.get("child_class")
+        child_class_name = message.get("child_class_id") or message.get("child_class")
         child_name = message.get("child_name")
         steam_id = message.get("steam_id")
         layer = message.get("layer")
 
         # **`NetworkObjectFactory` を使って子オブジェクトを生成**
-        child_obj = NetworkObjectFactory.create_object(child_class_name, child_name, child_id, steam_id)
+        child_obj = NetworkObjectFactory.create_object(child_class_name, child_name, child_id, steam_id,
+                                                       message.get("args", ()))
 
         if not child_obj:
             print(f"⚠️ Failed to create object {child_name} of type {child_class_name}")
@@ -150,17 +399,15 @@ class NetworkGameObject(GameObject):
 
         print(f"✅ Added child {child_name} ({child_id}) to parent {parent_id}")
 
-    def update(self, dt):
-        """毎フレーム実行: 状態の変化を監視し、必要なら同期"""
-        super().update(dt)
-
-        # **状態の変化を検知**
-        if (
-            self.active != self._previous_active or 
-            self.steam_id != self._previous_steam_id or 
-            self.layer != self._previous_layer  # **layer の変更をチェック**
-        ):
-            self.sync_state()  # **変更があったら同期**
-            self._previous_active = self.active
-            self._previous_steam_id = self.steam_id
-            self._previous_layer = self.layer  # **layer の変更を記録**
+
+MessageSchemaRegistry.register("sync_network_object", 7, [
+    ("network_id", "I"), ("active", "?"), ("steam_id", "Q"), ("layer", "i"), ("parent_id", "I"),
+], coalesce=True)
+MessageSchemaRegistry.register("add_network_child", 8, [
+    ("parent_id", "I"), ("child_id", "I"), ("child_class", STR), ("child_name", STR), ("steam_id", "Q"), ("layer", "i"),
+    ("child_class_id", "H"),
+])
+MessageSchemaRegistry.register("remove_network_child", 9, [("network_id", "I"), ("parent_id", "I")])
+# 子オブジェクトの追加・削除は親オブジェクト宛て
+MessageRouter.register_key_field("add_network_child", "parent_id")
+MessageRouter.register_key_field("remove_network_child", "parent_id")
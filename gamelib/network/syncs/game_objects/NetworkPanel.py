@@ -2,6 +2,9 @@ from ....game.game_object.Panel import Panel
 from .NetworkGameObject import NetworkGameObject
 
 class NetworkPanel(NetworkGameObject):
+    # UI の更新は送信予算が足りないときは後回しにする
+    replication_priority = -1
+
     def __init__(self, name, active=True, parent=None, network_id=None, steam_id=None):
         self.ui_objects = []
         super().__init__(name, active, parent, network_id, steam_id)
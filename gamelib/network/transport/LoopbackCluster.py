@@ -0,0 +1,123 @@
+import time
+from .LoopbackTransport import LoopbackHub, LoopbackTransport
+from ..NetworkManager import NetworkManager
+from ..syncs.NetworkSceneManager import NetworkSceneManager
+from ...game.utility.EventManager import EventManager
+
+
+class LoopbackCluster:
+    """
+    サーバー1 + クライアントN を1プロセス内で動かす (ヘッドレスの負荷試験・テスト用)。
+    各ピアは NetworkManager.create_peer で作った NetworkManager と、専用の NetworkSceneManager・EventManager を持つ。
+    ピアを動かす間は activate() でそのピアを get_instance() の戻り値にする。
+
+    scene_factories は {シーン名: screen を受け取って NetworkScene を返す関数}。
+    全ピアに同じ名前のシーンを登録し、サーバーは start_scene のシーンから始める。
+    """
+    def __init__(self, num_clients, scene_factories, start_scene, screen=None, latency=0.0, loss_rate=0.0, seed=None):
+        self.hub = LoopbackHub(latency, loss_rate, seed)
+        self.scene_factories = scene_factories
+        self.screen = screen
+        self.server = self._create_peer("Server")
+        self.clients = [self._create_peer(f"Client{number}") for number in range(num_clients)]
+
+        self.server.activate()
+        self.server.setup_server(2, num_clients + 1)
+        self.lobby_id = self.server.lobby_id
+        for client in self.clients:
+            client.activate()
+            client.setup_client(self.lobby_id)
+            # フレームを実時間より速く進めるので、最初の ping は ping の間隔を待たずに送る
+            client.ping_meter.last_send_time = 0.0
+        # 全員がロビーに入ってからシーンを始める (シーンの開始時にロビーのメンバーを使うゲーム用)
+        self.server.activate()
+        self.server.scene_manager.set_active_network_scene(start_scene)
+
+    @property
+    def peers(self):
+        return [self.server] + self.clients
+
+    def _create_peer(self, name):
+        peer = NetworkManager.create_peer(LoopbackTransport(self.hub, name))
+        peer.activate()
+        scene_manager = NetworkSceneManager()
+        peer.set_singleton(scene_manager, EventManager())
+        for scene_name, factory in self.scene_factories.items():
+            scene = factory(self.screen)
+            if scene.name != scene_name:
+                print(f"⚠️ シーン名が一致しません: {scene_name} / {scene.name}")
+            scene_manager.add_scene(scene)
+        return peer
+
+    def update(self, dt):
+        """全ピアを1フレーム進める (ネットワーク → シーンの順)"""
+        for peer in self.peers:
+            peer.activate()
+            peer.update(dt)
+            peer.scene_manager.update(dt)
+
+    def run(self, seconds, dt=1 / 60):
+        for _ in range(round(seconds / dt)):
+            self.update(dt)
+
+    def run_until(self, condition, timeout=10.0, dt=1 / 60):
+        """condition() が True になるまで (最大 timeout 秒分) 進める。True になったら True"""
+        for _ in range(round(timeout / dt)):
+            if condition():
+                return True
+            self.update(dt)
+        return condition()
+
+    def all_synced(self):
+        """全クライアントのシーン同期が完了した"""
+        return all(client.complete_scene_sync and client.connected for client in self.clients)
+
+    def close(self):
+        for peer in self.peers:
+            peer.activate()
+            peer.running = False
+            peer.steam.shutdown_server()
+        NetworkManager._instance = None
+
+
+# 負荷計測用のコード (サーバー1 + クライアントN で、サーバーのオブジェクトの移動をシーン同期・差分送信で配る)
+if __name__ == "__main__":
+    import os
+    import sys
+    import pygame
+    from ..syncs.NetworkScene import NetworkScene
+    from ..syncs.game_objects.NetworkGameObject import NetworkGameObject
+    from ..NetworkObjectFactory import NetworkObjectFactory
+
+    num_clients = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    num_objects = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    num_frames = int(sys.argv[3]) if len(sys.argv) > 3 else 300
+
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.display.init()
+    screen = pygame.display.set_mode((1, 1))
+    NetworkObjectFactory.register_class(NetworkGameObject)
+
+    cluster = LoopbackCluster(num_clients, {"BenchScene": lambda screen: NetworkScene("BenchScene", screen)},
+                              "BenchScene", screen)
+    cluster.server.activate()
+    server_scene = cluster.server.scene_manager.current_scene
+    objects = [server_scene.add_network_object(NetworkGameObject(f"Object{number}")) for number in range(num_objects)]
+    if not cluster.run_until(cluster.all_synced):
+        print("❌ シーン同期が完了しませんでした")
+        sys.exit(1)
+
+    start_bytes = cluster.hub.sent_bytes
+    start_messages = cluster.hub.sent_messages
+    start = time.perf_counter()
+    for frame in range(num_frames):
+        for number, obj in enumerate(objects):
+            obj.transform.set_local_position(pygame.Vector3(frame + number, number, 0))
+        cluster.update(1 / 60)
+    elapsed = time.perf_counter() - start
+
+    synced = sum(len(client.scene_manager.current_scene.network_object_index) for client in cluster.clients)
+    print(f"clients={num_clients} objects={num_objects} frames={num_frames} synced_objects={synced} "
+          f"datagrams={cluster.hub.sent_messages - start_messages} bytes={cluster.hub.sent_bytes - start_bytes} "
+          f"time={elapsed:.3f}s ({num_frames / elapsed:.1f} frames/s)")
+    cluster.close()
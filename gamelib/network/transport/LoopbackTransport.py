@@ -0,0 +1,232 @@
+import time
+import random
+from collections import deque
+from .Transport import Transport
+
+MAX_MESSAGE_SIZE = 1500  # SteamNetworking の受信バッファと同じ上限
+
+
+class LoopbackHub:
+    """
+    同一プロセス内の LoopbackTransport 同士をつなぐ仮想ネットワーク。
+    Steam を使わずにサーバー + 多数のクライアントを1プロセスで動かすために使う。
+    """
+    _default = None
+
+    def __init__(self, latency=0.0, loss_rate=0.0, seed=None):
+        """
+        :param latency: 片道の遅延 (秒)
+        :param loss_rate: パケットロス率 (0～1)
+        :param seed: ロスの乱数シード (再現用)
+        """
+        self.latency = latency
+        self.loss_rate = loss_rate
+        self.random = random.Random(seed)
+
+        self.transports = {}  # steam_id → LoopbackTransport
+        self.lobbies = {}     # lobby_id → {"owner", "members", "max_players", "public"}
+        self.last_steam_id = 76561190000000000
+        self.last_lobby_id = 109775240000000000
+
+        # 統計
+        self.sent_messages = 0
+        self.sent_bytes = 0
+        self.dropped_messages = 0
+
+    @classmethod
+    def get_default(cls):
+        if cls._default is None:
+            cls._default = cls()
+        return cls._default
+
+    def register(self, transport):
+        self.last_steam_id += 1
+        self.transports[self.last_steam_id] = transport
+        return self.last_steam_id
+
+    def unregister(self, transport):
+        self.transports.pop(transport.steam_id, None)
+
+    # -------------------------------
+    # ロビー
+    # -------------------------------
+    def create_lobby(self, owner_id, lobby_type, max_players):
+        self.last_lobby_id += 1
+        self.lobbies[self.last_lobby_id] = {
+            "owner": owner_id,
+            "members": [owner_id],
+            "max_players": max_players,
+            "public": lobby_type == 2,
+        }
+        return self.last_lobby_id
+
+    def join_lobby(self, steam_id, lobby_id):
+        lobby = self.lobbies.get(lobby_id)
+        if lobby is None or len(lobby["members"]) >= lobby["max_players"]:
+            return False
+        if steam_id not in lobby["members"]:
+            lobby["members"].append(steam_id)
+            self._notify_members(lobby, "join", steam_id, lobby_id)
+        return True
+
+    def leave_lobby(self, steam_id, lobby_id):
+        lobby = self.lobbies.get(lobby_id)
+        if lobby is None or steam_id not in lobby["members"]:
+            return
+        lobby["members"].remove(steam_id)
+        self._notify_members(lobby, "leave", steam_id, lobby_id)
+        if not lobby["members"]:
+            del self.lobbies[lobby_id]
+        elif lobby["owner"] == steam_id:
+            lobby["owner"] = lobby["members"][0]
+
+    def _notify_members(self, lobby, event, steam_id, lobby_id):
+        """ロビーの他のメンバーに参加・退出を通知する (Steam の LobbyChatUpdate 相当)"""
+        for member_id in lobby["members"]:
+            transport = self.transports.get(member_id)
+            if transport and member_id != steam_id:
+                transport.lobby_events[event].append((steam_id, lobby_id))
+
+    # -------------------------------
+    # P2P
+    # -------------------------------
+    def deliver(self, sender_id, target_id, message):
+        transport = self.transports.get(target_id)
+        if transport is None:
+            return False
+        self.sent_messages += 1
+        self.sent_bytes += len(message)
+        if self.loss_rate and self.random.random() < self.loss_rate:
+            self.dropped_messages += 1
+            return True  # UDP と同じく送信側は成功扱い
+        transport.inbox.append((time.perf_counter() + self.latency, message, sender_id))
+        return True
+
+
+class LoopbackTransport(Transport):
+    """同一プロセス内で完結する Transport 実装 (ヘッドレスの負荷試験用)"""
+    def __init__(self, hub=None, name=None):
+        super().__init__()
+        self.hub = hub or LoopbackHub.get_default()
+        self.steam_id = self.hub.register(self)
+        self.name = name or f"Peer{self.steam_id % 10000}"
+        self.inbox = deque()  # (到着時刻, bytes, 送信者ID)
+        self.lobby_events = {"join": deque(), "leave": deque()}
+        self.lobby_id = 0
+
+    # -------------------------------
+    # ロビー操作
+    # -------------------------------
+    def create_lobby(self, lobby_type, max_players):
+        self.lobby_id = self.hub.create_lobby(self.steam_id, lobby_type, max_players)
+        return self.lobby_id
+
+    def join_lobby(self, lobby_id):
+        if self.hub.join_lobby(self.steam_id, lobby_id):
+            self.lobby_id = lobby_id
+            return True
+        return False
+
+    def leave_lobby(self, lobby_id):
+        self.hub.leave_lobby(self.steam_id, lobby_id)
+        if self.lobby_id == lobby_id:
+            self.lobby_id = 0
+
+    def get_lobby_owner(self, lobby_id):
+        lobby = self.hub.lobbies.get(lobby_id)
+        return lobby["owner"] if lobby else 0
+
+    def get_num_lobby_members(self, lobby_id):
+        lobby = self.hub.lobbies.get(lobby_id)
+        return len(lobby["members"]) if lobby else 0
+
+    def get_lobby_member_by_index(self, lobby_id, index):
+        lobby = self.hub.lobbies.get(lobby_id)
+        if lobby is None or index >= len(lobby["members"]):
+            return 0
+        return lobby["members"][index]
+
+    def get_steam_name(self, steam_id):
+        transport = self.hub.transports.get(steam_id)
+        return transport.name if transport else str(steam_id)
+
+    def get_public_lobbies(self):
+        return [lobby_id for lobby_id, lobby in self.hub.lobbies.items() if lobby["public"]]
+
+    # -------------------------------
+    # P2P 通信
+    # -------------------------------
+    def send_p2p_message(self, steam_id, message):
+        if isinstance(message, str):
+            message = message.encode('utf-8')
+        if len(message) > MAX_MESSAGE_SIZE:
+            print(f"⚠️ Loopback: {len(message)} bytes のメッセージは MTU を超えています")
+            return False
+        return self.hub.deliver(self.steam_id, steam_id, bytes(message))
+
+    def receive_p2p_message(self):
+        if self.inbox and self.inbox[0][0] <= time.perf_counter():
+            _, message, sender_id = self.inbox.popleft()
+            return message, sender_id
+        return None, None
+
+    def pending_count(self):
+        return len(self.inbox)
+
+    def close_all_p2p_sessions(self):
+        self.inbox.clear()
+
+    # -------------------------------
+    # ロビー参加・退出検出
+    # -------------------------------
+    def check_lobby_join(self):
+        if self.lobby_events["join"]:
+            steam_id, lobby_id = self.lobby_events["join"].popleft()
+            return True, steam_id, lobby_id
+        return False, 0, 0
+
+    def check_lobby_leave(self):
+        if self.lobby_events["leave"]:
+            steam_id, lobby_id = self.lobby_events["leave"].popleft()
+            return True, steam_id, lobby_id
+        return False, 0, 0
+
+    def shutdown_server(self):
+        if self.lobby_id:
+            self.leave_lobby(self.lobby_id)
+        self.hub.unregister(self)
+
+
+# 負荷計測用のコード (サーバー1 + クライアントN をこのプロセス内で動かす)
+if __name__ == "__main__":
+    import sys
+    from types import SimpleNamespace
+    from gamelib.network.utility.Communication import Communication
+
+    num_clients = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    num_rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    hub = LoopbackHub()
+    server = LoopbackTransport(hub, "Server")
+    lobby_id = server.create_lobby(2, num_clients + 1)
+    clients = [LoopbackTransport(hub) for _ in range(num_clients)]
+    for client in clients:
+        client.join_lobby(lobby_id)
+
+    server_comm = Communication(SimpleNamespace(steam=server))
+    client_comms = [Communication(SimpleNamespace(steam=client)) for client in clients]
+
+    sync = {"type": "sync_transform", "network_id": 42, "position_x": 120.0, "position_y": 80.0}
+    received = 0
+    start = time.perf_counter()
+    for _ in range(num_rounds):
+        for client in clients:
+            server_comm.send_message(client.steam_id, sync)
+        for client, comm in zip(clients, client_comms):
+            raw, sender_id = client.receive_p2p_message()
+            while raw:
+                received += len(comm.receive_message(raw, sender_id))
+                raw, sender_id = client.receive_p2p_message()
+    elapsed = time.perf_counter() - start
+    print(f"clients={num_clients} messages={received} bytes={hub.sent_bytes} "
+          f"time={elapsed:.3f}s ({received / elapsed:.0f} msg/s)")
@@ -0,0 +1,130 @@
+import time
+from abc import ABC, abstractmethod
+
+
+class Transport(ABC):
+    """
+    NetworkManager が使用する通信層の基底クラス。
+    SteamNetworking と同じ API (ロビー操作 / P2P 送受信 / 参加・退出検出) を持つ。
+    ロビー操作と P2P 送受信は抽象メソッドで、実装していないサブクラスは生成時にエラーになる。
+    - send_p2p_message にはエンコード済みの bytes を渡す
+    - receive_p2p_message は (bytes, 送信者ID) を返し、受信データがなければ (None, None)
+    メッセージのデコード・断片の復元は Communication が行う。
+    """
+    def __init__(self):
+        self.steam_id = 0
+
+    # -------------------------------
+    # コールバック処理
+    # -------------------------------
+    def run_callbacks(self):
+        pass
+
+    # -------------------------------
+    # ロビー操作
+    # -------------------------------
+    @abstractmethod
+    def create_lobby(self, lobby_type, max_players):
+        raise NotImplementedError
+
+    @abstractmethod
+    def join_lobby(self, lobby_id):
+        raise NotImplementedError
+
+    @abstractmethod
+    def leave_lobby(self, lobby_id):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_lobby_owner(self, lobby_id):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_num_lobby_members(self, lobby_id):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_lobby_member_by_index(self, lobby_id, index):
+        raise NotImplementedError
+
+    def get_all_lobby_members(self, lobby_id):
+        """ロビーに参加しているすべてのメンバーのIDを取得する"""
+        steam_ids = []
+        for index in range(self.get_num_lobby_members(lobby_id)):
+            steam_id = self.get_lobby_member_by_index(lobby_id, index)
+            if steam_id != 0:
+                steam_ids.append(steam_id)
+        return steam_ids
+
+    def get_steam_name(self, steam_id):
+        return str(steam_id)
+
+    # -------------------------------
+    # ｌｏｂｂｙ検索
+    # -------------------------------
+    def get_public_lobbies(self):
+        return []
+
+    def get_friend_lobbies(self):
+        return {}
+
+    # -------------------------------
+    # P2P 通信
+    # -------------------------------
+    def accept_p2p_session(self, steam_id):
+        return True
+
+    @abstractmethod
+    def send_p2p_message(self, steam_id, message):
+        raise NotImplementedError
+
+    @abstractmethod
+    def receive_p2p_message(self):
+        raise NotImplementedError
+
+    def receive_p2p_messages(self, max_messages=None):
+        """受信可能なメッセージをまとめて [(bytes, 送信者ID), ...] で返す"""
+        messages = []
+        while max_messages is None or len(messages) < max_messages:
+            raw_data, sender_id = self.receive_p2p_message()
+            if not raw_data:
+                break
+            messages.append((raw_data, sender_id))
+        return messages
+
+    def pending_count(self):
+        """受信待ちのメッセージ数 (分からない Transport は None)"""
+        return None
+
+    def wait_for_message(self, timeout):
+        """受信スレッド用: 受信データが届くか timeout 秒経つまで待つ"""
+        time.sleep(timeout)
+
+    def close_all_p2p_sessions(self):
+        pass
+
+    # -------------------------------
+    # Rich Presence
+    # -------------------------------
+    def set_lobby_rich_presence(self, lobby_id):
+        pass
+
+    def clear_rich_presence(self):
+        pass
+
+    # -------------------------------
+    # ロビー参加・退出検出
+    # -------------------------------
+    def check_lobby_join(self):
+        """(成功したか, 参加者ID, ロビーID) を返す"""
+        return False, 0, 0
+
+    def check_lobby_leave(self):
+        """(成功したか, 退出者ID, ロビーID) を返す"""
+        return False, 0, 0
+
+    # -------------------------------
+    # サーバー管理
+    # -------------------------------
+    def shutdown_server(self):
+        pass
@@ -0,0 +1,420 @@
+import json
+import random
+import selectors
+import socket
+import struct
+import threading
+import time
+from collections import deque
+from .Transport import Transport
+
+DEFAULT_RENDEZVOUS = ("127.0.0.1", 27015)
+RECV_BUFFER_SIZE = 2048
+
+# データグラムの先頭1バイトで種類を判別する
+PACKET_DATA = 0x00      # [0x00][送信者ID u64][payload]
+PACKET_CONTROL = 0x01   # [0x01][JSON] (ランデブーとの制御通信)
+DATA_HEADER = struct.Struct("<BQ")
+
+
+def _encode_control(data):
+    return bytes([PACKET_CONTROL]) + json.dumps(data).encode('utf-8')
+
+
+class UdpRendezvous:
+    """
+    UdpTransport 用の小さなロビーサーバー。
+    ロビーの作成・参加・退出と、メンバーのアドレス通知だけを行う (ゲームデータは中継しない)。
+    1つのランデブーで複数のロビー (ルーム) を管理できる。
+    """
+    def __init__(self, host="0.0.0.0", port=DEFAULT_RENDEZVOUS[1]):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((host, port))
+        self.sock.setblocking(False)
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.sock, selectors.EVENT_READ)
+
+        self.lobbies = {}  # lobby_id → {"owner", "members": {id: [host, port, name]}, "max_players", "public"}
+        self.last_lobby_id = 109775240000000000
+        self.running = False
+        self.serve_thread = None  # serve_forever を実行中のスレッド
+        self.closed = False
+
+    def poll(self, timeout=0):
+        """受信済みの制御パケットをすべて処理する"""
+        try:
+            if not self.selector.select(timeout):
+                return
+        except OSError:
+            if not self.closed:
+                raise
+            return  # 別のスレッドで close された
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(RECV_BUFFER_SIZE)
+            except (BlockingIOError, InterruptedError):
+                return
+            except ConnectionResetError:
+                continue
+            except OSError:
+                if not self.closed:
+                    raise
+                return
+            if data and data[0] == PACKET_CONTROL:
+                try:
+                    self._handle(json.loads(data[1:].decode('utf-8')), addr)
+                except Exception as e:
+                    print(f"⚠️ Rendezvous: 不正な制御パケット {addr}: {e}")
+
+    def serve_forever(self, interval=0.05):
+        self.serve_thread = threading.current_thread()
+        self.running = True
+        while self.running and not self.closed:
+            self.poll(interval)
+
+    def stop(self):
+        """serve_forever のループを止める (poll の待ち時間が過ぎると戻る)"""
+        self.running = False
+
+    def close(self, timeout=1.0):
+        """ループを止め、serve_forever のスレッドが終わってからソケットを閉じる"""
+        self.stop()
+        thread = self.serve_thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+        self.closed = True
+        self.selector.close()
+        self.sock.close()
+
+    def _reply(self, addr, request, **data):
+        data["op"] = "reply"
+        data["request_id"] = request.get("request_id")
+        self.sock.sendto(_encode_control(data), addr)
+
+    def _notify(self, lobby, data, exclude=None):
+        for member_id, (host, port, _) in lobby["members"].items():
+            if member_id != exclude:
+                self.sock.sendto(_encode_control(data), (host, port))
+
+    def _handle(self, request, addr):
+        op = request.get("op")
+        peer_id = request.get("peer_id")
+        member = [addr[0], addr[1], request.get("name", str(peer_id))]
+
+        if op == "create_lobby":
+            self.last_lobby_id += 1
+            self.lobbies[self.last_lobby_id] = {
+                "owner": peer_id,
+                "members": {peer_id: member},
+                "max_players": request.get("max_players", 4),
+                "public": request.get("lobby_type") == 2,
+            }
+            self._reply(addr, request, lobby_id=self.last_lobby_id)
+        elif op == "join_lobby":
+            lobby = self.lobbies.get(request.get("lobby_id"))
+            if lobby is None or len(lobby["members"]) >= lobby["max_players"]:
+                self._reply(addr, request, ok=False)
+                return
+            lobby["members"][peer_id] = member
+            self._notify(lobby, {"op": "member_join", "lobby_id": request["lobby_id"],
+                                 "peer_id": peer_id, "member": member}, exclude=peer_id)
+            self._reply(addr, request, ok=True, owner=lobby["owner"],
+                        members=[[member_id] + info for member_id, info in lobby["members"].items()])
+        elif op == "leave_lobby":
+            lobby_id = request.get("lobby_id")
+            lobby = self.lobbies.get(lobby_id)
+            if lobby and lobby["members"].pop(peer_id, None):
+                if not lobby["members"]:
+                    del self.lobbies[lobby_id]
+                    return
+                if lobby["owner"] == peer_id:
+                    lobby["owner"] = next(iter(lobby["members"]))
+                self._notify(lobby, {"op": "member_leave", "lobby_id": lobby_id,
+                                     "peer_id": peer_id, "owner": lobby["owner"]})
+        elif op == "list_lobbies":
+            self._reply(addr, request, lobbies=[lobby_id for lobby_id, lobby in self.lobbies.items() if lobby["public"]])
+
+
+class UdpTransport(Transport):
+    """
+    selectors + ノンブロッキング UDP ソケットによる Transport 実装 (Linux の専用サーバー向け)。
+    receive_p2p_messages() は受信可能なデータグラムを1回の呼び出しですべて読み切る。
+    poll() は受信スレッドとメインループ (check_lobby_join など) の両方から呼ばれるので、
+    ソケットの読み出しとロビー情報 (peers, members) の更新は self.lock の中で行う。
+    """
+    def __init__(self, rendezvous=DEFAULT_RENDEZVOUS, host="0.0.0.0", port=0, name=None, request_timeout=2.0):
+        super().__init__()
+        self.rendezvous = rendezvous
+        # 制御パケットの送信元の確認用 (ホスト名は IP アドレスにしておく)
+        self.rendezvous_addr = (socket.gethostbyname(rendezvous[0]), rendezvous[1])
+        self.request_timeout = request_timeout
+        self.steam_id = random.getrandbits(63) or 1
+        self.name = name or f"Peer{self.steam_id % 10000}"
+
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.sock.setblocking(False)
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.sock, selectors.EVENT_READ)
+
+        self.lock = threading.Lock()
+        self.inbox = deque()  # (bytes, 送信者ID)
+        self.lobby_events = {"join": deque(), "leave": deque()}
+        self.pending_replies = {}
+        self.last_request_id = 0
+
+        # ロビー情報のキャッシュ
+        self.lobby_id = 0
+        self.lobby_owner = 0
+        self.peers = {}  # peer_id → (host, port)
+        self.peer_names = {}
+        self.members = []
+
+        # 統計
+        self.received_datagrams = 0
+        self.sent_datagrams = 0
+        self.rejected_datagrams = 0  # メンバー以外 (ランデブー以外) から届いて捨てたデータグラム
+
+    # -------------------------------
+    # 受信 (ソケットの読み切り)
+    # -------------------------------
+    def poll(self, timeout=0):
+        """受信可能なデータグラムをすべて読み出し、データは inbox へ、制御はその場で処理する"""
+        # 待機はロックの外で行う (もう一方のスレッドを待たせない)
+        if not self.selector.select(timeout):
+            return 0
+        count = 0
+        with self.lock:
+            while True:
+                try:
+                    data, addr = self.sock.recvfrom(RECV_BUFFER_SIZE)
+                except (BlockingIOError, InterruptedError):
+                    break
+                except ConnectionResetError:
+                    continue  # Windows の ICMP port unreachable
+                if not data:
+                    continue
+                count += 1
+                if data[0] == PACKET_DATA and len(data) > DATA_HEADER.size:
+                    _, sender_id = DATA_HEADER.unpack_from(data)
+                    # ヘッダーの送信者IDは偽装できるので、ランデブーから通知されたメンバーのアドレスと一致するものだけ受け取る
+                    if self.peers.get(sender_id) != addr:
+                        self.rejected_datagrams += 1
+                        continue
+                    self.inbox.append((data[DATA_HEADER.size:], sender_id))
+                elif data[0] == PACKET_CONTROL:
+                    if addr != self.rendezvous_addr:
+                        self.rejected_datagrams += 1
+                        continue
+                    try:
+                        self._handle_control(json.loads(data[1:].decode('utf-8')))
+                    except Exception as e:
+                        print(f"⚠️ UdpTransport: 不正な制御パケット {addr}: {e}")
+            self.received_datagrams += count
+        return count
+
+    def receive_p2p_message(self):
+        if not self.inbox:
+            self.poll()
+        if self.inbox:
+            return self.inbox.popleft()
+        return None, None
+
+    def receive_p2p_messages(self, max_messages=None):
+        self.poll()
+        if max_messages is None or max_messages >= len(self.inbox):
+            messages = list(self.inbox)
+            self.inbox.clear()
+            return messages
+        return [self.inbox.popleft() for _ in range(max_messages)]
+
+    def pending_count(self):
+        return len(self.inbox)
+
+    def wait_for_message(self, timeout):
+        if not self.inbox:
+            self.selector.select(timeout)
+
+    # -------------------------------
+    # P2P 通信
+    # -------------------------------
+    def send_p2p_message(self, steam_id, message):
+        addr = self.peers.get(steam_id)
+        if addr is None:
+            return False
+        if isinstance(message, str):
+            message = message.encode('utf-8')
+        try:
+            self.sock.sendto(DATA_HEADER.pack(PACKET_DATA, self.steam_id) + message, addr)
+        except BlockingIOError:
+            return False  # 送信バッファが一杯 (UDP なので破棄扱い)
+        self.sent_datagrams += 1
+        return True
+
+    def close_all_p2p_sessions(self):
+        self.inbox.clear()
+
+    # -------------------------------
+    # ランデブーとの制御通信
+    # -------------------------------
+    def _request(self, op, **data):
+        """ランデブーへ要求を送り、応答を待つ (待機中に届いたデータも inbox に積む)"""
+        self.last_request_id += 1
+        request_id = self.last_request_id
+        data.update(op=op, request_id=request_id, peer_id=self.steam_id, name=self.name)
+        self.sock.sendto(_encode_control(data), self.rendezvous)
+
+        deadline = time.perf_counter() + self.request_timeout
+        while request_id not in self.pending_replies:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                print(f"⚠️ Rendezvous {self.rendezvous} が応答しません ({op})")
+                return None
+            self.poll(remaining)
+        return self.pending_replies.pop(request_id)
+
+    def _send_control(self, op, **data):
+        data.update(op=op, peer_id=self.steam_id, name=self.name)
+        self.sock.sendto(_encode_control(data), self.rendezvous)
+
+    def _handle_control(self, data):
+        op = data.get("op")
+        if op == "reply":
+            self.pending_replies[data.get("request_id")] = data
+        elif op == "member_join" and data.get("lobby_id") == self.lobby_id:
+            peer_id = data["peer_id"]
+            host, port, name = data["member"]
+            self._add_member(peer_id, host, port, name)
+            self.lobby_events["join"].append((peer_id, self.lobby_id))
+        elif op == "member_leave" and data.get("lobby_id") == self.lobby_id:
+            peer_id = data["peer_id"]
+            if peer_id in self.members:
+                self.members.remove(peer_id)
+            # 退出したメンバーのアドレスからは以後受け取らない
+            self.peers.pop(peer_id, None)
+            self.peer_names.pop(peer_id, None)
+            self.lobby_owner = data.get("owner", self.lobby_owner)
+            self.lobby_events["leave"].append((peer_id, self.lobby_id))
+
+    def _add_member(self, peer_id, host, port, name):
+        self.peers[peer_id] = (host, port)
+        self.peer_names[peer_id] = name
+        if peer_id not in self.members:
+            self.members.append(peer_id)
+
+    # -------------------------------
+    # ロビー操作
+    # -------------------------------
+    def create_lobby(self, lobby_type, max_players):
+        reply = self._request("create_lobby", lobby_type=lobby_type, max_players=max_players)
+        if not reply:
+            return 0
+        with self.lock:
+            self.lobby_id = reply["lobby_id"]
+            self.lobby_owner = self.steam_id
+            self.members = [self.steam_id]
+            self.peer_names[self.steam_id] = self.name
+        return self.lobby_id
+
+    def join_lobby(self, lobby_id):
+        reply = self._request("join_lobby", lobby_id=lobby_id)
+        if not reply or not reply.get("ok"):
+            return False
+        with self.lock:
+            self.lobby_id = lobby_id
+            self.lobby_owner = reply["owner"]
+            self.members = []
+            for peer_id, host, port, name in reply["members"]:
+                if peer_id == self.steam_id:
+                    self.members.append(peer_id)
+                    self.peer_names[peer_id] = name
+                else:
+                    self._add_member(peer_id, host, port, name)
+        return True
+
+    def leave_lobby(self, lobby_id):
+        self._send_control("leave_lobby", lobby_id=lobby_id)
+        with self.lock:
+            if self.lobby_id == lobby_id:
+                self.lobby_id = 0
+                self.lobby_owner = 0
+                self.members = []
+                self.peers.clear()
+
+    def get_lobby_owner(self, lobby_id):
+        return self.lobby_owner if lobby_id == self.lobby_id else 0
+
+    def get_num_lobby_members(self, lobby_id):
+        return len(self.members) if lobby_id == self.lobby_id else 0
+
+    def get_lobby_member_by_index(self, lobby_id, index):
+        if lobby_id != self.lobby_id or index >= len(self.members):
+            return 0
+        return self.members[index]
+
+    def get_steam_name(self, steam_id):
+        return self.peer_names.get(steam_id, str(steam_id))
+
+    def get_public_lobbies(self):
+        reply = self._request("list_lobbies")
+        return reply["lobbies"] if reply else []
+
+    # -------------------------------
+    # ロビー参加・退出検出
+    # -------------------------------
+    def check_lobby_join(self):
+        self.poll()
+        if self.lobby_events["join"]:
+            steam_id, lobby_id = self.lobby_events["join"].popleft()
+            return True, steam_id, lobby_id
+        return False, 0, 0
+
+    def check_lobby_leave(self):
+        if self.lobby_events["leave"]:
+            steam_id, lobby_id = self.lobby_events["leave"].popleft()
+            return True, steam_id, lobby_id
+        return False, 0, 0
+
+    # -------------------------------
+    # サーバー管理
+    # -------------------------------
+    def shutdown_server(self):
+        if self.lobby_id:
+            self.leave_lobby(self.lobby_id)
+        self.selector.close()
+        self.sock.close()
+
+
+# パケットレート計測用のコード (ランデブー + サーバー1 + クライアントN)
+if __name__ == "__main__":
+    import sys
+    import threading
+
+    num_clients = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    num_rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+
+    rendezvous = UdpRendezvous("127.0.0.1", 0)
+    address = rendezvous.sock.getsockname()
+    threading.Thread(target=rendezvous.serve_forever, args=(0.01,), daemon=True).start()
+
+    server = UdpTransport(address, host="127.0.0.1", name="Server")
+    lobby_id = server.create_lobby(2, num_clients + 1)
+    clients = [UdpTransport(address, host="127.0.0.1") for _ in range(num_clients)]
+    for client in clients:
+        client.join_lobby(lobby_id)
+    while server.check_lobby_join()[0] or len(server.members) < num_clients + 1:
+        pass
+
+    payload = b'{"type": "sync_transform", "network_id": 42, "position_x": 120.0}'
+    received = 0
+    start = time.perf_counter()
+    for _ in range(num_rounds):
+        for client in clients:
+            server.send_p2p_message(client.steam_id, payload)
+        for client in clients:
+            received += len(client.receive_p2p_messages())
+    elapsed = time.perf_counter() - start
+    print(f"clients={num_clients} sent={server.sent_datagrams} received={received} "
+          f"time={elapsed:.3f}s ({received / elapsed:.0f} datagrams/s)")
+    rendezvous.close()
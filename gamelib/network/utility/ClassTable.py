@@ -0,0 +1,105 @@
+from ..NetworkObjectFactory import NetworkObjectFactory
+from .MessageSchema import MessageSchemaRegistry
+
+
+class ClassTable:
+    """
+    セッション中のクラスID (クラス名の代わりに送る小さい整数)。ピア (NetworkManager) ごとに持つ。
+    - サーバーは最初のシーン同期の時点で登録済みのクラスから表を決め、各クライアントに class_table で1回だけ送る
+    - クライアントは表を受信したら class_table_ack を返す
+    - サーバーは ack を返したクライアントにだけクラスIDを送る。全員に送るメッセージは、全クライアントが ack するまでクラス名で送る
+    """
+    def __init__(self, network_manager):
+        self.network_manager = network_manager
+        self.class_ids = {}  # クラス名 → ID
+        self.class_names = {}  # ID → クラス名
+        self.sent_peers = set()  # サーバー: class_table を送ったクライアント
+        self.acked_peers = set()  # サーバー: class_table_ack を返したクライアント
+
+    def clear(self):
+        """セッションの終了時に呼ぶ"""
+        self.class_ids = {}
+        self.class_names = {}
+        self.sent_peers.clear()
+        self.acked_peers.clear()
+
+    def get_table(self):
+        """サーバー: クラスIDの表 [クラス名, ...] (ID = 添字 + 1)。最初に呼ばれた時点で登録済みのクラスで決まる"""
+        if not self.class_ids:
+            self.set_table(NetworkObjectFactory.get_registered_names())
+        return [self.class_names[class_id] for class_id in range(1, len(self.class_names) + 1)]
+
+    def set_table(self, names):
+        self.class_ids = {name: class_id for class_id, name in enumerate(names, 1)}
+        self.class_names = {class_id: name for name, class_id in self.class_ids.items()}
+
+    # ------------------------
+    # サーバー
+    # ------------------------
+    def send_to(self, peer_id):
+        """まだ送っていなければ peer_id に class_table を送る (シーン同期より前に届くように)"""
+        if peer_id in self.sent_peers:
+            return
+        self.sent_peers.add(peer_id)
+        self.network_manager.send_to_client(peer_id, {"type": "class_table", "names": self.get_table()})
+
+    def forget_peer(self, peer_id):
+        """退出したクライアント (再参加したら class_table を送り直す)"""
+        self.sent_peers.discard(peer_id)
+        self.acked_peers.discard(peer_id)
+
+    def is_acked(self, peer_id):
+        return peer_id in self.acked_peers
+
+    def all_acked(self):
+        """ロビーの全クライアントが class_table_ack を返した"""
+        server_id = self.network_manager.server_steam_id
+        return all(member in self.acked_peers for member in self.network_manager.lobby_members if member != server_id)
+
+    def get_class_ref(self, target_class, peer_id=None):
+        """
+        メッセージに入れるクラスの参照 (クラスIDを使えれば ID、使えなければクラス名)。
+        peer_id を省略すると全員に送るメッセージ用になり、全クライアントが ack するまではクラス名を返す
+        """
+        name = target_class.__name__
+        if not self.network_manager.is_server:
+            return name
+        acked = self.all_acked() if peer_id is None else self.is_acked(peer_id)
+        return self.class_ids.get(name, name) if acked else name
+
+    def to_names(self, entries):
+        """エントリ [クラス, ...] のクラスIDをクラス名に置き換えたリスト (削除を表す network_id はそのまま)"""
+        return [[self.class_names.get(entry[0], entry[0]), *entry[1:]] if isinstance(entry, list) else entry
+                for entry in entries]
+
+    # ------------------------
+    # 受信
+    # ------------------------
+    def get_class_name(self, class_ref):
+        """クラスID またはクラス名からクラス名を取得する。表にない ID なら None"""
+        if not isinstance(class_ref, int):
+            return class_ref
+        name = self.class_names.get(class_ref)
+        if name is None:
+            print(f"⚠️ クラスID {class_ref} が class_table にありません。")
+        return name
+
+    def receive_message(self, message):
+        """クラスIDの表のメッセージを処理したら True (シーンには渡さない)"""
+        t = message.get("type")
+        if t == "class_table":
+            if self.network_manager.is_client:
+                self.set_table(message["names"])
+                self.network_manager.send_to_server({
+                    "type": "class_table_ack",
+                    "sender_id": self.network_manager.local_steam_id,
+                })
+            return True
+        if t == "class_table_ack":
+            if self.network_manager.is_server and message.get("sender_id") in self.sent_peers:
+                self.acked_peers.add(message["sender_id"])
+            return True
+        return False
+
+
+MessageSchemaRegistry.register("class_table_ack", 19, [("sender_id", "Q")])
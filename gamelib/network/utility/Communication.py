@@ -1,15 +1,150 @@
 import json
 import math
-import time
+from .Envelope import (Envelope, PROTOCOL_VERSION, PROTOCOL_VERSION_JSON, PROTOCOL_VERSION_BINARY,
+                       KIND_JSON, KIND_SCHEMA, KIND_BATCH, FLAG_FRAGMENT, FLAG_COMPRESSED,
+                       MAX_FRAME_PAYLOAD, BATCH_ENTRY)
+from .MessageSchema import MessageSchemaRegistry
+from .Compression import Compression, COMPRESSION_THRESHOLD
+from .FragmentAssembler import FragmentAssembler
 
-FRAGMENT_SIZE = 750  # 断片サイズ
+FRAGMENT_SIZE = 750  # 断片サイズ (JSON 形式)
+
+
+def split_utf8(data, size):
+    """UTF-8 のバイト列を文字の途中で切らないように size 以下の断片に分ける"""
+    start = 0
+    length = len(data)
+    while start < length:
+        end = min(start + size, length)
+        # 継続バイト (0b10xxxxxx) の手前で切らないように戻る
+        while end < length and end > start + 1 and data[end] & 0xC0 == 0x80:
+            end -= 1
+        yield data[start:end]
+        start = end
 
 class Communication:
     def __init__(self, network_manager):
         self.network_manager = network_manager
+        self.protocol_version = PROTOCOL_VERSION
+        self.peer_versions = {}  # 送信先ID → 対応しているプロトコルバージョン
+        self.next_message_ids = {}  # 送信先ID → 次のメッセージID (断片用)
+        self.fragment_assembler = FragmentAssembler()  # 断片のバッファ管理
+
+        # 圧縮 (compression_threshold bytes 以上で、圧縮して小さくなる場合のみ)
+        self.compression_enabled = True
+        self.compression_threshold = COMPRESSION_THRESHOLD
+        self.compressed_bytes_saved = 0
+
+    # ------------------------
+    # プロトコルバージョン
+    # ------------------------
+    def set_peer_version(self, peer_id, version):
+        """相手が対応しているプロトコルを記録する (ping などで通知される)"""
+        version = min(version, self.protocol_version)
+        if self.peer_versions.get(peer_id, PROTOCOL_VERSION_JSON) < version:
+            self.peer_versions[peer_id] = version
 
+    def get_peer_version(self, peer_id):
+        return self.peer_versions.get(peer_id, PROTOCOL_VERSION_JSON)
+
+    def _next_message_id(self, target_id):
+        message_id = self.next_message_ids.get(target_id, 0)
+        self.next_message_ids[target_id] = (message_id + 1) & 0xFFFF
+        return message_id
+
+    # ------------------------
+    # 送信
+    # ------------------------
     def send_message(self, target_id, data):
-        """データを送信 (そのまま分割)"""
+        """データを送信 (相手がバイナリ形式に対応していればバイナリで送る)"""
+        if self.get_peer_version(target_id) >= PROTOCOL_VERSION_BINARY:
+            kind, payload = self.encode_payload(data)
+            self._send_binary_message(target_id, kind, payload)
+        else:
+            self._send_json_message(target_id, data)
+
+    def encode_payload(self, data):
+        """スキーマ登録済みなら struct で、それ以外は JSON でエンコードし (kind, payload) を返す"""
+        payload = MessageSchemaRegistry.encode(data)
+        if payload is not None:
+            return KIND_SCHEMA, payload
+        return KIND_JSON, json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+    def decode_payload(self, kind, payload):
+        if kind == KIND_SCHEMA:
+            return MessageSchemaRegistry.decode(payload)
+        if kind == KIND_JSON:
+            return json.loads(bytes(payload))
+        print(f"⚠️ 未対応のメッセージ種別: {kind}")
+        return None
+
+    def _compress(self, payload):
+        """圧縮して小さくなれば (payload, FLAG_COMPRESSED)、それ以外は (payload, 0) を返す"""
+        if self.compression_enabled:
+            compressed = Compression.compress(payload, self.compression_threshold)
+            if compressed is not None:
+                self.compressed_bytes_saved += len(payload) - len(compressed)
+                return compressed, FLAG_COMPRESSED
+        return payload, 0
+
+    def _send_binary_message(self, target_id, kind, payload):
+        """payload をバイナリフレームで送信 (大きければ圧縮・分割)。送信したフレーム数を返す"""
+        steam = self.network_manager.steam
+        payload, flags = self._compress(payload)
+        if len(payload) <= MAX_FRAME_PAYLOAD:
+            steam.send_p2p_message(target_id, Envelope.pack(kind, payload, flags))
+            return 1
+
+        total_fragments = math.ceil(len(payload) / MAX_FRAME_PAYLOAD)
+        message_id = self._next_message_id(target_id)
+        view = memoryview(payload)
+        for index in range(total_fragments):
+            start = index * MAX_FRAME_PAYLOAD
+            frame = Envelope.pack(kind, view[start:start + MAX_FRAME_PAYLOAD], flags | FLAG_FRAGMENT,
+                                  message_id, index, total_fragments)
+            steam.send_p2p_message(target_id, frame)
+        return total_fragments
+
+    def send_batch(self, target_id, entries):
+        """
+        エンコード済みの [(kind, payload), ...] を MTU に収まるバッチフレームに詰めて送信する。
+        :return: 送信したフレーム数
+        """
+        steam = self.network_manager.steam
+        frames = 0
+        batch = []
+        batch_size = 0
+        for kind, payload in entries:
+            entry_size = BATCH_ENTRY.size + len(payload)
+            if batch and batch_size + entry_size > MAX_FRAME_PAYLOAD:
+                frames += self._send_batch_frame(steam, target_id, batch)
+                batch = []
+                batch_size = 0
+            if entry_size > MAX_FRAME_PAYLOAD:
+                # 1件で MTU を超えるものは単独で (分割して) 送る
+                frames += self._send_binary_message(target_id, kind, payload)
+                continue
+            batch.append((kind, payload))
+            batch_size += entry_size
+        if batch:
+            frames += self._send_batch_frame(steam, target_id, batch)
+        return frames
+
+    def _send_batch_frame(self, steam, target_id, batch):
+        if len(batch) == 1:
+            kind, payload = batch[0]
+        else:
+            parts = []
+            for entry_kind, entry_payload in batch:
+                parts.append(BATCH_ENTRY.pack(entry_kind, len(entry_payload)))
+                parts.append(entry_payload)
+            kind, payload = KIND_BATCH, b"".join(parts)
+        payload, flags = self._compress(payload)
+        steam.send_p2p_message(target_id, Envelope.pack(kind, payload, flags))
+        return 1
+
+    def _send_json_message(self, target_id, data):
+        """旧形式 (二重JSON) で送信"""
         json_str = json.dumps(data)  # 直接JSONに変換
         message_bytes = json_str.encode('utf-8')  # UTF-8バイト列に変換
 
@@ -20,14 +155,14 @@ class Communication:
             self.network_manager.steam.send_p2p_message(target_id, message_payload)
 
     def _send_large_message(self, target_id, message_bytes):
-        """データを断片化して送信"""
-        total_fragments = math.ceil(len(message_bytes) / FRAGMENT_SIZE)
-        fragment_id = str(time.time())  # 一意のIDを生成
+        """データを断片化して送信 (文字の境界で分割するので各断片は正しい文字列になる)"""
+        fragments = list(split_utf8(message_bytes, FRAGMENT_SIZE))
+        total_fragments = len(fragments)
+        # 旧形式の受信側は fragment_id だけで断片を管理するため、送信者IDを含めて衝突を防ぐ
+        fragment_id = f"{self.network_manager.steam.steam_id}:{self._next_message_id(target_id)}"
 
-        for index in range(total_fragments):
-            start = index * FRAGMENT_SIZE
-            end = start + FRAGMENT_SIZE
-            fragment_data = message_bytes[start:end].decode('utf-8', errors='replace')
+        for index, fragment_bytes in enumerate(fragments):
+            fragment_data = fragment_bytes.decode('utf-8')
 
             fragment = {
                 "type": "fragment",
@@ -38,4 +173,87 @@ class Communication:
             }
 
             fragment_bytes = json.dumps(fragment).encode('utf-8')
-            self.network_manager.steam.send_p2p_message(target_id, fragment_bytes)
\ No newline at end of file
+            self.network_manager.steam.send_p2p_message(target_id, fragment_bytes)
+
+    # ------------------------
+    # 受信
+    # ------------------------
+    def receive_message(self, raw_data, sender_id):
+        """Transport から受け取った生データをデコードし、完成したメッセージのリストを返す"""
+        if Envelope.is_binary(raw_data):
+            return self._receive_binary_message(raw_data, sender_id)
+        return self._receive_json_message(raw_data, sender_id)
+
+    def _receive_binary_message(self, raw_data, sender_id):
+        frame = Envelope.unpack(raw_data)
+        if frame is None:
+            print(f"⚠️ 不完全なフレームを受信しました (from {sender_id})")
+            return []
+        # バイナリを送ってくる相手にはバイナリで返してよい
+        self.set_peer_version(sender_id, PROTOCOL_VERSION_BINARY)
+
+        kind, flags, message_id, index, total_fragments, payload = frame
+        if flags & FLAG_FRAGMENT:
+            payload = self.fragment_assembler.add((sender_id, message_id), index, total_fragments, payload)
+            if payload is None:
+                return []
+        if flags & FLAG_COMPRESSED:
+            payload = Compression.decompress(payload)
+            if payload is None:
+                print(f"⚠️ 圧縮データの展開に失敗しました (from {sender_id})")
+                return []
+        try:
+            if kind == KIND_BATCH:
+                messages = []
+                for entry_kind, entry_payload in Envelope.iter_batch(payload):
+                    message = self.decode_payload(entry_kind, entry_payload)
+                    if message:
+                        messages.append(message)
+                return messages
+            message = self.decode_payload(kind, payload)
+            return [message] if message else []
+        except Exception as e:
+            print(f"⚠️ Binary frame decode error: {e}")
+        return []
+
+    def _receive_json_message(self, raw_data, sender_id):
+        try:
+            # UTF-8 でデコード
+            decoded_str = str(raw_data, 'utf-8', errors='replace')
+            # JSONを解析
+            message = json.loads(decoded_str)
+
+            if message.get("type") == "fragment":
+                complete = self._handle_incoming_fragment(sender_id, message)
+                messages = [complete] if complete else []
+            elif message.get("type") == "full_message":
+                messages = [json.loads(message["data"])]
+            else:
+                return []
+
+            # 旧形式でも ping などでバイナリ対応を通知してくる
+            for message in messages:
+                if "protocol" in message:
+                    self.set_peer_version(sender_id, message["protocol"])
+            return messages
+
+        except Exception as e:
+            print(f"⚠️ JSON Decode error: {e}")
+            print(f"⚠️ Raw Buffer Value: {raw_data}")
+            return []
+
+    def _handle_incoming_fragment(self, sender_id, fragment):
+        """受信したフラグメントを結合し、完全なメッセージを復元"""
+        complete_bytes = self.fragment_assembler.add(
+            (sender_id, fragment["fragment_id"]),
+            fragment["fragment_index"],
+            fragment["total_fragments"],
+            fragment["data"].encode('utf-8'),
+        )
+        if complete_bytes is None:
+            return None
+        try:
+            return json.loads(complete_bytes)
+        except Exception as e:
+            print(f"⚠️ Error in fragment decoding: {e}")
+            return None
@@ -0,0 +1,62 @@
+import zlib
+
+# 圧縮を試す payload の最小サイズ (これより小さいものはヘッダ分で得をしない)
+COMPRESSION_THRESHOLD = 256
+COMPRESSION_LEVEL = 6
+# 展開後のサイズ上限 (圧縮爆弾対策。FragmentAssembler の上限と同じ)
+MAX_DECOMPRESSED_SIZE = 4 * 1024 * 1024
+
+# zlib のプリセット辞書。送受信で同じものを使う必要があるので、変更する場合はプロトコルごと変えること。
+# zlib は辞書の後ろの方ほど短い距離で参照できるので、よく出る文字列ほど後ろに置く。
+PRESET_DICTIONARY = "".join([
+    '{"type":"request_missing_object","network_id":',
+    '{"type":"force_sync_network_game_objects_components"}',
+    '{"type":"add_network_child","parent_id":',
+    '"child_data":{"class_name":"',
+    '{"type":"add_object","object_data":{"class_name":"',
+    '{"type":"sync_network_object","network_id":',
+    '"active":true,"layer":0,',
+    '{"type":"sync_sprite","network_id":',
+    '"image_path":"assets/","base_size":[',
+    '{"type":"sync_transform","network_id":',
+    '"position_x":0.0,"position_y":0.0,"rotation":0.0,"scale_x":1.0,"scale_y":1.0}',
+    '{"type":"scene_sync","scene_name":"',
+    '","scene_data":{"objects":[',
+    '{"class_name":"Field","object_name":"Field","network_id":',
+    '{"class_name":"Blocks","object_name":"Blocks","network_id":',
+    '{"class_name":"TMino","object_name":"TMino","network_id":',
+    '{"class_name":"NetworkGameObject","object_name":"NetworkGameObject","network_id":',
+    '{"class_name":"Block","object_name":"Block","network_id":',
+    ',"steam_id":7656119',
+    ',"parent_id":null},',
+    ',"parent_id":',
+]).encode('utf-8')
+
+
+class Compression:
+    """payload の zlib 圧縮 (プリセット辞書つき)"""
+    @staticmethod
+    def compress(payload, threshold=COMPRESSION_THRESHOLD):
+        """
+        threshold 以上の payload を圧縮する。
+        :return: 圧縮後の方が小さければ圧縮したバイト列、それ以外は None
+        """
+        if len(payload) < threshold:
+            return None
+        compressor = zlib.compressobj(COMPRESSION_LEVEL, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=PRESET_DICTIONARY)
+        compressed = compressor.compress(payload) + compressor.flush()
+        if len(compressed) >= len(payload):
+            return None
+        return compressed
+
+    @staticmethod
+    def decompress(payload, max_size=MAX_DECOMPRESSED_SIZE):
+        """展開する。壊れている・上限を超える場合は None"""
+        decompressor = zlib.decompressobj(-zlib.MAX_WBITS, zdict=PRESET_DICTIONARY)
+        try:
+            data = decompressor.decompress(payload, max_size)
+        except zlib.error:
+            return None
+        if decompressor.unconsumed_tail or not decompressor.eof:
+            return None
+        return data
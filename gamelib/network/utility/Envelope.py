@@ -0,0 +1,65 @@
+import struct
+
+# プロトコルバージョン
+PROTOCOL_VERSION_JSON = 1    # {"type": "full_message", "data": "<json>"} の二重JSON形式
+PROTOCOL_VERSION_BINARY = 2  # 本モジュールのバイナリ形式
+PROTOCOL_VERSION = PROTOCOL_VERSION_BINARY
+
+# 先頭1バイト。JSON ('{') や UTF-8 の先頭バイトとは衝突しない値
+MAGIC = 0xB2
+
+# メッセージの種類 (payload の中身)
+KIND_JSON = 0    # payload は UTF-8 の JSON
+KIND_SCHEMA = 1  # payload は MessageSchemaRegistry でエンコードしたバイナリ
+KIND_BATCH = 2   # payload は [kind u8][長さ u16][payload] の繰り返し (複数メッセージ)
+
+# フラグ
+FLAG_FRAGMENT = 0x01  # 分割されたメッセージの断片
+FLAG_COMPRESSED = 0x02  # payload (断片の場合は結合後の payload) が zlib 圧縮されている
+
+# magic, kind, flags, message_id, fragment_index, fragment_count, payload_length
+HEADER = struct.Struct("<BBBHHHH")
+HEADER_SIZE = HEADER.size
+BATCH_ENTRY = struct.Struct("<BH")
+
+# 1フレームに載せる payload の上限 (ヘッダ + Transport 側のエスケープ込みで MTU 1500 に収まる値)
+MAX_FRAME_PAYLOAD = 1200
+
+
+class Envelope:
+    """
+    バイナリのワイヤーフォーマット (プロトコル v2)。
+    [ヘッダ 11 bytes][payload] の形で、JSON を一度だけエンコードして送る。
+    """
+    @staticmethod
+    def is_binary(data):
+        return len(data) >= HEADER_SIZE and data[0] == MAGIC
+
+    @staticmethod
+    def pack(kind, payload, flags=0, message_id=0, fragment_index=0, fragment_count=1):
+        return HEADER.pack(MAGIC, kind, flags, message_id, fragment_index, fragment_count, len(payload)) + payload
+
+    @staticmethod
+    def unpack(data):
+        """
+        フレームを分解する。
+        :return: (kind, flags, message_id, fragment_index, fragment_count, payload) / 不正なら None
+        payload は data の memoryview スライス (コピーしない)
+        """
+        _, kind, flags, message_id, fragment_index, fragment_count, length = HEADER.unpack_from(data)
+        end = HEADER_SIZE + length
+        if end > len(data):
+            return None
+        payload = memoryview(data)[HEADER_SIZE:end]
+        return kind, flags, message_id, fragment_index, fragment_count, payload
+
+    @staticmethod
+    def iter_batch(payload):
+        """バッチの payload から (kind, payload) を順に取り出す"""
+        offset = 0
+        length = len(payload)
+        while offset + BATCH_ENTRY.size <= length:
+            kind, size = BATCH_ENTRY.unpack_from(payload, offset)
+            offset += BATCH_ENTRY.size
+            yield kind, payload[offset:offset + size]
+            offset += size
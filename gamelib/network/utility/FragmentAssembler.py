@@ -0,0 +1,112 @@
+import time
+from collections import OrderedDict
+
+
+class PartialMessage:
+    """組み立て中のメッセージ"""
+    __slots__ = ("parts", "received", "size", "last_update")
+
+    def __init__(self, total_fragments, now):
+        self.parts = [None] * total_fragments
+        self.received = 0
+        self.size = 0
+        self.last_update = now
+
+
+class FragmentAssembler:
+    """
+    断片化されたメッセージの復元。
+    - キーは (送信者ID, メッセージID) なので送信者間で衝突しない
+    - 断片はバイト列のまま保持し、揃った時点で結合する
+    - 保持する合計バイト数に上限があり、超えたら最も古い (最後の受信が古い) メッセージから破棄する
+    - 一定時間断片が届かないメッセージは破棄する (ロスで揃わない断片のリーク防止)
+    """
+    def __init__(self, max_buffered_bytes=4 * 1024 * 1024, timeout=5.0, max_fragments=4096):
+        self.max_buffered_bytes = max_buffered_bytes
+        self.timeout = timeout
+        self.max_fragments = max_fragments
+
+        self.partials = OrderedDict()  # キー → PartialMessage (最後に更新された順)
+        self.buffered_bytes = 0
+
+        # 統計
+        self.completed_messages = 0
+        self.duplicate_fragments = 0
+        self.dropped_fragments = 0  # 破棄したメッセージに含まれていた断片 + 不正な断片
+        self.expired_messages = 0   # タイムアウトで破棄
+        self.evicted_messages = 0   # メモリ上限で破棄
+
+    def add(self, key, index, total_fragments, data, now=None):
+        """
+        断片を追加する。
+        :return: すべて揃ったら結合したバイト列、それ以外は None
+        """
+        now = time.perf_counter() if now is None else now
+        self.expire(now)
+
+        if not 0 < total_fragments <= self.max_fragments or not 0 <= index < total_fragments:
+            self.dropped_fragments += 1
+            return None
+
+        partial = self.partials.get(key)
+        if partial is not None and len(partial.parts) != total_fragments:
+            # 同じIDで別のメッセージ (ID が一周した) → 古い方を捨てる
+            self._discard(key)
+            partial = None
+        if partial is None:
+            partial = self.partials[key] = PartialMessage(total_fragments, now)
+        else:
+            self.partials.move_to_end(key)
+
+        if partial.parts[index] is not None:
+            self.duplicate_fragments += 1
+            return None
+
+        partial.parts[index] = bytes(data)
+        partial.received += 1
+        partial.size += len(data)
+        partial.last_update = now
+        self.buffered_bytes += len(data)
+
+        if partial.received == total_fragments:
+            del self.partials[key]
+            self.buffered_bytes -= partial.size
+            self.completed_messages += 1
+            return b"".join(partial.parts)
+
+        # メモリ上限を超えたら古いものから破棄 (今回のメッセージは残す)
+        while self.buffered_bytes > self.max_buffered_bytes and len(self.partials) > 1:
+            oldest_key = next(iter(self.partials))
+            self._discard(oldest_key)
+            self.evicted_messages += 1
+        return None
+
+    def expire(self, now=None):
+        """タイムアウトしたメッセージを破棄する (古い順に並んでいるので先頭から見るだけでよい)"""
+        now = time.perf_counter() if now is None else now
+        while self.partials:
+            key, partial = next(iter(self.partials.items()))
+            if now - partial.last_update < self.timeout:
+                break
+            self._discard(key)
+            self.expired_messages += 1
+
+    def _discard(self, key):
+        partial = self.partials.pop(key)
+        self.buffered_bytes -= partial.size
+        self.dropped_fragments += partial.received
+
+    def clear(self):
+        self.partials.clear()
+        self.buffered_bytes = 0
+
+    def get_stats(self):
+        return {
+            "pending_messages": len(self.partials),
+            "buffered_bytes": self.buffered_bytes,
+            "completed_messages": self.completed_messages,
+            "duplicate_fragments": self.duplicate_fragments,
+            "dropped_fragments": self.dropped_fragments,
+            "expired_messages": self.expired_messages,
+            "evicted_messages": self.evicted_messages,
+        }
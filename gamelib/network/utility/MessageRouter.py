@@ -0,0 +1,68 @@
+class MessageRouter:
+    """
+    (メッセージ type, ルーティングキー) → ハンドラ のテーブル。
+    ハンドラが登録されている type のメッセージは、キーが一致するハンドラだけに届ける
+    (全オブジェクト × 全コンポーネントへの配信をしない)。
+    ルーティングキーは通常 network_id で、type ごとに別のフィールドを指定できる。
+    """
+    # type → ルーティングキーに使うフィールド (指定がなければ network_id)
+    key_fields = {}
+
+    def __init__(self):
+        self.routes = {}  # (type, キー) → (ハンドラ, ...)
+        self.routed_types = {}  # type → 登録されているハンドラ数
+
+        # 統計
+        self.routed_messages = 0
+        self.unrouted_messages = 0  # type は登録済みだが、キーに一致するハンドラがなかった
+
+    @classmethod
+    def register_key_field(cls, message_type, field):
+        cls.key_fields[message_type] = field
+
+    def add_route(self, message_type, key, handler):
+        route = (message_type, key)
+        self.routes[route] = self.routes.get(route, ()) + (handler,)
+        self.routed_types[message_type] = self.routed_types.get(message_type, 0) + 1
+
+    def remove_route(self, message_type, key, handler):
+        route = (message_type, key)
+        handlers = self.routes.get(route)
+        if not handlers or handler not in handlers:
+            return
+        handlers = tuple(h for h in handlers if h != handler)
+        if handlers:
+            self.routes[route] = handlers
+        else:
+            del self.routes[route]
+
+        count = self.routed_types[message_type] - 1
+        if count:
+            self.routed_types[message_type] = count
+        else:
+            del self.routed_types[message_type]
+
+    def is_routed(self, message_type):
+        return message_type in self.routed_types
+
+    def dispatch(self, message):
+        """
+        ルーティングテーブルで配信する。
+        :return: type が登録済みなら True (配信先がなくても True)、未登録なら False
+        """
+        message_type = message.get("type")
+        if message_type not in self.routed_types:
+            return False
+        key = message.get(self.key_fields.get(message_type, "network_id"))
+        handlers = self.routes.get((message_type, key))
+        if handlers:
+            self.routed_messages += 1
+            for handler in handlers:
+                handler(message)
+        else:
+            self.unrouted_messages += 1
+        return True
+
+    def clear(self):
+        self.routes.clear()
+        self.routed_types.clear()
@@ -0,0 +1,160 @@
+import struct
+
+# フィールドの型 (struct のフォーマット文字。"str" は u16 長さ + UTF-8)
+# 例: ("network_id", "I"), ("position_x", "f"), ("base_size", "2f"), ("image_path", "str")
+# "f" (float32) は有効桁が約7桁で、受信側の値は送信側と一致しない (例: 100000.3 → 100000.3125)。
+# 画面座標・拡大率・角度など表示用の値は "f" で足りるが、時刻や RTT など差を取る値・一致が必要な値は "d" にする
+STR = "str"
+
+# type_id の割り当て: 1～63 は gamelib、64～255 はゲーム側で使用する
+LIBRARY_TYPE_IDS = range(1, 64)
+GAME_TYPE_IDS = range(64, 256)
+
+_LENGTH = struct.Struct("<H")
+_TYPE_ID = struct.Struct("<B")
+
+
+class MessageSchema:
+    """1種類のメッセージのフィールド定義と、事前にコンパイルした struct レイアウト"""
+    def __init__(self, type_name, type_id, fields, sparse=False, coalesce=False):
+        """
+        :param fields: [(フィールド名, 型), ...]
+        :param sparse: True なら未送信のフィールドは受信側でキー自体が無い (差分同期用)。
+                       False なら None として復元される
+        :param coalesce: True なら送信キュー内の同じ network_id のメッセージを最新の値にまとめる
+        """
+        if len(fields) > 32:
+            raise ValueError(f"{type_name}: フィールドは32個までです")
+        self.type_name = type_name
+        self.type_id = type_id
+        self.sparse = sparse
+        self.coalesce = coalesce
+        self.names = tuple(name for name, _ in fields)
+
+        # 存在ビットマスク (bit i = i番目のフィールドを含む)
+        mask_format = "B" if len(fields) <= 8 else "H" if len(fields) <= 16 else "I"
+        self.header = struct.Struct("<B" + mask_format)
+        self.full_mask = (1 << len(fields)) - 1
+
+        # フィールドごとの struct (文字列は None)、ベクトルなら要素数
+        self.codecs = []
+        for name, field_type in fields:
+            if field_type == STR:
+                self.codecs.append((name, None, 0))
+            else:
+                codec = struct.Struct("<" + field_type)
+                size = len(codec.unpack(bytes(codec.size)))
+                self.codecs.append((name, codec, size if size > 1 else 0))
+
+        # 文字列を含まないメッセージは全フィールドを1つの struct でまとめて pack する
+        self.full_struct = None
+        if all(codec is not None for _, codec, _ in self.codecs):
+            self.full_struct = struct.Struct("<B" + mask_format + "".join(field_type for _, field_type in fields))
+        self.has_vectors = any(vector_size for _, _, vector_size in self.codecs)
+
+    def encode(self, message):
+        """辞書をバイト列にする。スキーマ外のキーがあれば None (JSON で送る)"""
+        values = []
+        mask = 0
+        used_keys = 1  # "type"
+        for bit, (name, codec, vector_size) in enumerate(self.codecs):
+            if name not in message:
+                continue
+            used_keys += 1
+            value = message[name]
+            if value is None:
+                continue
+            mask |= 1 << bit
+            if vector_size:
+                values.extend(value)
+            else:
+                values.append(value)
+        if used_keys != len(message):
+            return None
+
+        try:
+            if mask == self.full_mask and self.full_struct is not None:
+                return self.full_struct.pack(self.type_id, mask, *values)
+
+            out = [self.header.pack(self.type_id, mask)]
+            index = 0
+            for bit, (name, codec, vector_size) in enumerate(self.codecs):
+                if not mask & (1 << bit):
+                    continue
+                if codec is None:
+                    data = values[index].encode('utf-8')
+                    out.append(_LENGTH.pack(len(data)))
+                    out.append(data)
+                    index += 1
+                elif vector_size:
+                    out.append(codec.pack(*values[index:index + vector_size]))
+                    index += vector_size
+                else:
+                    out.append(codec.pack(values[index]))
+                    index += 1
+            return b"".join(out)
+        except (struct.error, TypeError, AttributeError):
+            return None  # 型が合わない値は JSON にフォールバック
+
+    def decode(self, payload):
+        _, mask = self.header.unpack_from(payload)
+        message = {"type": self.type_name}
+        if mask == self.full_mask and self.full_struct is not None and not self.has_vectors:
+            message.update(zip(self.names, self.full_struct.unpack_from(payload)[2:]))
+            return message
+        offset = self.header.size
+        for bit, (name, codec, vector_size) in enumerate(self.codecs):
+            if not mask & (1 << bit):
+                if not self.sparse:
+                    message[name] = None
+                continue
+            if codec is None:
+                (length,) = _LENGTH.unpack_from(payload, offset)
+                offset += _LENGTH.size
+                message[name] = bytes(payload[offset:offset + length]).decode('utf-8')
+                offset += length
+            elif vector_size:
+                message[name] = list(codec.unpack_from(payload, offset))
+                offset += codec.size
+            else:
+                (message[name],) = codec.unpack_from(payload, offset)
+                offset += codec.size
+        return message
+
+
+class MessageSchemaRegistry:
+    """メッセージ種別 → スキーマの登録先 (NetworkObjectFactory と同じくクラス単位で共有)"""
+    _by_name = {}
+    _by_id = {}
+
+    @classmethod
+    def register(cls, type_name, type_id, fields, sparse=False, coalesce=False):
+        """メッセージのフィールドと型を登録する (モジュール読み込み時に1度だけ呼ぶ)"""
+        existing = cls._by_id.get(type_id)
+        if existing is not None and existing.type_name != type_name:
+            raise Exception(f"type_id {type_id} は '{existing.type_name}' が使用しています")
+        schema = MessageSchema(type_name, type_id, fields, sparse, coalesce)
+        cls._by_name[type_name] = schema
+        cls._by_id[type_id] = schema
+        return schema
+
+    @classmethod
+    def get_schema(cls, type_name):
+        return cls._by_name.get(type_name)
+
+    @classmethod
+    def encode(cls, message):
+        """登録済みのメッセージならバイト列を、それ以外は None を返す"""
+        schema = cls._by_name.get(message.get("type"))
+        if schema is None:
+            return None
+        return schema.encode(message)
+
+    @classmethod
+    def decode(cls, payload):
+        (type_id,) = _TYPE_ID.unpack_from(payload)
+        schema = cls._by_id.get(type_id)
+        if schema is None:
+            print(f"⚠️ 未登録の type_id: {type_id}")
+            return None
+        return schema.decode(payload)
@@ -1,5 +1,6 @@
 import time
 import json
+from .MessageSchema import MessageSchemaRegistry
 
 class MissingObjectManager:
     def __init__(self, network_manager, request_timeout=5):
@@ -51,3 +52,6 @@ class MissingObjectManager:
                     print(f"📡 Re-requesting missing object {network_id}, attempt {req['attempts']}")
                     self._send_missing_object_request(network_id)
             time.sleep(1)
+
+
+MessageSchemaRegistry.register("request_missing_object", 12, [("network_id", "I"), ("sender_id", "Q")])
@@ -0,0 +1,36 @@
+class NetworkStats:
+    """受信処理の統計 (受信キューの滞留を可視化する)"""
+    def __init__(self):
+        self.received_datagrams = 0
+        self.received_messages = 0
+        self.processed_messages = 0
+
+        self.processed_last_frame = 0  # 直近フレームで処理したメッセージ数
+        self.pump_time_last_frame = 0.0  # 直近フレームの受信処理時間 (秒)
+        self.backlog = 0  # フレーム終了時点で未処理のメッセージ数 (不明な Transport 分は含まない)
+        self.max_backlog = 0
+        self.budget_exhausted_frames = 0  # 予算を使い切って処理を次フレームへ持ち越した回数
+        self.queue_full_waits = 0  # 受信スレッドが pending_messages の上限で待った回数
+
+    def record_pump(self, processed, elapsed, backlog, exhausted):
+        self.processed_messages += processed
+        self.processed_last_frame = processed
+        self.pump_time_last_frame = elapsed
+        self.backlog = backlog
+        if backlog > self.max_backlog:
+            self.max_backlog = backlog
+        if exhausted:
+            self.budget_exhausted_frames += 1
+
+    def get_stats(self):
+        return {
+            "received_datagrams": self.received_datagrams,
+            "received_messages": self.received_messages,
+            "processed_messages": self.processed_messages,
+            "processed_last_frame": self.processed_last_frame,
+            "pump_time_last_frame": self.pump_time_last_frame,
+            "backlog": self.backlog,
+            "max_backlog": self.max_backlog,
+            "budget_exhausted_frames": self.budget_exhausted_frames,
+            "queue_full_waits": self.queue_full_waits,
+        }
@@ -1,4 +1,5 @@
 import time
+from .MessageSchema import MessageSchemaRegistry
 
 class PingMeter:
     def __init__(self, network_manager, ema_alpha=0.2):
@@ -12,6 +13,12 @@ class PingMeter:
         self.ping_rate = 0.0
         self.interval = 1
         self.last_send_time = time.time()
+        # サーバー: クライアントID → クライアントが ping_request で報告した RTT (秒)
+        self.peer_rtts = {}
+        # クライアント: サーバー時刻 (サーバーの perf_counter) - 自分の perf_counter (ping_response から推定)
+        self.server_time_offset = None
+        # クライアント: 直前に受信した server_time メッセージの時刻 (同じフレームの状態の送信時刻)
+        self.message_server_time = None
 
     def process_ping_response(self, ping_response):
         """
@@ -29,18 +36,60 @@ class PingMeter:
                 self.ping_rate = self.ema_alpha * estimated_ping + (1 - self.ema_alpha) * self.ping_rate
             print(f"DEBUG: RTT = {rtt:.3f}s, estimated ping = {estimated_ping:.3f}s, smoothed ping_rate = {self.ping_rate:.3f}s")
             self.last_ping_time = current_time
+
+            server_time = ping_response.get("server_time")
+            if server_time is not None:
+                # 応答はサーバーで片道分前に作られている
+                offset = server_time + estimated_ping - current_time
+                if self.server_time_offset is None:
+                    self.server_time_offset = offset
+                else:
+                    self.server_time_offset = self.ema_alpha * offset + (1 - self.ema_alpha) * self.server_time_offset
+
+    def clear(self):
+        self.peer_rtts.clear()
+        self.server_time_offset = None
+        self.message_server_time = None
+
+    def server_time(self):
+        """クライアント: 現在のサーバー時刻の推定値 (まだ分からなければ None)"""
+        if self.server_time_offset is None:
+            return None
+        return time.perf_counter() + self.server_time_offset
+
+    @property
+    def rtt(self):
+        """自分が測定した平滑化済みの RTT (秒)"""
+        return self.ping_rate * 2.0
+
+    def get_rtt(self, peer_id):
+        """送信先との RTT (秒)。不明なら None"""
+        if self.network_manager.is_server:
+            return self.peer_rtts.get(peer_id)
+        return self.rtt if self.ping_rate else None
+
     def send_ping(self, message):
+        sender_id = int(message.get("sender_id"))
+        if message.get("rtt"):
+            self.peer_rtts[sender_id] = message["rtt"]
         data = {
             "type": "ping_response", 
             "time": message.get("time"),
+            "protocol": self.network_manager.communication.protocol_version,
+            "server_time": time.perf_counter(),
         }
-        self.network_manager.send_to_client(int(message.get("sender_id")), data)
+        self.network_manager.send_to_client(sender_id, data, immediate=True)
     def receive_message(self, message):
         t = message.get("type")
-        if t == "ping_request":
+        if t == "server_time":
+            self.message_server_time = message["time"]
+        elif t == "ping_request":
             self.send_ping(message)
         elif t == "ping_response":
             self.process_ping_response(message)
+        else:
+            return False
+        return True  # シーンには渡さない
     
     
 
@@ -54,7 +103,14 @@ class PingMeter:
             ping_request = {
                "type": "ping_request",
                "time": time.perf_counter(),
-               "sender_id": self.network_manager.local_steam_id
+               "sender_id": self.network_manager.local_steam_id,
+               "protocol": self.network_manager.communication.protocol_version,
+               "rtt": self.rtt,  # サーバーの送信予算の調整に使われる
             }
             self.last_send_time = time.time()
-            self.network_manager.send_to_server(ping_request)
+            self.network_manager.send_to_server(ping_request, immediate=True)
+
+
+MessageSchemaRegistry.register("ping_request", 1, [("time", "d"), ("sender_id", "Q"), ("protocol", "B"), ("rtt", "d")])
+MessageSchemaRegistry.register("ping_response", 2, [("time", "d"), ("protocol", "B"), ("server_time", "d")])
+MessageSchemaRegistry.register("server_time", 15, [("time", "d")])
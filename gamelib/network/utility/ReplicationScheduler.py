@@ -0,0 +1,67 @@
+class ReplicationScheduler:
+    """
+    ネットワークコンポーネントの差分送信 (replicate) をネットワークtickでまとめて呼ぶスケジューラ (NetworkScene に1つ)。
+    オブジェクトは replication_tier で送信間隔を決める。
+    各ティアは間隔の数だけスロットに分かれていて、オブジェクトは登録順にスロットへ振り分けられる。
+    1tickで処理するのは各ティアの1スロットだけなので、static のオブジェクトが何百個あっても負荷は分散される
+    (コンポーネントごとに毎フレーム時刻を調べて送信するかどうか判定する必要はない)。
+    同じtickの中では優先度の高いティアから、ティア内では replication_priority の大きいオブジェクトから処理する。
+    """
+    # ティア → 送信間隔 (ネットワークtick数)。この順番が優先度の順
+    TIERS = {
+        "realtime": 1,  # 毎tick (操作中のミノなど)
+        "normal": 3,
+        "static": 30,   # ほとんど動かないもの (固定されたブロックなど)
+    }
+
+    def __init__(self):
+        # ティア → スロットのリスト (スロットは replication_priority の降順に並んだオブジェクトのリスト)
+        self.slots = {tier: [[] for _ in range(interval)] for tier, interval in self.TIERS.items()}
+        self.assigned = {}  # オブジェクト → (ティア, スロット番号)
+        self._next_slot = dict.fromkeys(self.TIERS, 0)
+
+        # 統計
+        self.replicated_last_tick = 0
+
+    def add(self, obj):
+        """obj.replication_tier のティアに登録する (None なら登録しない)"""
+        if obj in self.assigned:
+            self.remove(obj)
+        tier = obj.replication_tier
+        if tier is None:
+            return
+        if tier not in self.TIERS:
+            print(f"⚠️ {obj.name}: 不明な replication_tier '{tier}' のため 'normal' で同期します")
+            tier = "normal"
+        index = self._next_slot[tier]
+        self._next_slot[tier] = (index + 1) % self.TIERS[tier]
+
+        slot = self.slots[tier][index]
+        position = len(slot)
+        while position and slot[position - 1].replication_priority < obj.replication_priority:
+            position -= 1
+        slot.insert(position, obj)
+        self.assigned[obj] = (tier, index)
+
+    def remove(self, obj):
+        assigned = self.assigned.pop(obj, None)
+        if assigned is not None:
+            tier, index = assigned
+            self.slots[tier][index].remove(obj)
+
+    def tick(self, network_tick):
+        """このtickに送信順が来たオブジェクトの replicate を呼ぶ (サーバー専用)"""
+        count = 0
+        for tier, slots in self.slots.items():
+            for obj in tuple(slots[network_tick % len(slots)]):
+                if obj.active:
+                    obj.replicate()
+                    count += 1
+        self.replicated_last_tick = count
+
+    def clear(self):
+        for slots in self.slots.values():
+            for slot in slots:
+                slot.clear()
+        self.assigned.clear()
+        self._next_slot = dict.fromkeys(self.TIERS, 0)
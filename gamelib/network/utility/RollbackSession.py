@@ -0,0 +1,109 @@
+from .MessageSchema import MessageSchemaRegistry
+
+
+class RollbackSession:
+    """
+    ロールバック方式の同期。各ピアが同じシミュレーションを入力だけから手元で進める。
+    - 入力は tick 番号つきで全ピアに送る (クライアント → サーバー → 他のクライアント)
+    - 直近 history_size tick 分の状態 (simulation.save_state() の戻り値) を保持する
+    - 過去の tick の入力が遅れて届いたら、その tick の状態に戻して現在の tick まで再シミュレーションする
+    相手の入力は届くまで「入力なし」として進めるので、遅延があっても手元の操作はすぐに反映される。
+
+    simulation には次のメソッドが必要 (同じ状態・同じ入力なら同じ結果になること):
+        save_state() → 状態 (変更されない値。タプルなど)
+        load_state(状態)
+        step({プレイヤー番号: [入力, ...]})  1tick 進める
+    """
+    def __init__(self, network_manager, simulation, local_player=None, history_size=120, input_delay=0):
+        """
+        :param local_player: 自分のプレイヤー番号 (観戦なら None)
+        :param input_delay: 自分の入力を何tick先に予約するか (大きいほどロールバックが減るが操作が遅れる)
+        """
+        self.network_manager = network_manager
+        self.simulation = simulation
+        self.local_player = local_player
+        self.history_size = history_size
+        self.input_delay = input_delay
+
+        self.tick = 0  # 次に進める tick
+        self.states = {}  # tick → その tick を進める前の状態
+        self.inputs = {}  # tick → {プレイヤー番号: [入力, ...]}
+        self._rollback_tick = None  # 次の advance の前に戻る tick
+
+        # 統計
+        self.rollbacks = 0
+        self.resimulated_ticks = 0
+        self.too_late_inputs = 0  # 履歴より古く、反映できなかった入力 (状態がずれる)
+
+    def add_local_input(self, value):
+        """自分の入力を記録して他のピアに送る"""
+        if self.local_player is None:
+            return
+        tick = self.tick + self.input_delay
+        self._record(tick, self.local_player, value)
+        message = {
+            "type": "rollback_input",
+            "tick": tick,
+            "player": self.local_player,
+            "input": value,
+            "sender_id": self.network_manager.local_steam_id,
+        }
+        if self.network_manager.is_server:
+            self.network_manager.broadcast(message)
+        else:
+            self.network_manager.send_to_server(message)
+
+    def receive_message(self, message):
+        if message.get("type") != "rollback_input":
+            return False
+        tick = message["tick"]
+        player = message["player"]
+        if player == self.local_player:
+            return True
+        if self.network_manager.is_server:
+            # 送信元以外のクライアントに中継する
+            sender = message.get("sender_id")
+            for client_id in self.network_manager.lobby_members:
+                if client_id not in (sender, self.network_manager.server_steam_id):
+                    self.network_manager.send_to_client(client_id, message)
+
+        if tick < self.tick and tick not in self.states:
+            self.too_late_inputs += 1
+            print(f"⚠️ tick {tick} の入力が遅すぎるため反映できません (現在 {self.tick})")
+            return True
+        self._record(tick, player, message["input"])
+        if tick < self.tick and (self._rollback_tick is None or tick < self._rollback_tick):
+            self._rollback_tick = tick
+        return True
+
+    def _record(self, tick, player, value):
+        self.inputs.setdefault(tick, {}).setdefault(player, []).append(value)
+
+    def advance(self):
+        """1tick 進める (必要ならその前にロールバックする)"""
+        if self._rollback_tick is not None:
+            self.rollback(self._rollback_tick)
+            self._rollback_tick = None
+
+        self.states[self.tick] = self.simulation.save_state()
+        self.simulation.step(self.inputs.get(self.tick, {}))
+        self.tick += 1
+
+        oldest = self.tick - self.history_size
+        self.states.pop(oldest - 1, None)
+        self.inputs.pop(oldest - 1, None)
+
+    def rollback(self, tick):
+        """tick の状態に戻し、現在の tick まで入力をやり直す"""
+        self.rollbacks += 1
+        self.simulation.load_state(self.states[tick])
+        for t in range(tick, self.tick):
+            self.states[t] = self.simulation.save_state()
+            self.simulation.step(self.inputs.get(t, {}))
+            self.resimulated_ticks += 1
+
+
+# 入力は int (0～255) で送る
+MessageSchemaRegistry.register("rollback_input", 16, [
+    ("tick", "I"), ("player", "B"), ("input", "B"), ("sender_id", "Q"),
+])
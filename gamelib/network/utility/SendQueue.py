@@ -0,0 +1,231 @@
+import time
+from collections import OrderedDict
+from .Envelope import PROTOCOL_VERSION_BINARY
+from .MessageSchema import MessageSchemaRegistry
+
+# 送信予算 (送信先ごと、bytes/秒)。None なら制限しない
+DEFAULT_BANDWIDTH = 128 * 1024
+# バケットに貯められる量 (秒分)
+BURST_SECONDS = 0.25
+# この RTT (秒) までは予算をそのまま使い、それより遅い回線では RTT に反比例して減らす
+REFERENCE_RTT = 0.1
+MIN_BANDWIDTH_SCALE = 0.25
+
+
+class SendQueue:
+    """
+    送信先ごとの送信キュー。ネットワークtickごとに flush() され、
+    キュー内のメッセージは MTU に収まるバッチフレームにまとめて送信される。
+    coalesce 指定のスキーマ (sync_transform など) は同じ network_id の古い値を最新の値で置き換える。
+
+    送信先ごとに bytes/秒 の予算 (トークンバケット) がある。
+    まとめられるメッセージ (オブジェクトの状態の更新) のうち、優先度の低いオブジェクトのものは
+    予算が足りなければキューに残して次のtickに回す。残っている間は毎tick優先度が加算されるので (priority accumulator)、
+    優先度の低いオブジェクトもいずれ送られる。
+    オブジェクトの追加・削除などの構造的なメッセージと、replication_priority が essential_priority 以上の
+    オブジェクト (操作中のミノなど) の更新は予算に関係なく必ず送る (予算からは差し引く)。
+    """
+    # type → 同じ network_id の2つのメッセージを1つにまとめる関数 (スキーマの coalesce で表せないもの)
+    merge_functions = {}
+
+    def __init__(self, network_manager):
+        self.network_manager = network_manager
+        self.queues = {}  # peer_id → OrderedDict(キー → メッセージ)
+        self.sequence = 0  # まとめないメッセージ用の一意キー
+
+        # 送信予算
+        self.bandwidth = DEFAULT_BANDWIDTH
+        self.essential_priority = 1
+        self.tokens = {}  # peer_id → 送信できる残りバイト数
+        self.accumulators = {}  # peer_id → {キー: 溜まった優先度}
+        self._last_flush_time = None
+        # サーバー: 各送信の先頭にサーバー時刻を付ける (クライアントの補間用)
+        self.stamp_server_time = True
+        # id(メッセージ) → (メッセージ, kind, payload)  何度も送る同じメッセージのエンコード結果 (pin で登録)
+        self.pinned = {}
+
+        # 統計
+        self.queued_messages = 0
+        self.coalesced_messages = 0
+        self.sent_datagrams = 0
+        self.deferred_messages = 0  # 予算が足りず次のtickに回した回数
+
+    @classmethod
+    def register_merge(cls, message_type, merge):
+        """merge(古いメッセージ, 新しいメッセージ) → まとめたメッセージ"""
+        cls.merge_functions[message_type] = merge
+
+    def pin(self, message):
+        """
+        message のエンコード結果を unpin するまで保持する (flush をまたいで同じメッセージを何度も送るとき用)。
+        保持している間は message を変更しないこと。
+        """
+        if id(message) not in self.pinned:
+            self.pinned[id(message)] = (message,) + self.network_manager.communication.encode_payload(message)
+
+    def unpin(self, message):
+        entry = self.pinned.get(id(message))
+        if entry is not None and entry[0] is message:
+            del self.pinned[id(message)]
+
+    def push(self, peer_id, message):
+        """送信キューに積む (送信は次の flush)"""
+        queue = self.queues.get(peer_id)
+        if queue is None:
+            queue = self.queues[peer_id] = OrderedDict()
+        self.queued_messages += 1
+
+        key = self.get_coalesce_key(message)
+        if key is not None:
+            previous = queue.pop(key, None)
+            if previous is not None:
+                self.coalesced_messages += 1
+                message = self.merge(previous, message)
+            # 最新の位置に移動して、後続のメッセージとの順序を保つ
+            queue[key] = message
+        else:
+            self.sequence += 1
+            queue[self.sequence] = message
+
+    def get_coalesce_key(self, message):
+        """同じ network_id の前のメッセージとまとめられるなら、そのキー。まとめられなければ None"""
+        network_id = message.get("network_id")
+        if network_id is None:
+            return None
+        message_type = message.get("type")
+        if message_type in self.merge_functions:
+            return (message_type, network_id)
+        schema = MessageSchemaRegistry.get_schema(message_type)
+        if schema is not None and schema.coalesce:
+            return (schema.type_id, network_id)
+        return None
+
+    def merge(self, previous, message):
+        merge = self.merge_functions.get(message.get("type"))
+        if merge is not None:
+            return merge(previous, message)
+        if MessageSchemaRegistry.get_schema(message.get("type")).sparse:
+            # 差分同期はフィールド単位で最新の値を残す (元の辞書は他の送信先と共有なのでコピー)
+            return {**previous, **message}
+        return message
+
+    def pending_count(self, peer_id=None):
+        if peer_id is not None:
+            return len(self.queues.get(peer_id, ()))
+        return sum(len(queue) for queue in self.queues.values())
+
+    # ------------------------
+    # 送信予算
+    # ------------------------
+    def get_bandwidth(self, peer_id):
+        """送信先の予算 (bytes/秒)。RTT が REFERENCE_RTT より大きい回線ほど小さくする"""
+        rtt = self.network_manager.ping_meter.get_rtt(peer_id)
+        if not rtt or rtt <= REFERENCE_RTT:
+            return self.bandwidth
+        return self.bandwidth * max(REFERENCE_RTT / rtt, MIN_BANDWIDTH_SCALE)
+
+    def get_priority(self, network_id):
+        """オブジェクトの replication_priority (見つからなければ 0)"""
+        index = getattr(self.network_manager.scene_manager.current_scene, "network_object_index", None)
+        obj = index.get(network_id) if index is not None else None
+        return obj.replication_priority if obj is not None else 0
+
+    def _refill(self, peer_id, elapsed):
+        bandwidth = self.get_bandwidth(peer_id)
+        tokens = self.tokens.get(peer_id, bandwidth * BURST_SECONDS) + bandwidth * elapsed
+        tokens = min(tokens, bandwidth * BURST_SECONDS)
+        self.tokens[peer_id] = tokens
+        return tokens
+
+    def _select(self, peer_id, queue, encode, elapsed):
+        """
+        予算内で送るメッセージを選ぶ。送らないものは queue に残る。
+        :return: 送るエントリ [(kind, payload), ...] (キューに積まれた順)
+        """
+        tokens = self._refill(peer_id, elapsed)
+        accumulator = self.accumulators.setdefault(peer_id, {})
+        selected = {}  # キー → (kind, payload)
+        deferrable = []
+        for key, message in queue.items():
+            if isinstance(key, tuple):
+                priority = self.get_priority(key[1])
+                if priority < self.essential_priority:
+                    # 溜まった優先度 (低い優先度ほどゆっくり溜まる)
+                    accumulator[key] = accumulator.get(key, 0.0) + 2.0 ** priority
+                    deferrable.append(key)
+                    continue
+            entry = selected[key] = encode(message)
+            tokens -= len(entry[1])
+
+        deferrable.sort(key=accumulator.get, reverse=True)
+        for index, key in enumerate(deferrable):
+            entry = encode(queue[key])
+            if len(entry[1]) > tokens:
+                self.deferred_messages += len(deferrable) - index
+                break
+            tokens -= len(entry[1])
+            selected[key] = entry
+            del accumulator[key]
+
+        self.tokens[peer_id] = tokens
+        entries = []
+        for key in list(queue):
+            entry = selected.get(key)
+            if entry is not None:
+                entries.append(entry)
+                del queue[key]
+        return entries
+
+    # ------------------------
+    # 送信
+    # ------------------------
+    def flush(self):
+        """すべての送信先のキューを (予算の範囲で) 送信する"""
+        now = time.perf_counter()
+        elapsed = now - self._last_flush_time if self._last_flush_time is not None else 0.0
+        self._last_flush_time = now
+
+        communication = self.network_manager.communication
+        # id(メッセージ) → (メッセージ, kind, payload)  broadcast のエンコードを1回にする
+        encoded = {}
+        pinned = self.pinned
+
+        def encode(message):
+            entry = encoded.get(id(message)) or pinned.get(id(message))
+            if entry is None:
+                entry = encoded[id(message)] = (message,) + communication.encode_payload(message)
+            return entry[1:]
+
+        stamp = None
+        if self.stamp_server_time and self.network_manager.is_server:
+            # time.perf_counter() は PingMeter の ping_response と同じ時計
+            stamp = communication.encode_payload({"type": "server_time", "time": now})
+
+        for peer_id, queue in self.queues.items():
+            if not queue:
+                continue
+
+            if communication.get_peer_version(peer_id) < PROTOCOL_VERSION_BINARY:
+                # 旧形式の相手にはまとめずに1件ずつ送る
+                messages = list(queue.values())
+                queue.clear()
+                for message in messages:
+                    communication.send_message(peer_id, message)
+                self.sent_datagrams += len(messages)
+                continue
+
+            if self.bandwidth is None:
+                entries = [encode(message) for message in queue.values()]
+                queue.clear()
+            else:
+                entries = self._select(peer_id, queue, encode, elapsed)
+            if entries:
+                if stamp is not None:
+                    entries.insert(0, stamp)
+                self.sent_datagrams += communication.send_batch(peer_id, entries)
+
+    def clear(self):
+        self.queues.clear()
+        self.tokens.clear()
+        self.accumulators.clear()
+        self._last_flush_time = None
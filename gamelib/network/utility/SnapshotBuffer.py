@@ -0,0 +1,82 @@
+import bisect
+
+ANGLE_FIELDS = ("rotation_x", "rotation_y", "rotation_z")
+
+
+class SnapshotBuffer:
+    """
+    クライアント側の補間バッファ。サーバー時刻つきの状態 {フィールド: 数値} を溜めておき、
+    指定した時刻の状態を前後の2つから線形補間して返す。
+    最新の状態より後の時刻は最後の2つから外挿するが、max_extrapolation 秒を過ぎたら最新の状態に戻して止める。
+    差分 (一部のフィールドだけ) を push しても、直前の状態と合わせた完全な状態として保持する。
+    """
+    def __init__(self, capacity=32):
+        self.capacity = capacity
+        self.times = []
+        self.states = []
+        self.active = False  # False なら最新の状態を適用済み (次の push まで sample する必要がない)
+
+    def __len__(self):
+        return len(self.times)
+
+    def clear(self):
+        self.times.clear()
+        self.states.clear()
+        self.active = False
+
+    def push(self, server_time, state):
+        index = bisect.bisect_right(self.times, server_time)
+        if index and self.times[index - 1] == server_time:
+            # 同じ時刻 (同じ送信tick) の状態はまとめる
+            self.states[index - 1] = {**self.states[index - 1], **state}
+        else:
+            if index:
+                state = {**self.states[index - 1], **state}
+            self.times.insert(index, server_time)
+            self.states.insert(index, state)
+        if len(self.times) > self.capacity:
+            del self.times[0]
+            del self.states[0]
+        self.active = True
+
+    def sample(self, render_time, max_extrapolation):
+        """render_time (サーバー時刻) の状態を返す。空なら None"""
+        times = self.times
+        if not times:
+            return None
+        index = bisect.bisect_right(times, render_time)
+        if index == 0:
+            return self.states[0]  # まだ最初の状態の時刻になっていない
+
+        # 補間・外挿に使わなくなった古い状態を捨てる (前後の2つは残す)
+        drop = min(index - 1, len(times) - 2)
+        if drop > 0:
+            del times[:drop]
+            del self.states[:drop]
+            index -= drop
+
+        if index < len(times):
+            return self._lerp(index - 1, index, (render_time - times[index - 1]) / (times[index] - times[index - 1]))
+
+        # 最新の状態より後 → 外挿 (上限つき)
+        overshoot = render_time - times[-1]
+        if overshoot >= max_extrapolation or len(times) < 2:
+            # 差分同期は止まっているものを送らないので、続きが来なければ最後の状態で止まっている
+            self.active = False
+            return self.states[-1]
+        return self._lerp(-2, -1, 1 + overshoot / (times[-1] - times[-2]))
+
+    def _lerp(self, a, b, t):
+        start = self.states[a]
+        end = self.states[b]
+        state = {}
+        for field, value in end.items():
+            previous = start.get(field)
+            if previous is None or value is None:
+                state[field] = value
+            elif field in ANGLE_FIELDS:
+                # 回転は近い方向に回す
+                state[field] = previous + ((value - previous + 180) % 360 - 180) * t
+            else:
+                state[field] = previous + (value - previous) * t
+        return state
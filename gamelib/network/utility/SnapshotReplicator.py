@@ -0,0 +1,184 @@
+from collections import OrderedDict
+from .MessageSchema import MessageSchemaRegistry
+
+
+class SnapshotReplicator:
+    """
+    スナップショット方式の状態同期。
+    - サーバーは snapshot_interval ネットワークtickごとにワールド全体のスナップショットを作り、history_size 個保持する
+    - 各クライアントには、そのクライアントが最後に ack したスナップショットとの差分 (snapshot_delta) を送る
+    - クライアントは受け取った差分を基準スナップショットに重ねて復元・適用し、snapshot_ack を返す
+    パケットが失われても次の差分は ack 済みの基準から作られるので、クライアントの状態がずれたままにならない。
+
+    スナップショットは {(network_id, 状態の種類): {フィールド: 値}} の辞書で、
+    NetworkGameObject.capture_state() / apply_state() で作成・適用する。
+    """
+    def __init__(self, network_manager, history_size=32, snapshot_interval=1):
+        self.network_manager = network_manager
+        self.enabled = False  # サーバー側で有効にする (有効な間はコンポーネントごとの差分送信を止める)
+        self.history_size = history_size
+        self.snapshot_interval = snapshot_interval
+
+        # サーバー
+        self.snapshot_tick = 0
+        self.history = OrderedDict()  # tick → スナップショット
+        self.acked_ticks = {}  # クライアントID → ack 済みの tick
+
+        # クライアント
+        self.received = OrderedDict()  # tick → 復元したスナップショット
+        self.applied_tick = 0
+
+        # 統計
+        self.full_snapshots_sent = 0
+        self.delta_snapshots_sent = 0
+        self.missing_baselines = 0
+
+    def clear(self):
+        self.snapshot_tick = 0
+        self.history.clear()
+        self.acked_ticks.clear()
+        self.received.clear()
+        self.applied_tick = 0
+
+    # ------------------------
+    # サーバー
+    # ------------------------
+    def tick(self, network_tick):
+        """ネットワークtickごとに呼ばれる (サーバー専用)"""
+        if not self.enabled or network_tick % self.snapshot_interval:
+            return
+        scene = self.network_manager.scene_manager.current_scene
+        if not hasattr(scene, "network_object_index"):
+            return
+
+        snapshot = self.capture(scene)
+        self.snapshot_tick += 1
+        self.history[self.snapshot_tick] = snapshot
+        while len(self.history) > self.history_size:
+            self.history.popitem(last=False)
+
+        # 退出したクライアントの ack を捨てる
+        members = self.network_manager.lobby_members
+        for client_id in list(self.acked_ticks):
+            if client_id not in members:
+                del self.acked_ticks[client_id]
+
+        deltas = {}  # 基準 tick → メッセージ (同じ基準のクライアントには同じメッセージを送る)
+        for client_id in members:
+            if client_id == self.network_manager.server_steam_id:
+                continue
+            baseline_tick = self.acked_ticks.get(client_id, 0)
+            if baseline_tick not in self.history:
+                baseline_tick = 0  # ack が古すぎる → 全体を送る
+            message = deltas.get(baseline_tick)
+            if message is None:
+                message = deltas[baseline_tick] = self.make_delta(snapshot, baseline_tick)
+            if message is False:
+                continue  # 差分なし
+            if baseline_tick:
+                self.delta_snapshots_sent += 1
+            else:
+                self.full_snapshots_sent += 1
+            self.network_manager.send_to_client(client_id, message)
+
+    def capture(self, scene):
+        snapshot = {}
+        for network_id, obj in scene.network_object_index.items():
+            for key, state in obj.capture_state().items():
+                snapshot[(network_id, key)] = state
+        return snapshot
+
+    def make_delta(self, snapshot, baseline_tick):
+        """基準との差分メッセージを作る。差分がなければ False"""
+        baseline = self.history[baseline_tick] if baseline_tick else {}
+        changes = self.diff(baseline, snapshot)
+        removed = [[network_id, key] for network_id, key in baseline if (network_id, key) not in snapshot]
+        if baseline_tick and not changes and not removed:
+            return False
+        return {
+            "type": "snapshot_delta",
+            "tick": self.snapshot_tick,
+            "baseline": baseline_tick,
+            "changes": changes,
+            "removed": removed,
+        }
+
+    def receive_ack(self, message):
+        client_id = message.get("sender_id")
+        tick = message.get("tick", 0)
+        if tick > self.acked_ticks.get(client_id, 0):
+            self.acked_ticks[client_id] = tick
+
+    # ------------------------
+    # クライアント
+    # ------------------------
+    def receive_delta(self, message):
+        tick = message["tick"]
+        baseline_tick = message["baseline"]
+        if baseline_tick:
+            baseline = self.received.get(baseline_tick)
+            if baseline is None:
+                # 基準を持っていない (基準の差分が失われた) → サーバーが古い ack から作り直すのを待つ
+                self.missing_baselines += 1
+                return
+        else:
+            baseline = {}
+
+        snapshot = dict(baseline)
+        for network_id, key in message["removed"]:
+            snapshot.pop((network_id, key), None)
+        for network_id, key, fields in message["changes"]:
+            previous = snapshot.get((network_id, key))
+            snapshot[(network_id, key)] = {**previous, **fields} if previous else fields
+
+        if tick > self.applied_tick:
+            # 差分は基準からの変更なので、基準の後に適用した状態 (基準の値に戻った項目を含む) との差を適用する
+            applied = self.received.get(self.applied_tick, {})
+            self.applied_tick = tick
+            self.apply(self.diff(applied, snapshot))
+        self.received[tick] = snapshot
+        while len(self.received) > self.history_size:
+            self.received.popitem(last=False)
+        self.network_manager.send_to_server({
+            "type": "snapshot_ack",
+            "tick": tick,
+            "sender_id": self.network_manager.local_steam_id,
+        })
+
+    @staticmethod
+    def diff(previous, snapshot):
+        """previous から snapshot への変更 [[network_id, 状態の種類, {フィールド: 値}], ...]"""
+        changes = []
+        for (network_id, key), state in snapshot.items():
+            base = previous.get((network_id, key))
+            if base is None:
+                changes.append([network_id, key, state])
+            elif base != state:
+                changes.append([network_id, key, {field: value for field, value in state.items()
+                                                  if base.get(field) != value}])
+        return changes
+
+    def apply(self, changes):
+        scene = self.network_manager.scene_manager.current_scene
+        if not hasattr(scene, "get_network_object"):
+            return
+        for network_id, key, fields in changes:
+            obj = scene.get_network_object(network_id)
+            if obj is not None:
+                obj.apply_state(key, fields)
+
+    def receive_message(self, message):
+        """スナップショットのメッセージを処理したら True (シーンには渡さない)"""
+        t = message.get("type")
+        if t == "snapshot_delta":
+            if self.network_manager.is_client:
+                self.receive_delta(message)
+            return True
+        if t == "snapshot_ack":
+            if self.network_manager.is_server:
+                self.receive_ack(message)
+            return True
+        return False
+
+
+MessageSchemaRegistry.register("snapshot_ack", 13, [("tick", "I"), ("sender_id", "Q")])
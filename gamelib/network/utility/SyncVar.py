@@ -0,0 +1,73 @@
+from .SendQueue import SendQueue
+
+
+class SyncVar:
+    """
+    サーバーからクライアントへ同期する属性 (NetworkGameObject のクラス属性として宣言する)。
+
+        class Blocks(NetworkGameObject):
+            size = SyncVar()
+            position = SyncVar(pygame.Vector2)
+
+    代入されたときだけオブジェクトの dirty ビットを立て、シーンの dirty 集合に登録する。
+    ネットワークtickごとに dirty なフィールドだけが1オブジェクト1メッセージ (sync_vars) で送られるので、
+    毎フレーム前回値と比較する必要はない。
+    __get__ を定義しないので、読み出しはインスタンスの __dict__ から直接行われる (通常の属性と同じ速さ)。
+    Vector2 などを要素ごとに書き換えた場合 (position.x += 1) は検出できないので、新しい値を代入すること。
+    """
+    def __init__(self, value_type=None, on_change=None):
+        """
+        :param value_type: 受信した値を変換する型 (Vector2 など、リストで送られる値)
+        :param on_change: クライアントで値を受信したときに呼ぶメソッド名
+        """
+        self.value_type = value_type
+        self.on_change = on_change
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __set__(self, obj, value):
+        values = obj.__dict__
+        if self.name in values and values[self.name] == value:
+            values[self.name] = value
+            return
+        values[self.name] = value
+        bit = type(obj).get_sync_var_bits()[self.name]
+        if not obj._sync_dirty:
+            scene = obj.network_scene
+            if scene is not None:
+                scene.dirty_objects.add(obj)
+        obj._sync_dirty |= bit
+
+    def encode(self, value):
+        if self.value_type is not None and value is not None:
+            return list(value)
+        return value
+
+    def decode(self, value):
+        if self.value_type is not None and value is not None:
+            return self.value_type(value)
+        return value
+
+    @staticmethod
+    def merge_messages(previous, message):
+        """同じオブジェクトの sync_vars を1つにまとめる (ビットごとに新しい方の値を使う)"""
+        previous_values = iter(previous["values"])
+        new_values = iter(message["values"])
+        mask = previous["mask"] | message["mask"]
+        values = []
+        bit = 1
+        while bit <= mask:
+            if message["mask"] & bit:
+                if previous["mask"] & bit:
+                    next(previous_values)
+                values.append(next(new_values))
+            elif previous["mask"] & bit:
+                values.append(next(previous_values))
+            bit <<= 1
+        return {**message, "mask": mask, "values": values}
+
+
+# 送信キューで同じオブジェクトの sync_vars をまとめる (予算が足りずに送信が遅れている間も1件にまとまる)
+SendQueue.register_merge("sync_vars", SyncVar.merge_messages)
@@ -0,0 +1,93 @@
+from .MessageSchema import MessageSchemaRegistry
+
+POSITION_FIELDS = ("position_x", "position_y", "position_z")
+SCALE_FIELDS = ("scale_x", "scale_y")
+ROTATION_FIELDS = ("rotation_x", "rotation_y", "rotation_z")
+
+INT16_MAX = 32767
+ROTATION_STEPS = 65536  # 16bit
+SCALE_MAX_STEP = 255    # 8bit
+
+
+class TransformQuantization:
+    """
+    NetworkTransform の量子化設定 (送受信で同じ設定を使うこと)。
+    - 位置: 固定小数点 (position_precision 単位の int16。範囲は position_origin ± 32767 * position_precision)
+            grid_size を指定するとマス目の整数座標 (int16) で送る
+    - 回転: 1周を 16bit
+    - スケール: scale_step 単位の 8bit (既定は 1/64 単位で 0～3.98。1.0 がちょうど表せる)
+    範囲外・マス目に乗っていない値を含む場合は量子化せず、通常の sync_transform で送る。
+    """
+    def __init__(self, position_precision=0.1, position_origin=0.0, grid_size=None, scale_step=1 / 64):
+        self.position_precision = position_precision
+        self.position_origin = position_origin
+        self.grid_size = grid_size
+        self.scale_step = scale_step
+
+    @classmethod
+    def grid(cls, grid_size, scale_step=1 / 64):
+        """マス目に沿って動くオブジェクト (テトリスのブロックなど) 用"""
+        return cls(grid_size=grid_size, scale_step=scale_step)
+
+    @property
+    def position_bounds(self):
+        unit = self.grid_size or self.position_precision
+        return self.position_origin - INT16_MAX * unit, self.position_origin + INT16_MAX * unit
+
+    def encode(self, sync_data):
+        """
+        sync_transform の辞書を sync_transform_q の辞書に変換する。
+        :return: 量子化できなければ None
+        """
+        quantized = {"type": "sync_transform_q", "network_id": sync_data["network_id"]}
+        for field in POSITION_FIELDS:
+            if field in sync_data:
+                value = self._encode_position(sync_data[field])
+                if value is None:
+                    return None
+                quantized[field] = value
+        for field in SCALE_FIELDS:
+            if field in sync_data:
+                value = round(sync_data[field] / self.scale_step)
+                if not 0 <= value <= SCALE_MAX_STEP:
+                    return None
+                quantized[field] = value
+        for field in ROTATION_FIELDS:
+            if field in sync_data:
+                quantized[field] = round(sync_data[field] % 360 / 360 * ROTATION_STEPS) % ROTATION_STEPS
+        return quantized
+
+    def decode(self, quantized):
+        """sync_transform_q の辞書を sync_transform と同じ形の辞書に戻す"""
+        sync_data = {"type": "sync_transform", "network_id": quantized["network_id"]}
+        for field in POSITION_FIELDS:
+            if quantized.get(field) is not None:
+                unit = self.grid_size or self.position_precision
+                sync_data[field] = self.position_origin + quantized[field] * unit
+        for field in SCALE_FIELDS:
+            if quantized.get(field) is not None:
+                sync_data[field] = quantized[field] * self.scale_step
+        for field in ROTATION_FIELDS:
+            if quantized.get(field) is not None:
+                sync_data[field] = quantized[field] * 360 / ROTATION_STEPS
+        return sync_data
+
+    def _encode_position(self, position):
+        if self.grid_size:
+            cell = (position - self.position_origin) / self.grid_size
+            value = round(cell)
+            if abs(cell - value) > 1e-6:
+                return None  # マス目に乗っていない
+        else:
+            value = round((position - self.position_origin) / self.position_precision)
+        if not -INT16_MAX <= value <= INT16_MAX:
+            return None
+        return value
+
+
+MessageSchemaRegistry.register("sync_transform_q", 14, [
+    ("network_id", "I"),
+    ("position_x", "h"), ("position_y", "h"), ("position_z", "h"),
+    ("scale_x", "B"), ("scale_y", "B"),
+    ("rotation_x", "H"), ("rotation_y", "H"), ("rotation_z", "H"),
+], sparse=True, coalesce=True)
@@ -1,10 +1,25 @@
 from gamelib.network.syncs.game_objects.NetworkGameObject import NetworkGameObject
 from gamelib.network.NetworkManager import NetworkManager
 from gamelib.network.NetworkObjectFactory import NetworkObjectFactory
+from gamelib.network.utility.SyncVar import SyncVar
+from gamelib.network.utility.TransformQuantization import TransformQuantization
 from gamelib.game.component.Sprite import Sprite
 from gamelib.network.syncs.components.NetworkSprite import NetworkSprite
 import pygame
 class Block(NetworkGameObject):
+    # ブロックはマス目上にしか置かれないので、マスの整数座標で同期する (マスからずれた場合は float で送られる)
+    transform_quantization = TransformQuantization.grid(40)
+    # 固定されたブロックはほとんど動かない (ミノの中のブロックはクライアントでも親の position から配置される)
+    replication_tier = "static"
+    # マス目の移動は補間せずにすぐ反映する (update も呼ばれない)
+    interpolate_transform = False
+
+    # 固定されたブロックはライン消去で下に移動するので、Transform (static 層でまれにしか送られない) を待たずに配置する
+    position = SyncVar(pygame.Vector2, on_change="on_position_changed")
+    image_path = SyncVar(on_change="on_image_path_changed")
+    # position と image_path は SyncVar として送られる
+    spawn_args = ("is_wall", "size")
+
     def __init__(self, name="Block", active=True, parent=None, network_id=None, steam_id=None, position=None, image_path=None, is_wall=False, size=40):
         super().__init__(name, active, parent, network_id, steam_id)
         self.sprite = self.add_component(Sprite, image_path=image_path, base_size=size)
@@ -12,17 +27,14 @@ class Block(NetworkGameObject):
         self.network_manager = NetworkManager.get_instance()
         if position is not None:
             self.position = pygame.Vector2(position)
-            self._position = pygame.Vector2(position)
         else:
             self.position = pygame.Vector2(-9999, -9999)
-            self._position = pygame.Vector2(-9999, -9999)
+        self.image_path = image_path
         self.is_wall = is_wall
         self._size = size
-        if self.network_manager.is_server:
-            self.network_manager.broadcast({"type": "block_position_x", "network_id": self.network_id, "value": self.position.x})
-            self.network_manager.broadcast({"type": "block_position_y", "network_id": self.network_id, "value": self.position.y})
-            if image_path:
-                self.network_manager.broadcast({"type": "block_image_path", "network_id": self.network_id, "value": image_path})
+
+    def get_spawn_args(self):
+        return self.is_wall, self._size
 
     def set_transform_position(self, size, final_position):
         self.transform.set_local_position(pygame.Vector3(final_position.x * size, final_position.y * size, 0))
@@ -30,22 +42,15 @@ class Block(NetworkGameObject):
             self._size = size
             self.sprite.apply_base_size((size, size))
     def update(self, dt):
-        if self.network_manager.is_server:
-            if self._position.x != self.position.x:
-                self._position.x = self.position.x
-                self.network_manager.broadcast({"type": "block_position_x", "network_id": self.network_id, "value": self.position.x})
-            if self._position.y != self.position.y:
-                self._position.y = self.position.y
-                self.network_manager.broadcast({"type": "block_position_y", "network_id": self.network_id, "value": self.position.y})
-    def receive_message(self, message):
-        super().receive_message(message)
-
-        if message.get("type") == "block_position_x" and message.get("network_id") == self.network_id:
-            self.position.x =  message.get("value")
-        if message.get("type") == "block_position_y" and message.get("network_id") == self.network_id:
-            self.position.y =  message.get("value")
-        if message.get("type") == "block_image_path" and message.get("network_id") == self.network_id:
-            self.sprite.load_image(message["value"])
+        # Transform は親 (Blocks / Field) が set_transform_position で決めるので、
+        # 自身の更新処理は行わない。同期は SyncVar と ReplicationScheduler で行われる
+        pass
+    def on_position_changed(self):
+        # ミノの中のブロックの position はミノ内の相対位置で、配置は親 (Blocks) の update で上書きされる
+        self.set_transform_position(self._size, self.position)
+    def on_image_path_changed(self):
+        if self.image_path:
+            self.sprite.load_image(self.image_path)
 
 
     
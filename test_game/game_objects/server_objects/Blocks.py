@@ -1,59 +1,85 @@
 from gamelib.network.syncs.game_objects.NetworkGameObject import NetworkGameObject
 from gamelib.network.NetworkManager import NetworkManager
 from gamelib.network.NetworkObjectFactory import NetworkObjectFactory
+from gamelib.network.utility.SyncVar import SyncVar
+from ..Block import Block
 import pygame
 class Blocks(NetworkGameObject):
+    # 操作中のミノは毎tick同期する
+    replication_tier = "realtime"
+    replication_priority = 1
+
+    size = SyncVar()
+    position = SyncVar(pygame.Vector2)
+    # 回転した回数 (0～3)。ブロックの配置は self.blocks の初期位置をこの回数だけ回したもの
+    rotate = SyncVar()
+    # サーバーが最後に処理した入力の番号 (クライアントの予測の照合用)
+    last_input = SyncVar()
+
     def __init__(self, name="Block", active=True, parent=None, network_id=None, steam_id=None, size=20):
         super().__init__(name, active, parent, network_id, steam_id)
         self.network_manager = NetworkManager.get_instance()
         self.position = pygame.Vector2(5, 0)
         self.blocks = []
-        self.rotate = 1
+        self.rotate = 0
+        self.last_input = 0
         self.size = size
 
-        self._size = size
-        self._position = self.position.copy()
-    
-    def rotation(self):
-        # 回転行列 -y, x (90)
+        # クライアント: サーバーから受信した (予測を含まない) 位置と回転
+        self.server_position = self.position
+        self.server_rotate = self.rotate
+
+    def add_child(self, child_object, layer=0):
+        # ブロックはサーバーではコンストラクタで、クライアントでは spawn_prefab・シーン同期で追加される
+        child_object = super().add_child(child_object, layer)
+        if isinstance(child_object, Block):
+            self.blocks.append(child_object)
+        return child_object
+
+    def get_cells(self, offset=(0, 0), rotate=0):
+        """ブロックのフィールド上のマス [(x, y), ...] (offset だけ移動・rotate 回だけ回した場合)"""
+        base_x = int(self.position.x) + offset[0]
+        base_y = int(self.position.y) + offset[1]
+        cells = []
         for block in self.blocks:
-            x = -block.position.y
-            y = block.position.x
-            block.position.x = x
-            block.position.y = y
+            x, y = int(block.position.x), int(block.position.y)
+            for _ in range((self.rotate + rotate) % 4):
+                # 回転行列 -y, x (90)
+                x, y = -y, x
+            cells.append((base_x + x, base_y + y))
+        return cells
+
+    def rotation(self):
+        self.rotate = (self.rotate + 1) % 4
     def move_left(self):
         """左に一マス移動"""
-        self.position.x -= 1
+        self.position = self.position + pygame.Vector2(-1, 0)
     def move_right(self):
         """右に一マス移動"""
-        self.position.x += 1
+        self.position = self.position + pygame.Vector2(1, 0)
     def move_down(self):
         """下に一マス移動"""
-        self.position.y += 1
+        self.position = self.position + pygame.Vector2(0, 1)
+
+    def on_sync_vars_received(self, mask):
+        bits = self.get_sync_var_bits()
+        if mask & bits["position"]:
+            self.server_position = self.position
+        if mask & bits["rotate"]:
+            self.server_rotate = self.rotate
+        # 予測した入力を、受信した状態の上にやり直す
+        if hasattr(self.parent, "reconcile"):
+            self.parent.reconcile(self)
+
+    def restore_server_state(self):
+        """予測で動かす前の、サーバーから受信した状態に戻す"""
+        self.position = self.server_position
+        self.rotate = self.server_rotate
+
     def update(self, dt):
         super().update(dt)
-        for block in self.blocks:
-            position = pygame.Vector2(self.position.x +block.position.x, self.position.y + block.position.y)
-            block.set_transform_position(self.size ,position)
-        if self.network_manager.is_server:
-            if self._size != self.size:
-                self._size = self.size
-                self.network_manager.broadcast({"type": "size", "network_id": self.network_id, "value": self.size})
-            if self._position.x != self.position.x:
-                self._position.x = self.position.x
-                self.network_manager.broadcast({"type": "position_x", "network_id": self.network_id, "value": self.position.x})
-            if self._position.y != self.position.y:
-                self._position.y = self.position.y
-                self.network_manager.broadcast({"type": "position_y", "network_id": self.network_id, "value": self.position.y})
-    def receive_message(self, message):
-        # サイズ変更などに対応
-        if message["type"] == "size" and message["network_id"] == self.network_id:
-            self.size = message["value"]
-        elif message["type"] == "position_x" and message["network_id"] == self.network_id:
-            self.position.x = message["value"]
-        elif message["type"] == "position_y" and message["network_id"] == self.network_id:
-            self.position.y = message["value"]
-        super().receive_message(message)
+        for block, (x, y) in zip(self.blocks, self.get_cells()):
+            block.set_transform_position(self.size, pygame.Vector2(x, y))
 
 # **ネットワーク同期可能なオブジェクトとして登録**
 NetworkObjectFactory.register_class(Blocks)
@@ -5,13 +5,23 @@ from gamelib.network.syncs.components.NetworkScript import NetworkScript
 from gamelib.game.InputManager import InputManager
 from gamelib.network.NetworkManager import NetworkManager
 from gamelib.network.NetworkObjectFactory import NetworkObjectFactory
+from gamelib.network.utility.MessageSchema import MessageSchemaRegistry
 from gamelib.game.utility.Coroutine import WaitForSeconds
 from .TMino import TMino
+from .Blocks import Blocks
+from .FieldSimulation import FieldSimulation, INPUTS
 from ..Block import Block
 from ..LocalBlock import LocalBlock
 import pygame
+
+# ミノを操作する入力 (クライアントで予測して先に動かす)
+INPUT_TYPES = INPUTS
+
 # フィールドを親に、ブロックが設置される
 class Field(NetworkGameObject):
+    # クライアントでもフィールド番号 (位置・操作するプレイヤー) が決まった状態で生成する
+    spawn_args = ("number",)
+
     def __init__(self, name="Field", active=True, parent=None, network_id=None, steam_id=None, number=None, position=None):
         super().__init__(name, active, parent, network_id, steam_id)
         self.network_manager = NetworkManager.get_instance()
@@ -34,10 +44,22 @@ class Field(NetworkGameObject):
                 if number == 0:
                     self.steam_id = self.network_manager.local_steam_id
         self.field_number = number
+
+        # 入力の番号 (クライアント: 最後に送った番号 / サーバー: 最後に処理した番号)
+        self.input_sequence = 0
+        # クライアント: 送ったがサーバーの処理がまだ確認できていない入力 [(番号, type), ...]
+        self.pending_inputs = []
+
+        # ロールバックモードで手元で進めるシミュレーション (FieldSimulation)
+        self.simulation = None
+        self.cell_blocks = {}  # (x, y) → シミュレーションの表示用の LocalBlock
+        self.shown_cells = set()
+
         self.width = 10
         self.height = 20
 
         self.mino_size = 40
+        self.fall_speed = 0.5
         if position is None:
             if number == 0:
                 self.transform.set_local_position(pygame.Vector2(-500 - (self.width * self.mino_size) + self.mino_size, -300))
@@ -45,6 +67,9 @@ class Field(NetworkGameObject):
                 self.transform.set_local_position(pygame.Vector2(500, -300))
 
 
+    def get_spawn_args(self):
+        return (self.field_number,)
+
     def start(self):
         # initialize処理
         super().start()
@@ -58,7 +83,6 @@ class Field(NetworkGameObject):
             # 生成回数
             self.generate_time = 1
             self.minos = [TMino]
-            self.fall_speed = 0.5
         # 背景ブロック
         self.back_mino_image = "BackMino1.png"
         for y in range(self.height):
@@ -69,21 +93,124 @@ class Field(NetworkGameObject):
     def generate_block(self):
         """server側でブロックの生成patternを作成する"""
         index = self.generate_time * self.scene.seed % len(self.minos)
-        self.active_mino = self.add_network_child(self.minos[index](parent=self, size=self.mino_size), 2)
+        mino = self.minos[index](parent=self, size=self.mino_size)
+        mino.last_input = self.input_sequence
+        self.active_mino = self.spawn_network_child(mino, 2)
         self.generate_time += 1
 
 
     def update(self, dt):
         super().update(dt)
         if self.initialized and self.steam_id == self.network_manager.local_steam_id:
+            send = self.send_input if self.simulation is None else self.send_rollback_input
             if self.move_left_action.get_on_press():
-                self.network_manager.send_to_server({"type": "move_left_mino", "sender_id": self.network_manager.local_steam_id}, True)
+                send("move_left_mino")
             if self.move_right_action.get_on_press():
-                self.network_manager.send_to_server({"type": "move_right_mino", "sender_id": self.network_manager.local_steam_id}, True)
+                send("move_right_mino")
             if self.move_down_action.get_on_press():
-                self.network_manager.send_to_server({"type": "move_down_mino", "sender_id": self.network_manager.local_steam_id}, True)
+                send("move_down_mino")
             if self.move_rotate_action.get_on_press():
-                self.network_manager.send_to_server({"type": "rotation", "sender_id": self.network_manager.local_steam_id, }, True)
+                send("rotation")
+
+    # ------------------------
+    # ロールバックモード
+    # ------------------------
+    def start_simulation(self, seed):
+        """ロールバックモードを開始する (ミノはネットワークオブジェクトにせず、手元のシミュレーションで動かす)"""
+        fall_ticks = max(1, round(self.fall_speed * self.network_manager.tick_rate))
+        self.simulation = FieldSimulation(seed, self.width, self.height, fall_ticks, (TMino,))
+        return self.simulation
+
+    def send_rollback_input(self, input_type):
+        self.scene.rollback_session.add_local_input(INPUTS.index(input_type))
+
+    def render_simulation(self):
+        """シミュレーションの状態を表示用のブロックに反映する (変化したマスだけ切り替える)"""
+        cells = set(self.simulation.get_cells())
+        for cell in self.shown_cells - cells:
+            self.cell_blocks[cell].set_active(False)
+        for cell in cells - self.shown_cells:
+            block = self.cell_blocks.get(cell)
+            if block is None:
+                block = self.cell_blocks[cell] = self.add_child(
+                    LocalBlock(parent=self, image_path=TMino.image_path, is_wall=True, position=cell), 2)
+                block.set_transform_position(self.mino_size, pygame.Vector2(cell))
+            block.set_active(True)
+        self.shown_cells = cells
+        if self.network_manager.is_server:
+            self.is_alive = self.simulation.alive
+
+    # ------------------------
+    # 入力の予測 (クライアント)
+    # ------------------------
+    def send_input(self, input_type):
+        """入力に番号を付けてサーバーに送る。クライアントなら結果を待たずに手元のミノを動かす"""
+        self.input_sequence += 1
+        if self.network_manager.is_client:
+            mino = self.get_active_mino()
+            if mino is not None:
+                self.pending_inputs.append((self.input_sequence, input_type))
+                self.predict_input(input_type, mino)
+        self.network_manager.send_to_server({
+            "type": input_type,
+            "sender_id": self.network_manager.local_steam_id,
+            "sequence": self.input_sequence,
+        }, True)
+
+    def predict_input(self, input_type, mino):
+        if input_type == "move_left_mino":
+            self.move_left(mino)
+        elif input_type == "move_right_mino":
+            self.move_right(mino)
+        elif input_type == "rotation":
+            self.rotation(mino)
+        elif input_type == "move_down_mino" and not self.check_put(mino):
+            # 設置はサーバーの結果を待つ
+            mino.move_down()
+
+    def reconcile(self, mino):
+        """
+        サーバーからミノの状態を受信したときに呼ばれる。
+        サーバーが処理済みの入力を捨て、残りの入力を受信した状態の上でやり直す
+        """
+        if not self.network_manager.is_client or mino is not self.get_active_mino():
+            return
+        self.pending_inputs = [(sequence, input_type) for sequence, input_type in self.pending_inputs
+                               if sequence > mino.last_input]
+        mino.restore_server_state()
+        for _, input_type in self.pending_inputs:
+            self.predict_input(input_type, mino)
+
+    def get_active_mino(self):
+        if self.network_manager.is_server:
+            return self.active_mino
+        # クライアント: 最後に追加されたミノ
+        for child in reversed(self.children):
+            if isinstance(child, Blocks):
+                return child
+        return None
+
+    def get_grid(self):
+        """固定されたブロックの配置 grid[y][x] (クライアントでは受信したブロックから作る)"""
+        if self.network_manager.is_server:
+            return self.grid
+        grid = [[None for _ in range(self.width)] for _ in range(self.height)]
+        for child in self.children:
+            if isinstance(child, Block):
+                x, y = int(child.position.x), int(child.position.y)
+                if 0 <= x < self.width and 0 <= y < self.height:
+                    grid[y][x] = child
+        return grid
+
+    def can_place(self, mino, offset=(0, 0), rotate=0):
+        """ミノを offset だけ移動・rotate 回だけ回した位置に置けるか"""
+        grid = self.get_grid()
+        for x, y in mino.get_cells(offset, rotate):
+            if not (0 <= x < self.width and 0 <= y < self.height):
+                return False
+            if grid[y][x] is not None:
+                return False
+        return True
 
     def on_fall_active_mino(self):
         """fall関数を定期的に呼び出すコルーチン"""
@@ -100,19 +227,19 @@ class Field(NetworkGameObject):
         """アクティブなミノをフィールドに固定し、コピーしたブロックを配置"""
         if self.active_mino:
             new_blocks = []  # 新しくコピーするブロックリスト
-            for block in self.active_mino.blocks:
-                x = int(block.position.x + self.active_mino.position.x)
-                y = int(block.position.y + self.active_mino.position.y)
+            for x, y in self.active_mino.get_cells():
 
                 # **ブロックを新しく作成し、ネットワークオブジェクトとして登録**
-                new_block = self.add_network_child(Block(name="FixedBlock", 
-                                                                parent=self,  
-                                                                position=(x, y),
-                                                                image_path=self.active_mino.image_path,
-                                                                is_wall=True
-                                                                ), 2)
-                new_blocks.append(new_block)
+                # (配置してから送るので、位置も spawn_prefab に含まれる)
+                new_block = Block(name="FixedBlock",
+                                  parent=self,
+                                  position=(x, y),
+                                  image_path=self.active_mino.image_path,
+                                  is_wall=True
+                                  )
                 new_block.set_transform_position(self.mino_size, pygame.Vector2(x, y))
+                self.spawn_network_child(new_block, 2)
+                new_blocks.append(new_block)
                 self.grid[y][x] = new_block
                 # **ゲームオーバー判定**
                 if self.check_game_over(x, y):
@@ -168,7 +295,7 @@ class Field(NetworkGameObject):
                             self.grid[y][x] = None  # 元の位置をクリア
 
                             # **ブロックの座標を更新**
-                            block.position.y = new_y
+                            block.position = pygame.Vector2(block.position.x, new_y)
                             block.set_transform_position(self.mino_size, pygame.Vector2(x, new_y))
 
                             print(f"⬇ ブロック {block.name} を {y} → {new_y} に移動")
@@ -176,13 +303,13 @@ class Field(NetworkGameObject):
 
     def fall_active_mino(self):
         self.active_mino.move_down()
-    def check_put(self):
-        if self.active_mino:
-            for block in self.active_mino.blocks:
-                x = int(self.active_mino.position.x + block.position.x)
-                y = int(self.active_mino.position.y + block.position.y)
+    def check_put(self, mino=None):
+        mino = mino or self.active_mino
+        if mino:
+            grid = self.get_grid()
+            for x, y in mino.get_cells():
                 # 設置可能
-                if y+1 >= self.height or self.grid[y+1][x] is not None:
+                if y+1 >= self.height or grid[y+1][x] is not None:
                     return True
         # 設置不可
         return False
@@ -190,7 +317,8 @@ class Field(NetworkGameObject):
         super().receive_message(message)
         if message.get("type") == "start_game":
             self.game_started = True
-            if self.network_manager.is_server:
+            # ロールバックモードでは TetrisScene がシミュレーションを進める
+            if self.network_manager.is_server and not message.get("rollback"):
                 # テトリスのメインの処理はserverのみが行う
                 self.running = True
                 self.generate_block()
@@ -198,45 +326,49 @@ class Field(NetworkGameObject):
         if self.network_manager.is_client or not self.running:
             return
         # 個々より先はgameが開始していることが条件の操作
-        elif message.get("type") == "move_left_mino" and message["sender_id"] == self.steam_id:
-            self.move_left()
-        elif message.get("type") == "move_right_mino" and message["sender_id"] == self.steam_id:
-            self.move_right()
-        elif message.get("type") == "rotation" and message["sender_id"] == self.steam_id:
-            self.rotation()
-        elif message.get("type") == "move_down_mino" and message["sender_id"] == self.steam_id:
-            self.fall()
+        elif message.get("type") in INPUT_TYPES and message["sender_id"] == self.steam_id:
+            self.receive_input(message)
         elif message.get("type") == "game_over" and message["field_number"] == self.field_number:
             # self.on_game_over(message)
             self.coroutine_manager.clear()
             self.running = False
             print(f"敗北者 : {message['loser']}" )
-    def move_right(self):
-        if self.active_mino:
-            for block in self.active_mino.blocks:
-                x = int(self.active_mino.position.x + block.position.x)
-                y = int(self.active_mino.position.y + block.position.y)
-                if x+1 >= self.width or self.grid[y][x+1] is not None:
-                    return False
-            self.active_mino.move_right()
-    def move_left(self):
-        if self.active_mino:
-            for block in self.active_mino.blocks:
-                x = int(self.active_mino.position.x + block.position.x)
-                y = int(self.active_mino.position.y + block.position.y)
-                if x-1 <=-1 or self.grid[y][x-1] is not None:
-                    return False
-            self.active_mino.move_left()
-    def rotation(self):
-        if self.active_mino:
-            for block in self.active_mino.blocks:
-                x = int(-block.position.y + self.active_mino.position.x)
-                y = int(block.position.x + self.active_mino.position.y)
-                if (x < 0 or x >= self.width) or (y < 0 or y >= self.height) :
-                    return False
-                if self.grid[y][x] is not None:
-                    return False
-            self.active_mino.rotation()
+    def receive_input(self, message):
+        """サーバー: 入力を処理し、処理した番号をミノに載せて返す"""
+        t = message["type"]
+        if t == "move_left_mino":
+            self.move_left()
+        elif t == "move_right_mino":
+            self.move_right()
+        elif t == "rotation":
+            self.rotation()
+        elif t == "move_down_mino":
+            self.fall()
+        sequence = message.get("sequence")
+        if sequence is not None:
+            self.input_sequence = sequence
+            if self.active_mino:
+                # 移動できなかった入力も、処理済みとして通知する
+                self.active_mino.last_input = sequence
+    # 移動・回転 (サーバーの処理とクライアントの予測で共通)
+    def move_right(self, mino=None):
+        mino = mino or self.active_mino
+        if mino:
+            if not self.can_place(mino, (1, 0)):
+                return False
+            mino.move_right()
+    def move_left(self, mino=None):
+        mino = mino or self.active_mino
+        if mino:
+            if not self.can_place(mino, (-1, 0)):
+                return False
+            mino.move_left()
+    def rotation(self, mino=None):
+        mino = mino or self.active_mino
+        if mino:
+            if not self.can_place(mino, rotate=1):
+                return False
+            mino.rotation()
 
 
 
@@ -263,4 +395,10 @@ def get_shift_map(full_lines):
 
     return shift_map
 
-NetworkObjectFactory.register_class(Field)
\ No newline at end of file
+NetworkObjectFactory.register_class(Field)
+
+MessageSchemaRegistry.register("move_left_mino", 70, [("sender_id", "Q"), ("sequence", "I")])
+MessageSchemaRegistry.register("move_right_mino", 71, [("sender_id", "Q"), ("sequence", "I")])
+MessageSchemaRegistry.register("move_down_mino", 72, [("sender_id", "Q"), ("sequence", "I")])
+MessageSchemaRegistry.register("rotation", 73, [("sender_id", "Q"), ("sequence", "I")])
+MessageSchemaRegistry.register("game_over", 74, [("loser", "Q"), ("field_number", "B")])
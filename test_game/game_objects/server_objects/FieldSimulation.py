@@ -0,0 +1,141 @@
+from .TMino import TMino
+
+# 入力 (rollback_input では INPUTS の番号で送る)
+INPUTS = ("move_left_mino", "move_right_mino", "move_down_mino", "rotation")
+MOVE_LEFT, MOVE_RIGHT, MOVE_DOWN, ROTATE = range(len(INPUTS))
+
+
+class FieldSimulation:
+    """
+    ロールバックモードで各ピアが手元で進める1フィールド分のテトリス。
+    Field のサーバー側の処理と同じルールを、ネットワークオブジェクトを使わずに tick 単位で進める。
+    状態は小さなタプル (save_state) で、RollbackSession が毎tick保存・復元する。
+    固定されたブロックは行ごとのビットマスク (bit x = x列目) で持つ。
+    """
+    def __init__(self, seed, width=10, height=20, fall_ticks=30, minos=(TMino,)):
+        self.seed = seed
+        self.width = width
+        self.height = height
+        self.fall_ticks = fall_ticks  # 何tickごとに1マス落ちるか
+        self.minos = minos
+
+        self.rows = (0,) * height
+        self.mino_index = 0
+        self.mino_x = 0
+        self.mino_y = 0
+        self.mino_rotate = 0
+        self.generate_time = 1
+        self.fall_counter = 0
+        self.alive = True
+        self.generate_block()
+
+    # ------------------------
+    # 状態の保存・復元
+    # ------------------------
+    def save_state(self):
+        return (self.rows, self.mino_index, self.mino_x, self.mino_y, self.mino_rotate,
+                self.generate_time, self.fall_counter, self.alive)
+
+    def load_state(self, state):
+        (self.rows, self.mino_index, self.mino_x, self.mino_y, self.mino_rotate,
+         self.generate_time, self.fall_counter, self.alive) = state
+
+    # ------------------------
+    # 進行
+    # ------------------------
+    def step(self, inputs):
+        """1tick 進める"""
+        if not self.alive:
+            return
+        for value in inputs:
+            if value == MOVE_LEFT:
+                self.try_move(-1, 0)
+            elif value == MOVE_RIGHT:
+                self.try_move(1, 0)
+            elif value == ROTATE:
+                self.try_move(0, 0, 1)
+            elif value == MOVE_DOWN:
+                self.fall()
+            if not self.alive:
+                return
+        self.fall_counter += 1
+        if self.fall_counter >= self.fall_ticks:
+            self.fall_counter = 0
+            self.fall()
+
+    def generate_block(self):
+        """Field.generate_block と同じ順番でミノを選ぶ"""
+        self.mino_index = self.generate_time * self.seed % len(self.minos)
+        self.mino_x, self.mino_y = 5, 0
+        self.mino_rotate = 0
+        self.generate_time += 1
+
+    def get_mino_cells(self, dx=0, dy=0, rotate=0):
+        cells = []
+        for x, y in self.minos[self.mino_index].shape:
+            for _ in range((self.mino_rotate + rotate) % 4):
+                # 回転行列 -y, x (90)
+                x, y = -y, x
+            cells.append((self.mino_x + dx + x, self.mino_y + dy + y))
+        return cells
+
+    def is_filled(self, x, y):
+        return self.rows[y] >> x & 1
+
+    def can_place(self, cells):
+        for x, y in cells:
+            if not (0 <= x < self.width and 0 <= y < self.height) or self.is_filled(x, y):
+                return False
+        return True
+
+    def try_move(self, dx, dy, rotate=0):
+        if not self.can_place(self.get_mino_cells(dx, dy, rotate)):
+            return False
+        self.mino_x += dx
+        self.mino_y += dy
+        self.mino_rotate = (self.mino_rotate + rotate) % 4
+        return True
+
+    def fall(self):
+        """ミノを落とすか設置するか決める (Field.fall と同じ)"""
+        if not self.try_move(0, 1):
+            self.fix_mino()
+
+    def fix_mino(self):
+        rows = list(self.rows)
+        for x, y in self.get_mino_cells():
+            rows[y] |= 1 << x
+            # ゲームオーバー判定 (Field.check_game_over と同じ)
+            if (x == self.width // 2 and y < 2) or rows[0] >> x & 1:
+                self.rows = tuple(rows)
+                self.alive = False
+                return
+        # ラインの消去 (消えた分だけ上の行を下にずらす)
+        full = (1 << self.width) - 1
+        remaining = [row for row in rows if row != full]
+        self.rows = (0,) * (self.height - len(remaining)) + tuple(remaining)
+        self.generate_block()
+
+    def get_cells(self):
+        """表示用: 固定されたブロックと操作中のミノのマス [(x, y), ...]"""
+        cells = [(x, y) for y, row in enumerate(self.rows) if row for x in range(self.width) if row >> x & 1]
+        if self.alive:
+            cells.extend(self.get_mino_cells())
+        return cells
+
+
+class MatchSimulation:
+    """RollbackSession に渡すシミュレーション (プレイヤー番号 = フィールド番号)"""
+    def __init__(self, fields):
+        self.fields = fields  # [FieldSimulation, ...]
+
+    def save_state(self):
+        return tuple(field.save_state() for field in self.fields)
+
+    def load_state(self, state):
+        for field, field_state in zip(self.fields, state):
+            field.load_state(field_state)
+
+    def step(self, inputs):
+        for number, field in enumerate(self.fields):
+            field.step(inputs.get(number, ()))
@@ -5,17 +5,17 @@ from gamelib.game.component.Sprite import Sprite
 from gamelib.network.NetworkObjectFactory import NetworkObjectFactory
 import pygame
 class TMino(Blocks):
+    # ブロックの初期位置 (FieldSimulation も使う)
+    shape = ((-1, 0), (1, 0), (0, 1), (0, 0))
+    image_path = "TMino1.png"
+
     def __init__(self, name="Block", active=True, parent=None, network_id=None, steam_id=None, size=40):
         super().__init__(name, active, parent, network_id, steam_id, size)
-        self.image_path = "TMino1.png"
-        block1 = self.add_network_child(Block("Block1", parent=self, position=(-1, 0), image_path=self.image_path, size=size))
-        block2 = self.add_network_child(Block("Block2", parent=self, position=(1, 0), image_path=self.image_path, size=size))
-        block3 = self.add_network_child(Block("Block3", parent=self, position=(0, 1), image_path=self.image_path, size=size))
-        block4 = self.add_network_child(Block("Block4", parent=self, position=(0, 0), image_path=self.image_path, size=size))
-        mino = [block1, block2, block3, block4]
-        self.blocks.extend(mino)
-
-        for block in self.blocks:
+        # クライアントのブロックはミノと一緒に spawn_prefab (またはシーン同期) で生成される
+        if not self.network_manager.is_server:
+            return
+        for number, position in enumerate(self.shape, 1):
+            block = self.add_child(Block(f"Block{number}", parent=self, position=position, image_path=self.image_path, size=size))
             sprite = block.get_component(Sprite)
             sprite.load_image(self.image_path)
 
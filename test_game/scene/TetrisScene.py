@@ -1,14 +1,21 @@
 from gamelib.network.syncs.NetworkScene import NetworkScene
 from gamelib.game.utility.Coroutine import WaitForSeconds
 from ..game_objects.server_objects.Field import Field
+from ..game_objects.server_objects.FieldSimulation import MatchSimulation
 from ..game_objects.server_objects.ui.TetrisPanel import TetrisPanel
 from gamelib.game.game_object.utility_object.FrameRate import FrameRate
 from gamelib.game.core.Camera import Camera
+from gamelib.network.utility.MessageSchema import MessageSchemaRegistry
+from gamelib.network.utility.RollbackSession import RollbackSession
 import pygame
 import time
 class TetrisScene(NetworkScene):
+    # True ならロールバックモード (各ピアが入力だけからフィールドを進め、ブロックを同期しない)
+    rollback_mode = False
+
     def __init__(self, screen):
         super().__init__("TetrisScene", screen)
+        self.rollback_session = None
 
     def start(self):
         self.init()
@@ -30,6 +37,7 @@ class TetrisScene(NetworkScene):
         self.is_alive_field_0 = False
         self.is_alive_field_1 = False
         self.end_game = False
+        self.rollback_session = None
 
     def start_game_delay(self):
         """ゲーム開始を5秒遅らせて全クライアントに通知"""
@@ -37,7 +45,7 @@ class TetrisScene(NetworkScene):
         for _ in range(self.start_count):
             self.network_manager.broadcast({"type": "count_game", "count": (self.start_count - _) }, True)
             yield WaitForSeconds(1)  # **5秒待機**
-        self.network_manager.broadcast({"type": "start_game"}, True)
+        self.network_manager.broadcast({"type": "start_game", "seed": self.seed, "rollback": self.rollback_mode}, True)
 
         print("🚀 ゲームスタート！")
     def update(self, dt):
@@ -62,11 +70,46 @@ class TetrisScene(NetworkScene):
         yield WaitForSeconds(3)
         self.network_manager.scene_manager.set_active_network_scene("LobbyScene")
     def receive_message(self, message):
+        if self.rollback_session is not None and self.rollback_session.receive_message(message):
+            return
+        if message.get("type") == "start_game" and message.get("rollback"):
+            self.start_rollback(message["seed"])
         return super().receive_message(message)
 
+    def start_rollback(self, seed):
+        # クライアントでは start で作ったフィールドはシーン同期で置き換わっているので、同期されたフィールドを使う
+        fields = [self.find_field(0), self.find_field(1)]
+        if None in fields:
+            print("⚠️ ロールバックモードを開始できません: フィールドが見つかりません")
+            return
+        self.field0, self.field1 = fields
+        local_player = None
+        for field in fields:
+            if field.steam_id == self.network_manager.local_steam_id:
+                local_player = field.field_number
+        simulation = MatchSimulation([field.start_simulation(seed) for field in fields])
+        self.rollback_session = RollbackSession(self.network_manager, simulation, local_player)
+
+    def find_field(self, number):
+        """シーンにある number 番のフィールド"""
+        for obj in self.network_object_index.values():
+            if isinstance(obj, Field) and obj.field_number == number:
+                return obj
+        return None
+
+    def network_tick(self, tick):
+        if self.rollback_session is not None:
+            self.rollback_session.advance()
+            self.field0.render_simulation()
+            self.field1.render_simulation()
+        super().network_tick(tick)
+
 
     def generate_block_pattern(self):
         """server側でブロックの生成patternを作成する"""
         self.seed = int(time.time())
 
 
+MessageSchemaRegistry.register("count_game", 75, [("count", "B")])
+MessageSchemaRegistry.register("start_game", 76, [("seed", "I"), ("rollback", "?")])
+MessageSchemaRegistry.register("end_game", 77, [("win", "B")])
@@ -0,0 +1,35 @@
+import os
+import sys
+
+import pygame
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+from gamelib.network.NetworkManager import NetworkManager
+from gamelib.network.NetworkObjectFactory import NetworkObjectFactory
+from gamelib.network.transport.LoopbackTransport import LoopbackHub, LoopbackTransport
+
+
+@pytest.fixture(scope="session")
+def screen():
+    # 画像の読み込みに表示の初期化が必要 (画像ファイルはリポジトリ直下にある)
+    os.chdir(ROOT)
+    pygame.display.init()
+    return pygame.display.set_mode((1, 1))
+
+
+@pytest.fixture
+def hub():
+    return LoopbackHub()
+
+
+@pytest.fixture
+def network_manager(hub):
+    """ループバック通信のサーバー1台分の NetworkManager (シングルトンとして有効にする)"""
+    peer = NetworkManager.create_peer(LoopbackTransport(hub, "Server"))
+    peer.activate()
+    yield peer
+    NetworkManager._instance = None
@@ -0,0 +1,16 @@
+import pygame
+
+from test_game.game_objects.Block import Block
+
+
+def test_received_position_moves_block_immediately(network_manager, screen):
+    server_block = Block(position=(3, 4), size=40)
+    client_block = Block(position=(3, 4), size=40)
+    client_block.set_transform_position(40, client_block.position)
+
+    # ライン消去で2段下がる
+    server_block.position = pygame.Vector2(3, 6)
+    client_block.receive_sync_vars(server_block.build_sync_vars_message())
+
+    assert client_block.position == pygame.Vector2(3, 6)
+    assert list(client_block.transform.get_local_position())[:2] == [120, 240]
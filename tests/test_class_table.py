@@ -0,0 +1,114 @@
+import pytest
+
+from gamelib.network.NetworkManager import NetworkManager
+from gamelib.network.NetworkObjectFactory import NetworkObjectFactory
+from gamelib.network.syncs.NetworkScene import NetworkScene
+from gamelib.network.syncs.NetworkSceneManager import NetworkSceneManager
+from gamelib.network.syncs.game_objects.NetworkGameObject import NetworkGameObject
+from gamelib.network.transport.LoopbackCluster import LoopbackCluster
+from gamelib.network.transport.LoopbackTransport import LoopbackTransport
+
+CLIENT_ID = 1001
+
+
+class OtherObject(NetworkGameObject):
+    pass
+
+
+@pytest.fixture
+def server(network_manager, screen):
+    """クライアント CLIENT_ID が参加しているサーバー (送信したメッセージを sent に記録する)"""
+    NetworkObjectFactory.register_class(NetworkGameObject)
+    NetworkObjectFactory.register_class(OtherObject)
+    steam_id = network_manager.steam.steam_id
+    network_manager.set_network_ids(1, steam_id, steam_id, True, False)
+    network_manager.lobby_members = {steam_id: "Server", CLIENT_ID: "Client"}
+    network_manager.sent = []
+    network_manager.send_to_client = lambda client_id, message, immediate=False: network_manager.sent.append(
+        (client_id, message))
+    scene_manager = NetworkSceneManager()
+    network_manager.scene_manager = scene_manager
+    scene_manager.add_scene(NetworkScene("TestScene", screen))
+    scene_manager.set_active_scene("TestScene")
+    return network_manager
+
+
+def ack(network_manager, sender_id=CLIENT_ID):
+    assert network_manager.class_table.receive_message({"type": "class_table_ack", "sender_id": sender_id})
+
+
+def test_peers_resolve_ids_with_their_own_table(hub):
+    NetworkObjectFactory.register_class(NetworkGameObject)
+    NetworkObjectFactory.register_class(OtherObject)
+    first = NetworkManager.create_peer(LoopbackTransport(hub, "First"))
+    second = NetworkManager.create_peer(LoopbackTransport(hub, "Second"))
+    first.class_table.set_table(["NetworkGameObject", "OtherObject"])
+    second.class_table.set_table(["OtherObject", "NetworkGameObject"])
+    try:
+        first.activate()
+        assert type(NetworkObjectFactory.create_object(1, "Object", 1)) is NetworkGameObject
+        second.activate()
+        assert type(NetworkObjectFactory.create_object(1, "Object", 1)) is OtherObject
+        # 表を受信していないピアは ID を解決できない
+        third = NetworkManager.create_peer(LoopbackTransport(hub, "Third"))
+        third.activate()
+        assert NetworkObjectFactory.create_object(1, "Object", 1) is None
+    finally:
+        NetworkManager._instance = None
+
+
+def test_class_names_are_broadcast_until_every_client_acks(server):
+    table = server.class_table
+    scene = server.scene_manager.current_scene
+    scene.add_network_object(OtherObject("Before"))
+    assert server.sent[-1][1]["class_name"] == "OtherObject"
+
+    server.sent.clear()
+    server.scene_manager.send_network_scene_sync(server, CLIENT_ID)
+    assert server.sent[0] == (CLIENT_ID, {"type": "class_table", "names": table.get_table()})
+    # 表を送っただけではクラスIDに切り替えない
+    assert table.get_class_ref(OtherObject) == "OtherObject"
+
+    ack(server)
+    assert table.get_class_ref(OtherObject) == table.class_ids["OtherObject"]
+    scene.add_network_object(OtherObject("After"))
+    assert server.sent[-1][1]["class_id"] == table.class_ids["OtherObject"]
+
+    # 新しく参加したクライアントが ack するまでは、全員にクラス名で送る
+    server.lobby_members[CLIENT_ID + 1] = "Late"
+    assert table.get_class_ref(OtherObject) == "OtherObject"
+    assert table.get_class_ref(OtherObject, CLIENT_ID) == table.class_ids["OtherObject"]
+
+
+def test_scene_sync_uses_names_for_client_without_ack(server):
+    table = server.class_table
+    table.get_table()
+    table.sent_peers.add(CLIENT_ID)
+    ack(server)
+    scene = server.scene_manager.current_scene
+    scene.add_object(OtherObject("Object"))
+    server.scene_manager.get_scene_snapshot(server)  # 全員が ack した時点でキャッシュする
+
+    late_id = CLIENT_ID + 1
+    server.lobby_members[late_id] = "Late"
+    server.scene_manager.send_network_scene_sync(server, late_id)
+    chunks = [message for _, message in server.sent if message["type"] == "scene_sync_chunk"]
+    assert [entry[0] for chunk in chunks for entry in chunk["objects"]] == ["OtherObject"]
+    # キャッシュしたチャンクは書き換えない
+    assert server.scene_manager.scene_snapshot["chunks"][0]["objects"][0][0] == table.class_ids["OtherObject"]
+
+
+def test_ack_from_peer_without_table_is_ignored(server):
+    ack(server)
+    assert not server.class_table.is_acked(CLIENT_ID)
+
+
+def test_loopback_clients_ack_the_table(screen):
+    NetworkObjectFactory.register_class(NetworkGameObject)
+    cluster = LoopbackCluster(2, {"TestScene": lambda screen: NetworkScene("TestScene", screen)}, "TestScene", screen)
+    try:
+        assert cluster.run_until(lambda: cluster.all_synced() and cluster.server.class_table.all_acked())
+        for client in cluster.clients:
+            assert client.class_table.get_table() == cluster.server.class_table.get_table()
+    finally:
+        cluster.close()
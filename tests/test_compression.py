@@ -0,0 +1,45 @@
+import json
+import os
+import zlib
+
+from gamelib.network.utility.Compression import COMPRESSION_THRESHOLD, Compression
+
+
+def scene_sync_payload(count=40):
+    objects = [{"class_name": "Block", "object_name": "Block", "network_id": number,
+                "steam_id": 76561190000000001, "parent_id": None} for number in range(count)]
+    return json.dumps({"type": "scene_sync", "scene_name": "TetrisScene", "scene_data": {"objects": objects}},
+                      separators=(',', ':')).encode('utf-8')
+
+
+def test_round_trip():
+    payload = scene_sync_payload()
+    compressed = Compression.compress(payload)
+    assert compressed is not None and len(compressed) < len(payload)
+    assert Compression.decompress(compressed) == payload
+    assert Compression.decompress(memoryview(compressed)) == payload
+
+
+def test_small_or_incompressible_payloads_are_not_compressed():
+    assert Compression.compress(b"a" * (COMPRESSION_THRESHOLD - 1)) is None
+    assert Compression.compress(os.urandom(2000)) is None
+
+
+def test_preset_dictionary_helps_small_messages():
+    payload = scene_sync_payload(3)
+    plain = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+    without_dictionary = plain.compress(payload) + plain.flush()
+    assert len(Compression.compress(payload)) < len(without_dictionary)
+
+
+def test_corrupted_or_truncated_data_is_rejected():
+    compressed = Compression.compress(scene_sync_payload())
+    assert Compression.decompress(compressed[:len(compressed) // 2]) is None
+    assert Compression.decompress(b"\xff" * 40) is None
+
+
+def test_decompression_is_limited():
+    payload = b"0" * 100000
+    compressed = Compression.compress(payload)
+    assert Compression.decompress(compressed, max_size=len(payload)) == payload
+    assert Compression.decompress(compressed, max_size=len(payload) - 1) is None
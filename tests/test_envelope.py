@@ -0,0 +1,113 @@
+import json
+import random
+
+import pytest
+
+from gamelib.network.SteamNetworking import cobs_decode, cobs_encode
+from gamelib.network.transport.LoopbackTransport import LoopbackTransport
+from gamelib.network.utility.Communication import Communication, split_utf8
+from gamelib.network.utility.Envelope import (
+    BATCH_ENTRY, HEADER_SIZE, KIND_BATCH, KIND_JSON, PROTOCOL_VERSION_BINARY, Envelope)
+
+
+@pytest.mark.parametrize("data", [
+    b"", b"\x00", b"\x00\x00", b"abc", b"a\x00b\x00", bytes(range(256)),
+    b"\x01" * 253, b"\x01" * 254, b"\x01" * 255, b"\x01" * 600 + b"\x00" + b"\x02" * 300,
+])
+def test_cobs_round_trip_without_nul(data):
+    encoded = cobs_encode(data)
+    assert b"\x00" not in encoded
+    assert cobs_decode(encoded) == data
+
+
+def test_cobs_round_trip_random():
+    generator = random.Random(1)
+    for _ in range(200):
+        data = bytes(generator.choice((0, 0, 1, 255, generator.randrange(256)))
+                     for _ in range(generator.randrange(1500)))
+        assert cobs_decode(cobs_encode(data)) == data
+
+
+def test_envelope_pack_unpack():
+    frame = Envelope.pack(KIND_JSON, b'{"type":"x"}', flags=3, message_id=7, fragment_index=1, fragment_count=4)
+    assert Envelope.is_binary(frame)
+    kind, flags, message_id, index, count, payload = Envelope.unpack(frame)
+    assert (kind, flags, message_id, index, count, bytes(payload)) == (KIND_JSON, 3, 7, 1, 4, b'{"type":"x"}')
+
+
+def test_truncated_frame_is_rejected():
+    frame = Envelope.pack(KIND_JSON, b"0123456789")
+    assert Envelope.unpack(frame[:-1]) is None
+    assert not Envelope.is_binary(frame[:HEADER_SIZE - 1])
+    assert not Envelope.is_binary(b'{"type": "ping"}')
+
+
+def test_iter_batch():
+    entries = [(KIND_JSON, b"a"), (KIND_BATCH, b""), (KIND_JSON, b"xyz")]
+    payload = b"".join(BATCH_ENTRY.pack(kind, len(data)) + data for kind, data in entries)
+    assert [(kind, bytes(data)) for kind, data in Envelope.iter_batch(payload)] == entries
+
+
+def test_split_utf8_keeps_characters_whole():
+    data = ("テトリス" * 100).encode("utf-8")
+    parts = list(split_utf8(data, 100))
+    assert b"".join(parts) == data
+    assert all(len(part) <= 100 for part in parts)
+    for part in parts:
+        part.decode("utf-8")
+
+
+class Peer:
+    """Communication が使う network_manager の代わり"""
+    def __init__(self, hub, name):
+        self.steam = LoopbackTransport(hub, name)
+        self.communication = Communication(self)
+
+    def receive_all(self):
+        messages = []
+        for data, sender_id in self.steam.receive_p2p_messages():
+            messages.extend(self.communication.receive_message(data, sender_id))
+        return messages
+
+
+@pytest.fixture
+def peers(hub):
+    sender, receiver = Peer(hub, "Sender"), Peer(hub, "Receiver")
+    return sender, receiver
+
+
+@pytest.mark.parametrize("binary", [False, True])
+def test_communication_round_trip(peers, binary):
+    sender, receiver = peers
+    if binary:
+        sender.communication.set_peer_version(receiver.steam.steam_id, PROTOCOL_VERSION_BINARY)
+    generator = random.Random(2)
+    messages = [
+        {"type": "ping_request", "time": 1.5, "sender_id": 3, "protocol": 2, "rtt": 0.25},
+        {"type": "custom", "text": "ミノ" * 10},
+        # 圧縮しても MTU を超える大きなメッセージ (分割される)
+        {"type": "custom", "blob": "".join(generator.choice("abcdef0123456789") for _ in range(8000))},
+    ]
+    for message in messages:
+        sender.communication.send_message(receiver.steam.steam_id, message)
+    assert receiver.receive_all() == messages
+
+
+def test_send_batch_packs_messages_into_frames(peers):
+    sender, receiver = peers
+    target = receiver.steam.steam_id
+    messages = [{"type": "custom", "number": number} for number in range(300)]
+    entries = [sender.communication.encode_payload(message) for message in messages]
+    frames = sender.communication.send_batch(target, entries)
+    assert frames < len(messages) // 10
+    assert receiver.receive_all() == messages
+
+
+def test_json_legacy_fragments_round_trip(peers):
+    sender, receiver = peers
+    message = {"type": "custom", "text": "テトリス" * 400}
+    sender.communication.send_message(receiver.steam.steam_id, message)
+    fragments = [json.loads(bytes(data)) for _, data, _ in receiver.steam.inbox]
+    assert len(fragments) > 1
+    assert all(fragment["type"] == "fragment" for fragment in fragments)
+    assert receiver.receive_all() == [message]
@@ -0,0 +1,72 @@
+from gamelib.network.utility.FragmentAssembler import FragmentAssembler
+
+
+def test_out_of_order_fragments_are_joined():
+    assembler = FragmentAssembler()
+    assert assembler.add(("a", 1), 2, 3, b"cc", now=0) is None
+    assert assembler.add(("a", 1), 0, 3, b"aa", now=0) is None
+    assert assembler.add(("a", 1), 1, 3, memoryview(b"bb"), now=0) == b"aabbcc"
+    assert assembler.buffered_bytes == 0
+    assert not assembler.partials
+
+
+def test_same_message_id_from_different_senders_does_not_collide():
+    assembler = FragmentAssembler()
+    assembler.add(("a", 1), 0, 2, b"a0", now=0)
+    assembler.add(("b", 1), 0, 2, b"b0", now=0)
+    assert assembler.add(("b", 1), 1, 2, b"b1", now=0) == b"b0b1"
+    assert assembler.add(("a", 1), 1, 2, b"a1", now=0) == b"a0a1"
+
+
+def test_duplicate_and_invalid_fragments():
+    assembler = FragmentAssembler(max_fragments=8)
+    assembler.add(("a", 1), 0, 2, b"x", now=0)
+    assert assembler.add(("a", 1), 0, 2, b"x", now=0) is None
+    assert assembler.duplicate_fragments == 1
+    assert assembler.add(("a", 2), 5, 2, b"x", now=0) is None
+    assert assembler.add(("a", 3), 0, 9, b"x", now=0) is None
+    assert assembler.dropped_fragments == 2
+
+
+def test_reused_message_id_with_other_count_replaces_old_message():
+    assembler = FragmentAssembler()
+    assembler.add(("a", 1), 0, 3, b"old", now=0)
+    assert assembler.add(("a", 1), 0, 2, b"n0", now=0) is None
+    assert assembler.add(("a", 1), 1, 2, b"n1", now=0) == b"n0n1"
+    assert assembler.buffered_bytes == 0
+
+
+def test_incomplete_messages_expire():
+    assembler = FragmentAssembler(timeout=5.0)
+    assembler.add(("a", 1), 0, 2, b"aaaa", now=0)
+    assembler.add(("b", 1), 0, 3, b"bb", now=3)
+    assembler.expire(now=5.5)
+    assert list(assembler.partials) == [("b", 1)]
+    assert assembler.expired_messages == 1
+    assert assembler.buffered_bytes == 2
+
+    # 新しい断片が届くたびに期限が延びる
+    assembler.add(("b", 1), 1, 3, b"bb", now=7)
+    assembler.expire(now=8.5)
+    assert list(assembler.partials) == [("b", 1)]
+    assembler.expire(now=12)
+    assert not assembler.partials and assembler.buffered_bytes == 0
+
+
+def test_least_recently_updated_message_is_evicted_over_limit():
+    assembler = FragmentAssembler(max_buffered_bytes=10)
+    assembler.add(("a", 1), 0, 2, b"aaaa", now=0)
+    assembler.add(("b", 1), 0, 2, b"bbbb", now=0)
+    assembler.add(("a", 1), 0, 2, b"aaaa", now=0)  # 重複でも a,1 が最近の更新になる
+    assembler.add(("c", 1), 0, 2, b"cccc", now=0)
+    assert ("b", 1) not in assembler.partials
+    assert ("a", 1) in assembler.partials and ("c", 1) in assembler.partials
+    assert assembler.evicted_messages == 1
+    assert assembler.buffered_bytes == 8
+
+
+def test_message_larger_than_limit_is_kept_while_alone():
+    assembler = FragmentAssembler(max_buffered_bytes=4)
+    assembler.add(("a", 1), 0, 3, b"aaaa", now=0)
+    assembler.add(("a", 1), 1, 3, b"aaaa", now=0)
+    assert assembler.add(("a", 1), 2, 3, b"aa", now=0) == b"aaaaaaaaaa"
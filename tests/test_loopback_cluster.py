@@ -0,0 +1,25 @@
+import pygame
+
+from gamelib.network.NetworkObjectFactory import NetworkObjectFactory
+from gamelib.network.syncs.NetworkScene import NetworkScene
+from gamelib.network.syncs.game_objects.NetworkGameObject import NetworkGameObject
+from gamelib.network.transport.LoopbackCluster import LoopbackCluster
+
+
+def test_clients_receive_server_scene(screen):
+    NetworkObjectFactory.register_class(NetworkGameObject)
+    cluster = LoopbackCluster(2, {"TestScene": lambda screen: NetworkScene("TestScene", screen)}, "TestScene", screen)
+    try:
+        cluster.server.activate()
+        server_scene = cluster.server.scene_manager.current_scene
+        obj = server_scene.add_network_object(NetworkGameObject("Object"))
+        assert cluster.run_until(cluster.all_synced)
+
+        obj.transform.set_local_position(pygame.Vector3(12, 34, 0))
+        cluster.run(0.5)
+        for client in cluster.clients:
+            synced = client.scene_manager.current_scene.get_network_object(obj.network_id)
+            assert synced is not None
+            assert list(synced.transform.get_local_position())[:2] == [12, 34]
+    finally:
+        cluster.close()
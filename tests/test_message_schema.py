@@ -0,0 +1,60 @@
+import struct
+
+from gamelib.network.utility.MessageSchema import STR, MessageSchema, MessageSchemaRegistry
+import gamelib.network.utility.PingMeter  # noqa: F401  ping_request を登録する
+import gamelib.network.syncs.components.NetworkTransform  # noqa: F401  sync_transform を登録する
+
+FIELDS = [("network_id", "I"), ("position_x", "f"), ("name", STR), ("size", "2f"), ("alpha", "B")]
+
+
+def test_full_message_round_trip():
+    schema = MessageSchema("test_full", 200, FIELDS)
+    message = {"type": "test_full", "network_id": 7, "position_x": 1.5, "name": "ミノ", "size": [32.0, 16.0], "alpha": 255}
+    assert schema.decode(schema.encode(message)) == message
+
+
+def test_presence_mask_only_packs_present_fields():
+    schema = MessageSchema("test_mask", 200, FIELDS)
+    payload = schema.encode({"type": "test_mask", "network_id": 7, "alpha": 3})
+    _, mask = schema.header.unpack_from(payload)
+    assert mask == 0b10001
+    assert len(payload) == schema.header.size + 4 + 1
+
+
+def test_missing_fields_decode_as_none():
+    schema = MessageSchema("test_optional", 200, FIELDS)
+    decoded = schema.decode(schema.encode({"type": "test_optional", "network_id": 7, "name": None}))
+    assert decoded == {"type": "test_optional", "network_id": 7, "position_x": None, "name": None,
+                       "size": None, "alpha": None}
+
+
+def test_sparse_schema_omits_missing_keys():
+    schema = MessageSchema("test_sparse", 200, FIELDS, sparse=True)
+    decoded = schema.decode(schema.encode({"type": "test_sparse", "network_id": 7, "size": [1.0, 2.0]}))
+    assert decoded == {"type": "test_sparse", "network_id": 7, "size": [1.0, 2.0]}
+
+
+def test_str_fields_round_trip_empty_and_unicode():
+    schema = MessageSchema("test_str", 200, [("a", STR), ("b", STR), ("c", "H")])
+    message = {"type": "test_str", "a": "", "b": "テトリス/image.png", "c": 65535}
+    assert schema.decode(schema.encode(message)) == message
+
+
+def test_unknown_key_or_wrong_type_falls_back_to_json():
+    schema = MessageSchema("test_fallback", 200, FIELDS)
+    assert schema.encode({"type": "test_fallback", "network_id": 7, "extra": 1}) is None
+    assert schema.encode({"type": "test_fallback", "network_id": "seven"}) is None
+    assert schema.encode({"type": "test_fallback", "alpha": 256}) is None
+
+
+def test_registry_round_trip_keeps_ping_times_exact():
+    message = {"type": "ping_request", "time": 123456.789012345, "sender_id": 76561190000000002,
+               "protocol": 2, "rtt": 0.016666666666666666}
+    assert MessageSchemaRegistry.decode(MessageSchemaRegistry.encode(message)) == message
+
+
+def test_float_positions_are_rounded_to_float32():
+    message = {"type": "sync_transform", "network_id": 1, "position_x": 100000.3, "position_y": 64.0}
+    decoded = MessageSchemaRegistry.decode(MessageSchemaRegistry.encode(message))
+    assert decoded["position_y"] == 64.0
+    assert decoded["position_x"] == struct.unpack("<f", struct.pack("<f", 100000.3))[0] != 100000.3
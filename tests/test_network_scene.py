@@ -0,0 +1,39 @@
+from gamelib.network.syncs.NetworkScene import NetworkScene
+from gamelib.network.syncs.game_objects.NetworkGameObject import NetworkGameObject
+
+
+def make_scene(network_manager, screen):
+    network_manager.set_network_ids(1, network_manager.steam.steam_id, network_manager.steam.steam_id, True, False)
+    return NetworkScene("TestScene", screen)
+
+
+def test_add_object_indexes_network_object_and_children(network_manager, screen):
+    scene = make_scene(network_manager, screen)
+    root = NetworkGameObject("Root")
+    child = root.add_child(NetworkGameObject("Child"))
+    scene.add_object(root)
+
+    assert scene.get_network_object(root.network_id) is root
+    assert scene.get_network_object(child.network_id) is child
+    assert root.network_scene is scene and child.network_scene is scene
+    assert root in scene.replication_scheduler.assigned
+
+
+def test_remove_object_detaches_subtree(network_manager, screen):
+    scene = make_scene(network_manager, screen)
+    root = NetworkGameObject("Root")
+    child = root.add_child(NetworkGameObject("Child"))
+    scene.add_object(root)
+    scene.remove_object(root)
+
+    assert scene.get_network_object(root.network_id) is None
+    assert scene.get_network_object(child.network_id) is None
+    assert child.network_scene is None
+
+
+def test_dirty_sync_vars_set_before_adding_are_flushed(network_manager, screen):
+    scene = make_scene(network_manager, screen)
+    obj = NetworkGameObject("Object")
+    obj.layer = 3  # シーンに追加する前の変更
+    scene.add_object(obj)
+    assert obj in scene.dirty_objects
@@ -0,0 +1,64 @@
+import json
+import time
+
+import pytest
+
+from gamelib.network.transport.LoopbackTransport import LoopbackTransport
+
+
+@pytest.fixture
+def processed(network_manager, monkeypatch):
+    messages = []
+    monkeypatch.setattr(network_manager, "process_received_message", messages.append)
+    return messages
+
+
+def send(hub, network_manager, count):
+    """旧形式 (JSON) のメッセージを count 個届ける"""
+    sender = LoopbackTransport(hub, "Sender")
+    for number in range(count):
+        data = json.dumps({"type": "full_message", "data": json.dumps({"n": number})})
+        sender.send_p2p_message(network_manager.steam.steam_id, data.encode())
+
+
+def test_count_budget_carries_messages_over_to_next_frame(hub, network_manager, processed):
+    send(hub, network_manager, 25)
+    network_manager.receive_budget_count = 10
+
+    assert network_manager.pump_messages() == 10
+    assert network_manager.stats.budget_exhausted_frames == 1
+    assert network_manager.stats.backlog == 15
+    assert network_manager.pump_messages() == 10
+    assert network_manager.pump_messages() == 5
+    assert network_manager.stats.budget_exhausted_frames == 2
+    assert network_manager.stats.backlog == 0
+    assert [message["n"] for message in processed] == list(range(25))
+
+
+def test_time_budget_limits_slow_handlers(hub, network_manager, monkeypatch):
+    handled = []
+
+    def slow(message):
+        handled.append(message)
+        time.sleep(0.002)
+
+    monkeypatch.setattr(network_manager, "process_received_message", slow)
+    send(hub, network_manager, 50)
+    network_manager.receive_budget_time = 0.01
+
+    processed = network_manager.pump_messages()
+    assert 1 <= processed < 50
+    assert network_manager.stats.backlog == 50 - processed
+    while network_manager.pump_messages():
+        pass
+    assert len(handled) == 50
+
+
+def test_receive_thread_mode_only_processes_pending_messages(hub, network_manager, processed):
+    send(hub, network_manager, 3)
+    network_manager.use_receive_thread = True
+    network_manager.pending_messages.append({"n": -1})
+
+    assert network_manager.pump_messages() == 1
+    assert processed == [{"n": -1}]
+    assert network_manager.steam.pending_count() == 3  # Transport からの読み出しはスレッドが行う
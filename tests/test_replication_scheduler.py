@@ -0,0 +1,68 @@
+from collections import Counter
+
+from gamelib.network.utility.ReplicationScheduler import ReplicationScheduler
+
+
+class FakeObject:
+    def __init__(self, name, tier, priority=0, counter=None):
+        self.name = name
+        self.replication_tier = tier
+        self.replication_priority = priority
+        self.active = True
+        self.counter = counter
+
+    def replicate(self):
+        self.counter[self] += 1
+
+
+def test_each_object_is_replicated_once_per_interval():
+    scheduler = ReplicationScheduler()
+    counter = Counter()
+    objects = [FakeObject(f"{tier}{number}", tier, counter=counter)
+               for tier in ReplicationScheduler.TIERS for number in range(47)]
+    for obj in objects:
+        scheduler.add(obj)
+
+    for tier, interval in ReplicationScheduler.TIERS.items():
+        counter.clear()
+        for tick in range(100, 100 + interval):
+            scheduler.tick(tick)
+        assert all(counter[obj] == 1 for obj in objects if obj.replication_tier == tier)
+
+
+def test_objects_are_spread_over_slots():
+    scheduler = ReplicationScheduler()
+    counter = Counter()
+    for number in range(300):
+        scheduler.add(FakeObject(f"static{number}", "static", counter=counter))
+    scheduler.tick(0)
+    assert scheduler.replicated_last_tick == 300 // ReplicationScheduler.TIERS["static"]
+
+
+def test_higher_priority_is_replicated_first_and_removed_objects_are_skipped():
+    scheduler = ReplicationScheduler()
+    order = []
+
+    class Recorder(FakeObject):
+        def replicate(self):
+            order.append(self.name)
+
+    low = Recorder("low", "realtime", 0)
+    high = Recorder("high", "realtime", 5)
+    removed = Recorder("removed", "realtime", 9)
+    for obj in (low, high, removed):
+        scheduler.add(obj)
+    scheduler.remove(removed)
+    scheduler.tick(0)
+    assert order == ["high", "low"]
+
+
+def test_unknown_tier_falls_back_to_normal_and_none_is_not_scheduled():
+    scheduler = ReplicationScheduler()
+    counter = Counter()
+    unknown = FakeObject("unknown", "fast", counter=counter)
+    never = FakeObject("never", None, counter=counter)
+    scheduler.add(unknown)
+    scheduler.add(never)
+    assert scheduler.assigned[unknown][0] == "normal"
+    assert never not in scheduler.assigned
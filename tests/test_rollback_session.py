@@ -0,0 +1,106 @@
+from gamelib.network.utility.RollbackSession import RollbackSession
+from test_game.game_objects.server_objects.FieldSimulation import (
+    FieldSimulation, MatchSimulation, MOVE_LEFT, MOVE_RIGHT, ROTATE,
+)
+
+
+class StubNetworkManager:
+    """送信したメッセージを記録するだけの NetworkManager の代わり"""
+    def __init__(self, is_server, local_steam_id, lobby_members=()):
+        self.is_server = is_server
+        self.local_steam_id = local_steam_id
+        self.server_steam_id = 1
+        self.lobby_members = list(lobby_members)
+        self.sent = []  # [(宛先, メッセージ), ...]  宛先は "broadcast" / "server" / steam_id
+
+    def broadcast(self, message):
+        self.sent.append(("broadcast", message))
+
+    def send_to_server(self, message):
+        self.sent.append(("server", message))
+
+    def send_to_client(self, client_id, message):
+        self.sent.append((client_id, message))
+
+
+def make_simulation():
+    return MatchSimulation([FieldSimulation(seed=1), FieldSimulation(seed=2)])
+
+
+def make_session(is_server=False, local_player=0, **kwargs):
+    manager = StubNetworkManager(is_server, 1 if is_server else 2, lobby_members=(1, 2, 3))
+    return RollbackSession(manager, make_simulation(), local_player, **kwargs)
+
+
+def input_message(tick, player, value, sender_id=3):
+    return {"type": "rollback_input", "tick": tick, "player": player, "input": value, "sender_id": sender_id}
+
+
+def run_reference(inputs, ticks):
+    """全入力が最初から揃っていた場合の状態"""
+    simulation = make_simulation()
+    for tick in range(ticks):
+        simulation.step(inputs.get(tick, {}))
+    return simulation.save_state()
+
+
+def test_local_input_is_recorded_and_sent_to_server():
+    session = make_session(input_delay=2)
+    session.add_local_input(MOVE_LEFT)
+    assert session.inputs == {2: {0: [MOVE_LEFT]}}
+    assert session.network_manager.sent == [("server", input_message(2, 0, MOVE_LEFT, sender_id=2))]
+
+
+def test_spectator_does_not_send_input():
+    session = make_session(local_player=None)
+    session.add_local_input(MOVE_LEFT)
+    assert session.inputs == {}
+    assert session.network_manager.sent == []
+
+
+def test_server_relays_input_to_other_clients():
+    session = make_session(is_server=True)
+    assert session.receive_message(input_message(0, 1, MOVE_RIGHT, sender_id=3))
+    assert session.network_manager.sent == [(2, input_message(0, 1, MOVE_RIGHT, sender_id=3))]
+
+
+def test_other_messages_are_ignored():
+    session = make_session()
+    assert not session.receive_message({"type": "ping_request"})
+
+
+def test_late_input_rolls_back_and_matches_on_time_result():
+    session = make_session()
+    for _ in range(10):
+        session.advance()
+    session.receive_message(input_message(3, 1, MOVE_RIGHT))
+    session.receive_message(input_message(5, 1, ROTATE))
+    session.advance()
+
+    # 一番古い tick から1回だけやり直す
+    assert session.rollbacks == 1
+    assert session.resimulated_ticks == 7
+    assert session.tick == 11
+    expected = run_reference({3: {1: [MOVE_RIGHT]}, 5: {1: [ROTATE]}}, 11)
+    assert session.simulation.save_state() == expected
+
+
+def test_input_for_current_tick_does_not_roll_back():
+    session = make_session()
+    session.advance()
+    session.receive_message(input_message(1, 1, MOVE_LEFT))
+    session.advance()
+    assert session.rollbacks == 0
+    assert session.simulation.save_state() == run_reference({1: {1: [MOVE_LEFT]}}, 2)
+
+
+def test_input_older_than_history_is_counted_as_too_late():
+    session = make_session(history_size=4)
+    for _ in range(10):
+        session.advance()
+    assert min(session.states) >= 10 - 4 - 1
+    session.receive_message(input_message(0, 1, MOVE_LEFT))
+    session.advance()
+    assert session.too_late_inputs == 1
+    assert session.rollbacks == 0
+    assert 0 not in session.inputs
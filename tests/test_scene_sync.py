@@ -0,0 +1,127 @@
+import pytest
+
+from gamelib.network.NetworkObjectFactory import NetworkObjectFactory
+from gamelib.network.syncs.NetworkScene import NetworkScene
+from gamelib.network.syncs.NetworkSceneManager import NetworkSceneManager
+from gamelib.network.syncs.game_objects.NetworkGameObject import NetworkGameObject
+
+
+@pytest.fixture
+def server_scene(network_manager, screen):
+    NetworkObjectFactory.register_class(NetworkGameObject)
+    steam_id = network_manager.steam.steam_id
+    network_manager.set_network_ids(1, steam_id, steam_id, True, False)
+    scene_manager = NetworkSceneManager()
+    network_manager.scene_manager = scene_manager
+    scene_manager.add_scene(NetworkScene("TestScene", screen))
+    scene_manager.set_active_scene("TestScene")
+    return scene_manager.current_scene
+
+
+def cached_plus_delta(network_manager):
+    """キャッシュしたシーン同期に、その後の変更 (scene_sync_delta) を重ねたエントリ {network_id: エントリ}"""
+    snapshot, changes = network_manager.scene_manager.get_scene_snapshot(network_manager)
+    entries = {entry[2]: entry for chunk in snapshot["chunks"] for entry in chunk["objects"]}
+    for _, change in changes:
+        if isinstance(change, int):
+            entries.pop(change, None)
+        else:
+            entries[change[2]] = change
+    return entries
+
+
+def fresh(network_manager, scene):
+    return {entry[2]: entry for entry in network_manager.scene_manager._serialize_entries(scene)}
+
+
+def test_cached_sync_plus_delta_matches_fresh_sync(network_manager, server_scene):
+    root = server_scene.add_object(NetworkGameObject("Root"))
+    removed = root.add_child(NetworkGameObject("Removed"))
+    removed.add_child(NetworkGameObject("Grandchild"))
+    network_manager.scene_manager.get_scene_snapshot(network_manager)  # キャッシュを作る
+
+    added = root.add_child(NetworkGameObject("Added"))
+    added.add_child(NetworkGameObject("AddedChild"))
+    root.remove_child(removed)
+    other = server_scene.add_network_object(NetworkGameObject("Other"))
+
+    snapshot, changes = network_manager.scene_manager.get_scene_snapshot(network_manager)
+    assert changes  # キャッシュは作り直されず、差分で送られる
+    assert cached_plus_delta(network_manager) == fresh(network_manager, server_scene)
+    assert other.network_id in cached_plus_delta(network_manager)
+
+
+def test_remove_object_is_logged(network_manager, server_scene):
+    obj = server_scene.add_object(NetworkGameObject("Object"))
+    network_manager.scene_manager.get_scene_snapshot(network_manager)
+    version = server_scene.scene_version
+
+    server_scene.remove_object(obj)
+    assert server_scene.scene_version == version + 1
+    assert cached_plus_delta(network_manager) == fresh(network_manager, server_scene) == {}
+
+
+def test_too_many_changes_rebuild_the_cache(network_manager, server_scene):
+    scene_manager = network_manager.scene_manager
+    scene_manager.scene_sync_max_delta = 2
+    scene_manager.get_scene_snapshot(network_manager)
+    for number in range(3):
+        server_scene.add_object(NetworkGameObject(f"Object{number}"))
+    snapshot, changes = scene_manager.get_scene_snapshot(network_manager)
+    assert changes == []
+    assert snapshot["version"] == server_scene.scene_version
+    assert snapshot["total"] == 3
+
+
+def test_full_state_lists_states_for_every_object_in_the_tree(network_manager, server_scene, monkeypatch):
+    sent = []
+    monkeypatch.setattr(network_manager, "send_to_client", lambda target, message: sent.append(message))
+    root = server_scene.add_object(NetworkGameObject("Root"))
+    root.add_child(NetworkGameObject("Child"))
+    server_scene.network_object_index.clear()  # 索引が不完全でもツリーから集める
+
+    network_manager.scene_manager.send_full_state(network_manager, 2, 0)
+    message = sent[-1]
+    assert message["complete"]
+    assert [state[0] for state in message["states"]] == [entry[2] for entry in message["changes"]]
+    assert len(message["states"]) == 2
+
+
+@pytest.fixture
+def client_scene(network_manager, server_scene):
+    """同じシーンを持つクライアント (server_scene の作成後にクライアントとして設定し直す)"""
+    steam_id = network_manager.steam.steam_id
+    network_manager.set_network_ids(1, steam_id + 1, steam_id, False, True)
+    return server_scene
+
+
+def full_state(objects, states=None):
+    entries = [NetworkScene.make_sync_entry(obj) for obj in objects]
+    if states is None:
+        states = [[obj.network_id, obj.active, obj.steam_id, obj.layer, obj.capture_state()] for obj in objects]
+    return {"type": "full_state", "version": 1, "complete": True, "changes": entries, "states": states}
+
+
+def test_complete_full_state_drops_unlisted_objects(network_manager, client_scene):
+    kept = client_scene.add_object(NetworkGameObject("Kept"))
+    dropped = client_scene.add_object(NetworkGameObject("Dropped"))
+    network_manager.scene_manager.receive_full_state(full_state([kept]))
+    assert client_scene.get_network_object(kept.network_id) is kept
+    assert client_scene.get_network_object(dropped.network_id) is None
+
+
+def test_empty_full_state_listing_does_not_drop_objects(network_manager, client_scene, capsys):
+    obj = client_scene.add_object(NetworkGameObject("Object"))
+    network_manager.scene_manager.receive_full_state(full_state([]))
+    assert client_scene.get_network_object(obj.network_id) is obj
+    assert "一覧が空" in capsys.readouterr().out
+
+
+def test_partial_full_state_listing_does_not_drop_objects(network_manager, client_scene, capsys):
+    listed = client_scene.add_object(NetworkGameObject("Listed"))
+    unlisted = client_scene.add_object(NetworkGameObject("Unlisted"))
+    message = full_state([listed])
+    message["states"].append([unlisted.network_id, True, None, 0, {}])
+    network_manager.scene_manager.receive_full_state(message)
+    assert client_scene.get_network_object(unlisted.network_id) is unlisted
+    assert "不完全" in capsys.readouterr().out
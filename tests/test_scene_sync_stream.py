@@ -0,0 +1,91 @@
+import pytest
+
+from gamelib.network.NetworkObjectFactory import NetworkObjectFactory
+from gamelib.network.syncs.NetworkScene import NetworkScene
+from gamelib.network.syncs.SceneSyncStream import SceneSyncStream
+from gamelib.network.syncs.game_objects.NetworkGameObject import NetworkGameObject
+
+
+@pytest.fixture
+def client_scene(network_manager, screen):
+    NetworkObjectFactory.register_class(NetworkGameObject)
+    network_manager.set_network_ids(1, 99, network_manager.steam.steam_id, False, True)
+    return NetworkScene("TestScene", screen)
+
+
+def entry(name, network_id, parent_id=None):
+    return ["NetworkGameObject", name, network_id, 0, parent_id, []]
+
+
+def make_stream(entries, total=None):
+    stream = SceneSyncStream(3, "TestScene", len(entries) if total is None else total)
+    stream.add_entries(entries)
+    return stream
+
+
+def test_builds_tree_and_adds_roots_on_finish(client_scene):
+    stream = make_stream([entry("Root", 10), entry("Child", 11, 10), entry("Grandchild", 12, 11)])
+    stream.received_all = True
+    assert stream.build(1.0) == 3
+    assert stream.complete
+    # finish までシーンには入らない
+    assert client_scene.get_network_object(10) is None
+
+    stream.finish(client_scene)
+    root = client_scene.get_network_object(10)
+    child = client_scene.get_network_object(11)
+    grandchild = client_scene.get_network_object(12)
+    assert root in client_scene.objects
+    assert child.parent is root and grandchild.parent is child
+    assert child not in client_scene.objects
+
+
+def test_build_processes_at_least_one_entry_per_call(client_scene):
+    stream = make_stream([entry(f"Object{number}", 10 + number) for number in range(3)])
+    assert stream.build(0.0) == 1
+    assert stream.processed == 1
+    assert len(stream.entries) == 2
+    assert stream.build(1.0) == 2
+    assert stream.processed == 3
+
+
+def test_not_complete_until_end_received(client_scene):
+    stream = make_stream([entry("Root", 10)])
+    stream.build(1.0)
+    assert not stream.complete
+    stream.received_all = True
+    assert stream.complete
+
+
+def test_delta_removes_built_objects(client_scene):
+    stream = make_stream([entry("Root", 10), entry("Child", 11, 10), entry("Other", 20)])
+    # キャッシュ後の変更: 子と別の根を取り除き、新しい子を追加する
+    stream.add_entries([11, 20, entry("NewChild", 12, 10)])
+    stream.received_all = True
+    stream.build(1.0)
+    stream.finish(client_scene)
+
+    root = client_scene.get_network_object(10)
+    assert [child.network_id for child in root.children] == [12]
+    assert client_scene.get_network_object(11) is None
+    assert client_scene.get_network_object(20) is None
+    assert [obj.network_id for obj in client_scene.get_network_objects()] == [10]
+
+
+def test_unknown_class_and_its_children_are_dropped(client_scene):
+    stream = make_stream([["Missing", "Broken", 10, 0, None, []], entry("Orphan", 11, 10), entry("Root", 20)])
+    stream.received_all = True
+    stream.build(1.0)
+    stream.finish(client_scene)
+
+    assert client_scene.get_network_object(10) is None
+    assert client_scene.get_network_object(11) is None
+    assert client_scene.get_network_object(20) is not None
+
+
+def test_remove_of_unknown_id_is_ignored(client_scene):
+    stream = make_stream([entry("Root", 10), 999])
+    stream.received_all = True
+    assert stream.build(1.0) == 2
+    stream.finish(client_scene)
+    assert client_scene.get_network_object(10) is not None
@@ -0,0 +1,179 @@
+import time
+
+import pytest
+
+from gamelib.network.transport.LoopbackTransport import LoopbackTransport
+from gamelib.network.utility.Communication import Communication
+from gamelib.network.utility.Envelope import PROTOCOL_VERSION_BINARY
+from gamelib.network.utility.SendQueue import SendQueue
+import gamelib.network.syncs.components.NetworkTransform  # noqa: F401  sync_transform を登録する
+
+
+class Receiver:
+    def __init__(self, hub):
+        self.steam = LoopbackTransport(hub, "Receiver")
+        self.communication = Communication(self)
+
+    def receive_all(self):
+        messages = []
+        for data, sender_id in self.steam.receive_p2p_messages():
+            messages.extend(self.communication.receive_message(data, sender_id))
+        return messages
+
+
+@pytest.fixture
+def receiver(hub, network_manager):
+    receiver = Receiver(hub)
+    network_manager.communication.set_peer_version(receiver.steam.steam_id, PROTOCOL_VERSION_BINARY)
+    return receiver
+
+
+@pytest.fixture
+def queue(network_manager):
+    queue = SendQueue(network_manager)
+    queue.bandwidth = None
+    return queue
+
+
+def transform(network_id, **fields):
+    return {"type": "sync_transform", "network_id": network_id, **fields}
+
+
+def test_sparse_updates_of_one_object_are_merged(queue, receiver):
+    target = receiver.steam.steam_id
+    queue.push(target, transform(1, position_x=1.0))
+    queue.push(target, transform(1, position_y=2.0))
+    queue.push(target, transform(1, position_x=3.0))
+    assert queue.pending_count(target) == 1
+    assert queue.coalesced_messages == 2
+
+    queue.flush()
+    assert receiver.receive_all() == [transform(1, position_x=3.0, position_y=2.0)]
+
+
+def test_merge_does_not_modify_shared_messages(queue, receiver):
+    first = transform(1, position_x=1.0)
+    queue.push(receiver.steam.steam_id, first)
+    queue.push(receiver.steam.steam_id, transform(1, position_y=2.0))
+    assert first == transform(1, position_x=1.0)
+
+
+def test_coalesced_message_moves_after_later_messages(queue, receiver):
+    target = receiver.steam.steam_id
+    queue.push(target, transform(1, position_x=1.0))
+    queue.push(target, {"type": "custom", "order": 1})
+    queue.push(target, transform(1, position_x=2.0))
+    queue.push(target, transform(2, position_x=5.0))
+    queue.flush()
+    assert receiver.receive_all() == [
+        {"type": "custom", "order": 1}, transform(1, position_x=2.0), transform(2, position_x=5.0)]
+
+
+def test_messages_without_coalesce_are_all_sent(queue, receiver):
+    target = receiver.steam.steam_id
+    messages = [{"type": "custom", "network_id": 1, "order": order} for order in range(3)]
+    for message in messages:
+        queue.push(target, message)
+    queue.flush()
+    assert receiver.receive_all() == messages
+
+
+def test_registered_merge_function(queue, receiver, monkeypatch):
+    monkeypatch.setattr(SendQueue, "merge_functions", {})
+    SendQueue.register_merge("score", lambda old, new: {**new, "points": old["points"] + new["points"]})
+    target = receiver.steam.steam_id
+    queue.push(target, {"type": "score", "network_id": 4, "points": 2})
+    queue.push(target, {"type": "score", "network_id": 4, "points": 3})
+    queue.flush()
+    assert receiver.receive_all() == [{"type": "score", "network_id": 4, "points": 5}]
+
+
+def test_pinned_message_is_encoded_once(queue, receiver, network_manager, monkeypatch):
+    message = {"type": "custom", "objects": list(range(20))}
+    queue.pin(message)
+    calls = []
+    encode = network_manager.communication.encode_payload
+    monkeypatch.setattr(network_manager.communication, "encode_payload", lambda data: calls.append(data) or encode(data))
+    for _ in range(3):
+        queue.push(receiver.steam.steam_id, message)
+        queue.flush()
+    assert calls == []
+    assert receiver.receive_all() == [message] * 3
+
+
+class PriorityScene:
+    def __init__(self, priorities):
+        self.network_object_index = {network_id: PriorityObject(priority) for network_id, priority in priorities.items()}
+
+
+class PriorityObject:
+    def __init__(self, priority):
+        self.replication_priority = priority
+
+
+class PrioritySceneManager:
+    def __init__(self, priorities):
+        self.current_scene = PriorityScene(priorities)
+
+
+@pytest.fixture
+def budget_queue(network_manager, receiver):
+    """予算つきの送信キュー。network_id 1 は必ず送るオブジェクト、2～ は優先度の低いオブジェクト"""
+    network_manager.scene_manager = PrioritySceneManager({1: 1, **{network_id: 0 for network_id in range(2, 40)}})
+    queue = SendQueue(network_manager)
+    queue.stamp_server_time = False
+    queue.bandwidth = 2000  # BURST_SECONDS で 500 bytes まで貯まる
+    return queue
+
+
+def queue_updates(queue, target, network_ids):
+    for network_id in network_ids:
+        queue.push(target, transform(network_id, position_x=1.0, position_y=2.0, position_z=3.0))
+
+
+def test_essential_and_structural_messages_ignore_the_budget(budget_queue, receiver):
+    target = receiver.steam.steam_id
+    budget_queue.tokens[target] = 0
+    budget_queue.push(target, {"type": "remove_object", "network_id": 5})
+    queue_updates(budget_queue, target, [1])
+    budget_queue.flush()
+    assert [message["type"] for message in receiver.receive_all()] == ["remove_object", "sync_transform"]
+    assert budget_queue.tokens[target] < 0  # 予算からは差し引かれる
+
+
+def test_low_priority_updates_are_deferred_and_eventually_sent(budget_queue, receiver, monkeypatch):
+    target = receiver.steam.steam_id
+    queue_updates(budget_queue, target, range(2, 40))
+    budget_queue.flush()
+    first = {message["network_id"] for message in receiver.receive_all()}
+    assert 0 < len(first) < 38
+    assert budget_queue.deferred_messages > 0
+    assert budget_queue.pending_count(target) == 38 - len(first)
+
+    # 時間が経つと予算が回復し、残ったものから送られる (新しい更新が積まれ続けても)
+    sent = set(first)
+    clock = [time.perf_counter()]
+    monkeypatch.setattr("gamelib.network.utility.SendQueue.time.perf_counter", lambda: clock[0])
+    for _ in range(20):
+        clock[0] += 0.1
+        queue_updates(budget_queue, target, range(2, 40))
+        budget_queue.flush()
+        sent |= {message["network_id"] for message in receiver.receive_all()}
+    assert sent == set(range(2, 40))
+
+
+def test_tokens_refill_up_to_the_burst(budget_queue, receiver):
+    target = receiver.steam.steam_id
+    budget_queue.tokens[target] = 0
+    assert budget_queue._refill(target, 0.1) == pytest.approx(200)
+    assert budget_queue._refill(target, 10) == pytest.approx(500)
+
+
+def test_slow_peers_get_a_smaller_budget(budget_queue, network_manager, receiver):
+    target = receiver.steam.steam_id
+    network_manager.is_server = True
+    assert budget_queue.get_bandwidth(target) == 2000
+    network_manager.ping_meter.peer_rtts[target] = 0.2
+    assert budget_queue.get_bandwidth(target) == pytest.approx(1000)
+    network_manager.ping_meter.peer_rtts[target] = 5.0
+    assert budget_queue.get_bandwidth(target) == pytest.approx(500)
@@ -0,0 +1,74 @@
+import pytest
+
+from gamelib.network.utility.SnapshotBuffer import SnapshotBuffer
+
+
+def make_buffer(*entries):
+    buffer = SnapshotBuffer()
+    for server_time, state in entries:
+        buffer.push(server_time, state)
+    return buffer
+
+
+def test_empty_buffer_returns_none():
+    assert SnapshotBuffer().sample(1.0, 0.05) is None
+
+
+def test_before_first_state_returns_first_state():
+    buffer = make_buffer((1.0, {"position_x": 10.0}), (2.0, {"position_x": 20.0}))
+    assert buffer.sample(0.5, 0.05) == {"position_x": 10.0}
+
+
+def test_interpolates_between_states():
+    buffer = make_buffer((1.0, {"position_x": 10.0, "position_y": 0.0}), (2.0, {"position_x": 20.0, "position_y": 4.0}))
+    assert buffer.sample(1.25, 0.05) == pytest.approx({"position_x": 12.5, "position_y": 1.0})
+
+
+def test_rotation_takes_the_short_way():
+    buffer = make_buffer((0.0, {"rotation_z": 350.0}), (1.0, {"rotation_z": 10.0}))
+    assert buffer.sample(0.5, 0.05)["rotation_z"] == pytest.approx(360.0)
+
+
+def test_partial_states_are_merged_with_the_previous_state():
+    buffer = make_buffer((1.0, {"position_x": 10.0, "position_y": 5.0}), (2.0, {"position_x": 20.0}))
+    assert buffer.states[1] == {"position_x": 20.0, "position_y": 5.0}
+    # 同じ時刻の状態は1つにまとめる
+    buffer.push(2.0, {"scale_x": 2.0})
+    assert len(buffer) == 2
+    assert buffer.states[1] == {"position_x": 20.0, "position_y": 5.0, "scale_x": 2.0}
+
+
+def test_out_of_order_push_is_inserted_by_time():
+    buffer = make_buffer((1.0, {"position_x": 10.0}), (3.0, {"position_x": 30.0}), (2.0, {"position_x": 25.0}))
+    assert buffer.times == [1.0, 2.0, 3.0]
+    assert buffer.sample(2.5, 0.05) == pytest.approx({"position_x": 27.5})
+
+
+def test_extrapolates_up_to_the_limit_then_stops():
+    buffer = make_buffer((1.0, {"position_x": 10.0}), (2.0, {"position_x": 20.0}))
+    assert buffer.sample(2.04, 0.05) == pytest.approx({"position_x": 20.4})
+    assert buffer.active
+    assert buffer.sample(2.1, 0.05) == {"position_x": 20.0}
+    assert not buffer.active
+    buffer.push(3.0, {"position_x": 30.0})
+    assert buffer.active
+
+
+def test_single_state_is_not_extrapolated():
+    buffer = make_buffer((1.0, {"position_x": 10.0}))
+    assert buffer.sample(1.01, 0.05) == {"position_x": 10.0}
+
+
+def test_old_states_are_dropped_but_two_are_kept():
+    buffer = make_buffer(*((float(time), {"position_x": float(time)}) for time in range(10)))
+    buffer.sample(7.5, 0.05)
+    assert buffer.times == [7.0, 8.0, 9.0]
+    buffer.sample(20.0, 0.05)
+    assert buffer.times == [8.0, 9.0]
+
+
+def test_capacity_limit():
+    buffer = SnapshotBuffer(capacity=4)
+    for time in range(10):
+        buffer.push(float(time), {"position_x": 0.0})
+    assert buffer.times == [6.0, 7.0, 8.0, 9.0]
@@ -0,0 +1,126 @@
+import pygame
+
+from gamelib.network.syncs.NetworkScene import NetworkScene
+from gamelib.network.syncs.game_objects.NetworkGameObject import NetworkGameObject
+from gamelib.network.utility.SnapshotReplicator import SnapshotReplicator
+
+
+def make_scene(network_manager, screen):
+    network_manager.set_network_ids(1, network_manager.steam.steam_id, network_manager.steam.steam_id, True, False)
+    return NetworkScene("TestScene", screen)
+
+
+def test_snapshot_includes_objects_added_with_add_object(network_manager, screen):
+    scene = make_scene(network_manager, screen)
+    root = scene.add_object(NetworkGameObject("Root"))
+    child = root.add_child(NetworkGameObject("Child"))
+
+    snapshot = network_manager.snapshot_replicator.capture(scene)
+    assert (root.network_id, "object") in snapshot
+    assert snapshot[(child.network_id, "object")]["parent_id"] == root.network_id
+    assert (child.network_id, "NetworkTransform") in snapshot
+
+
+def test_delta_contains_only_changed_fields(network_manager, screen):
+    scene = make_scene(network_manager, screen)
+    replicator = network_manager.snapshot_replicator
+    obj = scene.add_object(NetworkGameObject("Object"))
+    replicator.history[1] = replicator.capture(scene)
+
+    obj.transform.set_local_position(pygame.Vector3(5, 0, 0))
+    replicator.snapshot_tick = 2
+    delta = replicator.make_delta(replicator.capture(scene), 1)
+
+    assert delta["baseline"] == 1
+    assert delta["removed"] == []
+    assert [(network_id, key) for network_id, key, _ in delta["changes"]] == [(obj.network_id, "NetworkTransform")]
+
+
+def test_delta_without_changes_is_not_sent(network_manager, screen):
+    scene = make_scene(network_manager, screen)
+    replicator = network_manager.snapshot_replicator
+    scene.add_object(NetworkGameObject("Object"))
+    replicator.history[1] = replicator.capture(scene)
+    assert replicator.make_delta(replicator.capture(scene), 1) is False
+
+
+class RecordingObject:
+    def __init__(self, network_id, applied):
+        self.network_id = network_id
+        self.applied = applied
+
+    def apply_state(self, key, state):
+        self.applied.append([self.network_id, key, state])
+
+
+class ClientStub:
+    """クライアント側の receive_delta 用の NetworkManager の代わり (適用した状態と ack を記録する)"""
+    def __init__(self):
+        self.is_client = True
+        self.local_steam_id = 2
+        self.applied = []
+        self.acks = []
+        self.scene_manager = self
+        self.current_scene = self
+
+    def get_network_object(self, network_id):
+        return RecordingObject(network_id, self.applied)
+
+    def send_to_server(self, message):
+        self.acks.append(message["tick"])
+
+
+def server_delta(server, tick, snapshot, baseline_tick):
+    server.snapshot_tick = tick
+    server.history[tick] = snapshot
+    return server.make_delta(snapshot, baseline_tick)
+
+
+def make_pair():
+    return SnapshotReplicator(None), SnapshotReplicator(ClientStub())
+
+
+def test_client_applies_full_snapshot_and_acks():
+    server, client = make_pair()
+    client.receive_delta(server_delta(server, 1, {(1, "object"): {"x": 0}}, 0))
+    assert client.network_manager.applied == [[1, "object", {"x": 0}]]
+    assert client.network_manager.acks == [1]
+    assert client.applied_tick == 1
+
+
+def test_delta_from_acked_baseline_reverts_values_applied_after_it():
+    server, client = make_pair()
+    client.receive_delta(server_delta(server, 8, {(1, "object"): {"x": 0}, (2, "object"): {"y": 0}}, 0))
+    # tick 9 (x=5) は ack される前に適用される
+    client.receive_delta(server_delta(server, 9, {(1, "object"): {"x": 5}, (2, "object"): {"y": 0}}, 8))
+    client.network_manager.applied.clear()
+
+    # tick 10: x は基準 (tick 8) の値に戻り、別のオブジェクトが変わる → 8→10 の差分に x は入らない
+    delta = server_delta(server, 10, {(1, "object"): {"x": 0}, (2, "object"): {"y": 7}}, 8)
+    assert [network_id for network_id, _, _ in delta["changes"]] == [2]
+    client.receive_delta(delta)
+    assert sorted(client.network_manager.applied) == [[1, "object", {"x": 0}], [2, "object", {"y": 7}]]
+    assert client.received[10] == {(1, "object"): {"x": 0}, (2, "object"): {"y": 7}}
+
+
+def test_older_delta_is_stored_but_not_applied():
+    server, client = make_pair()
+    client.receive_delta(server_delta(server, 1, {(1, "object"): {"x": 0}}, 0))
+    late = server_delta(server, 2, {(1, "object"): {"x": 1}}, 1)
+    client.receive_delta(server_delta(server, 3, {(1, "object"): {"x": 2}}, 1))
+    client.network_manager.applied.clear()
+
+    client.receive_delta(late)
+    assert client.network_manager.applied == []
+    assert client.applied_tick == 3
+    assert client.received[2] == {(1, "object"): {"x": 1}}
+    assert client.network_manager.acks == [1, 3, 2]
+
+
+def test_delta_without_baseline_is_dropped():
+    server, client = make_pair()
+    server.history[4] = {}
+    client.receive_delta(server_delta(server, 5, {(1, "object"): {"x": 0}}, 4))
+    assert client.missing_baselines == 1
+    assert client.network_manager.applied == []
+    assert client.network_manager.acks == []
@@ -0,0 +1,80 @@
+import ctypes
+from collections import deque
+
+import pytest
+
+import gamelib.network.SteamNetworking as steam_networking
+from gamelib.network.SteamNetworking import ESCAPE, RECEIVE_POOL_SIZE, SteamNetworking, cobs_encode
+
+
+class StubFunction:
+    """DLL の関数の代わり (argtypes / restype を設定できる)"""
+    def __init__(self, function=None):
+        self.function = function
+
+    def __call__(self, *args):
+        return self.function(*args) if self.function else 0
+
+
+class StubDll:
+    """SteamNetworkingWrapper.dll の代わりに、積んだメッセージを NUL 終端で受信バッファに書き込む"""
+    def __init__(self):
+        self.messages = deque()
+        self.InitializeSteam = StubFunction(lambda: True)
+        self.GetSteamID = StubFunction(lambda: 1)
+        self.ReceiveP2PMessage = StubFunction(self.receive)
+
+    def __getattr__(self, name):
+        function = StubFunction()
+        setattr(self, name, function)
+        return function
+
+    def receive(self, buffer, size, sender_ref):
+        if not self.messages:
+            return False
+        data, sender_id = self.messages.popleft()
+        ctypes.memmove(buffer, data + b"\x00", len(data) + 1)
+        sender_ref._obj.value = sender_id
+        return True
+
+
+@pytest.fixture
+def steam(monkeypatch):
+    dll = StubDll()
+    monkeypatch.setattr(steam_networking.ctypes, "CDLL", lambda path: dll)
+    transport = SteamNetworking()
+    return transport, dll
+
+
+def test_json_message_is_returned_intact(steam):
+    transport, dll = steam
+    dll.messages.append((b'{"type": "ping_request"}', 42))
+    data, sender_id = transport.receive_p2p_message()
+    assert bytes(data) == b'{"type": "ping_request"}'
+    assert sender_id == 42
+
+
+def test_cobs_message_is_decoded(steam):
+    transport, dll = steam
+    payload = b"\x05\x00\x01binary\x00"
+    dll.messages.append((bytes([ESCAPE]) + cobs_encode(payload), 7))
+    data, _ = transport.receive_p2p_message()
+    assert bytes(data) == payload
+
+
+def test_shorter_message_in_reused_buffer_has_no_leftover_bytes(steam):
+    transport, dll = steam
+    dll.messages.append((b"a long first message", 1))
+    dll.messages.extend((b"x", 1) for _ in range(RECEIVE_POOL_SIZE - 1))
+    dll.messages.append((b"short", 1))  # 最初のバッファを再利用する
+    for _ in range(RECEIVE_POOL_SIZE):
+        transport.receive_p2p_message()
+    data, _ = transport.receive_p2p_message()
+    assert bytes(data) == b"short"
+
+
+def test_batch_receive_copies_more_messages_than_the_pool(steam):
+    transport, dll = steam
+    sent = [(f'{{"n": {number}}}'.encode(), number) for number in range(RECEIVE_POOL_SIZE * 2 + 3)]
+    dll.messages.extend(sent)
+    assert transport.receive_p2p_messages() == sent
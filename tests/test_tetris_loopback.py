@@ -0,0 +1,133 @@
+import pygame
+import pytest
+
+from gamelib.network.NetworkObjectFactory import NetworkObjectFactory
+from gamelib.network.transport.LoopbackCluster import LoopbackCluster
+from test_game.scene.TetrisScene import TetrisScene
+
+
+@pytest.fixture
+def cluster(screen):
+    pygame.font.init()
+    cluster = LoopbackCluster(1, {"TetrisScene": TetrisScene}, "TetrisScene", screen)
+    assert cluster.run_until(cluster.all_synced)
+    yield cluster
+    cluster.close()
+
+
+def server_scene(cluster):
+    return cluster.server.scene_manager.current_scene
+
+
+def client_scene(cluster):
+    return cluster.clients[0].scene_manager.current_scene
+
+
+def wait_for_mino(cluster, field_name):
+    """ゲームが始まり、サーバーのミノがクライアントに生成されるまで進める"""
+    field = getattr(server_scene(cluster), field_name)
+    assert cluster.run_until(lambda: field.running and field.active_mino is not None
+                             and client_scene(cluster).get_network_object(field.active_mino.network_id) is not None)
+    mino = field.active_mino
+    return mino, client_scene(cluster).get_network_object(mino.network_id)
+
+
+def test_fields_are_attached_on_server(cluster):
+    scene = server_scene(cluster)
+    for field in (scene.field0, scene.field1):
+        assert field.network_scene is scene
+        assert scene.get_network_object(field.network_id) is field
+
+
+def test_falling_mino_position_reaches_client(cluster):
+    mino, client_mino = wait_for_mino(cluster, "field0")
+    start = pygame.Vector2(mino.position)
+    assert cluster.run_until(lambda: mino.position.y >= start.y + 2)
+    cluster.run(0.1)
+    assert client_mino.position == mino.position
+    assert client_mino.position != start
+
+
+def test_field_subtree_is_scheduled_for_replication(cluster):
+    mino, _ = wait_for_mino(cluster, "field0")
+    scheduler = server_scene(cluster).replication_scheduler
+    assert scheduler.assigned[mino][0] == "realtime"
+    assert server_scene(cluster).field0 in scheduler.assigned
+
+
+def step(peer, dt=1 / 60):
+    peer.activate()
+    peer.update(dt)
+    peer.scene_manager.update(dt)
+
+
+def test_client_prediction_is_acked_and_replayed(cluster):
+    server, client = cluster.server, cluster.clients[0]
+    server_field = server_scene(cluster).field1
+    mino, client_mino = wait_for_mino(cluster, "field1")
+    client_field = client_mino.parent
+    assert client_field.steam_id == client.local_steam_id
+
+    # 予測: サーバーの応答を待たずに手元のミノが動く
+    client.activate()
+    start = pygame.Vector2(client_mino.position)
+    client_field.send_input("move_left_mino")
+    assert client_mino.position == start + pygame.Vector2(-1, 0)
+    assert len(client_field.pending_inputs) == 1
+
+    # ack: サーバーが処理した番号が返ると、予測済みの入力は捨てられる
+    assert cluster.run_until(lambda: not client_field.pending_inputs)
+    assert mino.position.x == start.x - 1
+    assert client_mino.position == mino.position
+
+    # やり直し: 入力がサーバーに届く前に、サーバーの別の変更 (落下) を受信する
+    client.activate()
+    client_field.send_input("move_right_mino")
+    held = list(server.steam.inbox)
+    server.steam.inbox.clear()
+    server.activate()
+    server_field.fall()
+    step(server)
+    step(client)
+    assert client_mino.server_position == mino.position
+    assert client_mino.position == mino.position + pygame.Vector2(1, 0)
+    assert len(client_field.pending_inputs) == 1
+
+    server.steam.inbox.extend(held)
+    assert cluster.run_until(lambda: not client_field.pending_inputs)
+    assert client_mino.position == mino.position
+
+
+@pytest.fixture
+def rollback_cluster(screen, monkeypatch):
+    pygame.font.init()
+    monkeypatch.setattr(TetrisScene, "rollback_mode", True)
+    cluster = LoopbackCluster(1, {"TetrisScene": TetrisScene}, "TetrisScene", screen)
+    assert cluster.run_until(cluster.all_synced)
+    yield cluster
+    cluster.close()
+
+
+def test_rollback_mode_uses_synced_fields_on_client(rollback_cluster):
+    cluster = rollback_cluster
+    server, client = cluster.server, cluster.clients[0]
+    scene = client_scene(cluster)
+    assert cluster.run_until(lambda: scene.rollback_session is not None
+                             and server_scene(cluster).rollback_session is not None)
+
+    server_session = server_scene(cluster).rollback_session
+    client_session = scene.rollback_session
+    assert server_session.local_player == 0
+    assert client_session.local_player == 1
+    for field in (scene.field0, scene.field1):
+        assert field.simulation is not None
+        assert scene.get_network_object(field.network_id) is field
+
+    # クライアントの入力がサーバーのシミュレーションにも反映される
+    client.activate()
+    scene.field1.send_rollback_input("move_left_mino")
+    tick = client_session.tick
+    assert cluster.run_until(lambda: server_session.tick > tick + 1 and client_session.tick > tick + 1)
+    assert server_session.inputs[tick] == {1: [0]}
+    assert server_session.states[tick + 1] == client_session.states[tick + 1]
+    assert scene.field1.shown_cells == set(scene.field1.simulation.get_cells())
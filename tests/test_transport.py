@@ -0,0 +1,21 @@
+import pytest
+
+from gamelib.network.transport.Transport import Transport
+from gamelib.network.transport.LoopbackTransport import LoopbackTransport
+
+
+class IncompleteTransport(Transport):
+    def send_p2p_message(self, steam_id, message):
+        return True
+
+
+def test_transport_without_required_methods_cannot_be_created():
+    with pytest.raises(TypeError):
+        IncompleteTransport()
+
+
+def test_loopback_transport_delivers_message(hub):
+    sender = LoopbackTransport(hub, "A")
+    receiver = LoopbackTransport(hub, "B")
+    assert sender.send_p2p_message(receiver.steam_id, b"hello")
+    assert receiver.receive_p2p_message() == (b"hello", sender.steam_id)
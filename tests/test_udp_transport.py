@@ -0,0 +1,134 @@
+import socket
+import threading
+
+import pytest
+
+from gamelib.network.transport.UdpTransport import (
+    DATA_HEADER, PACKET_CONTROL, PACKET_DATA, UdpRendezvous, UdpTransport, _encode_control)
+
+
+@pytest.fixture
+def rendezvous():
+    server = UdpRendezvous("127.0.0.1", 0)
+    thread = threading.Thread(target=server.serve_forever, args=(0.01,), daemon=True)
+    thread.start()
+    yield server.sock.getsockname()
+    server.stop()
+    thread.join(1)
+    server.close()
+
+
+@pytest.fixture
+def lobby(rendezvous):
+    """ランデブー経由でロビーを作り、サーバーとクライアントが互いをメンバーとして知っている状態"""
+    server = UdpTransport(rendezvous, host="127.0.0.1", name="Server")
+    client = UdpTransport(rendezvous, host="127.0.0.1", name="Client")
+    lobby_id = server.create_lobby(2, 4)
+    assert client.join_lobby(lobby_id)
+    while client.steam_id not in server.peers:
+        server.poll(1)
+    yield server, client
+    client.shutdown_server()
+    server.shutdown_server()
+
+
+def _send_raw(target, data):
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.sendto(data, target.sock.getsockname())
+    target.selector.select(1)
+
+
+def test_member_data_is_received(lobby):
+    server, client = lobby
+    assert client.send_p2p_message(server.steam_id, b"hello")
+    server.selector.select(1)
+    assert server.receive_p2p_messages() == [(b"hello", client.steam_id)]
+
+
+def test_spoofed_sender_id_is_rejected(lobby):
+    server, client = lobby
+    # 別のソケットからクライアントのIDを名乗る
+    _send_raw(server, DATA_HEADER.pack(PACKET_DATA, client.steam_id) + b"spoofed")
+    assert server.receive_p2p_messages() == []
+    assert server.rejected_datagrams == 1
+    assert server.peers[client.steam_id] == client.sock.getsockname()
+
+
+def test_unknown_sender_is_not_learned_as_peer(lobby):
+    server, _ = lobby
+    _send_raw(server, DATA_HEADER.pack(PACKET_DATA, 12345) + b"hello")
+    assert server.receive_p2p_messages() == []
+    assert 12345 not in server.peers
+
+
+def test_control_packet_from_non_rendezvous_is_ignored(lobby):
+    server, client = lobby
+    _send_raw(server, _encode_control({"op": "member_leave", "lobby_id": server.lobby_id,
+                                       "peer_id": client.steam_id, "owner": server.steam_id}))
+    server.poll()
+    assert client.steam_id in server.members
+    assert server.check_lobby_leave()[0] is False
+
+
+def test_malformed_control_packet_is_logged(rendezvous, capsys):
+    transport = UdpTransport(rendezvous, host="127.0.0.1")
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.bind(("127.0.0.1", 0))
+            # ランデブーのアドレスから届いたことにする
+            transport.rendezvous_addr = sock.getsockname()
+            sock.sendto(bytes([PACKET_CONTROL]) + b"{not json", transport.sock.getsockname())
+            transport.selector.select(1)
+            transport.poll()
+        assert "不正な制御パケット" in capsys.readouterr().out
+    finally:
+        transport.shutdown_server()
+
+
+def test_leaving_member_is_removed_from_peers(lobby):
+    server, client = lobby
+    client.leave_lobby(client.lobby_id)
+    while not server.check_lobby_leave()[0]:
+        server.poll(1)
+    assert client.steam_id not in server.peers
+    assert client.steam_id not in server.members
+    assert not client.send_p2p_message(server.steam_id, b"hello")
+
+
+def test_poll_from_two_threads_receives_each_datagram_once(lobby):
+    server, client = lobby
+    total = 2000
+    done = threading.Event()
+    received_before = server.received_datagrams
+
+    def receive_thread():
+        while not done.is_set():
+            server.poll(0.01)
+
+    thread = threading.Thread(target=receive_thread)
+    thread.start()
+    try:
+        for number in range(total):
+            client.send_p2p_message(server.steam_id, number.to_bytes(4, "little"))
+            server.check_lobby_join()  # メインループ側の poll
+        while len(server.inbox) < total and server.poll(0.2):
+            pass
+    finally:
+        done.set()
+        thread.join(1)
+    received = sorted(int.from_bytes(data, "little") for data, _ in server.receive_p2p_messages())
+    assert received == list(range(total))
+    assert server.received_datagrams - received_before == total
+
+
+def test_close_waits_for_serving_thread(monkeypatch):
+    errors = []
+    monkeypatch.setattr(threading, "excepthook", errors.append)
+    for _ in range(20):
+        server = UdpRendezvous("127.0.0.1", 0)
+        thread = threading.Thread(target=server.serve_forever, args=(0.001,), daemon=True)
+        thread.start()
+        server.close()
+        thread.join(1)
+        assert not thread.is_alive()
+    assert errors == []